@@ -1,3 +1,28 @@
-from .paper import Paper
-from .misc import *
-from .make_publication_format import make_publication_format
\ No newline at end of file
+import importlib
+
+# What the package exports, and the module each name lives in. They are only imported when
+# first used, so that e.g. "metaforge date" does not pay for the DOI checker or the batch tools.
+_EXPORTS = {
+    "Paper": "paper",
+    "make_publication_format": "make_publication_format",
+    "Author": "misc",
+    "Abstract": "misc",
+    "Date": "misc",
+    "format_line_spacing": "misc",
+    "print_error": "misc",
+    "print_warning": "misc",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,207 @@
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from importlib import resources
+from pathlib import Path
+
+from MetaForge import trace
+
+try:
+    import fcntl
+except ImportError: # Not on Windows, where we simply copy.
+    fcntl = None
+
+# The templates are package data, so that they are found wherever the package is installed.
+ASSET_DIR = Path(resources.files("MetaForge") / "templates")
+
+# Every template a paper folder needs: (name in the templates, name in the paper folder).
+ASSETS = [
+    ("CROSSMARK_BW_square_no_text.png", "CROSSMARK_BW_square_no_text.png"),
+    ("SciPost.cls", "SciPost.cls"),
+    ("gitignore.txt", ".gitignore"),
+]
+
+# The Linux ioctl that makes a copy-on-write clone of a file (btrfs, xfs, ...).
+FICLONE = 0x40049409
+
+# Hashes of the files we have already read, by path, with the (size, modification time) they were read at.
+# Only the last version of a file is kept, and at most HASH_ENTRIES of them, the oldest going first.
+_hashes = {}
+HASH_ENTRIES = 4096
+
+def file_hash(path) -> str:
+    """ Returns the SHA-256 of a file, remembering it as long as the file does not change. """
+
+    stat = os.stat(path)
+    key, version = str(path), (stat.st_size, stat.st_mtime_ns)
+
+    known = _hashes.get(key)
+    if known is None or known[0] != version:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+        _hashes.pop(key, None)
+        if len(_hashes) >= HASH_ENTRIES:
+            _hashes.pop(next(iter(_hashes), None), None)
+        known = _hashes[key] = (version, digest.hexdigest())
+
+    return known[1]
+
+def manifest(asset_dir = ASSET_DIR) -> list:
+    """ Returns (source, target name, size, hash) of every template. """
+
+    return [
+        (Path(asset_dir) / source, target, (Path(asset_dir) / source).stat().st_size, file_hash(Path(asset_dir) / source))
+        for source, target in ASSETS
+    ]
+
+def is_current(source: Path, target: Path, size: int, digest: str) -> bool:
+    """ Whether the target already has the content of the source. """
+
+    try:
+        if os.path.samefile(source, target):
+            return True
+        if target.stat().st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+
+    return file_hash(target) == digest
+
+def copy_file(source: Path, target: Path, link: bool = False) -> str:
+    """ Copies a file as cheaply as the filesystem allows. Returns how it was copied.
+
+    We try a copy-on-write clone first, then (only if asked) a hardlink, and then an in-kernel copy.
+    Hardlinks share the file with the templates, so an edit in a paper folder would change them too.
+    The target is replaced atomically.
+    """
+
+    descriptor, temporary = tempfile.mkstemp(dir = target.parent, prefix = f".{target.name}.")
+    os.close(descriptor)
+
+    try:
+        with open(source, "rb") as src, open(temporary, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                method = "reflinked"
+            except (OSError, AttributeError):
+                method = None
+
+        if method is None and link:
+            try:
+                os.unlink(temporary)
+                os.link(source, temporary)
+                method = "hardlinked"
+            except OSError:
+                open(temporary, "wb").close()
+
+        if method is None:
+            method = _copy_contents(source, temporary)
+
+        shutil.copymode(source, temporary)
+        os.replace(temporary, target)
+    except BaseException:
+        Path(temporary).unlink(missing_ok = True)
+        raise
+
+    return method
+
+def _copy_contents(source: Path, target: str) -> str:
+    size = source.stat().st_size
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        for method, call in (("copy_file_range", getattr(os, "copy_file_range", None)), ("sendfile", getattr(os, "sendfile", None))):
+            if call is None:
+                continue
+
+            try:
+                copied = 0
+                while copied < size:
+                    if method == "sendfile":
+                        sent = call(dst.fileno(), src.fileno(), copied, size - copied)
+                    else:
+                        sent = call(src.fileno(), dst.fileno(), size - copied, copied, copied)
+
+                    if sent == 0:
+                        break
+                    copied += sent
+
+                if copied == size:
+                    return "copied"
+            except OSError:
+                pass
+
+            dst.seek(0)
+            dst.truncate()
+
+        src.seek(0)
+        shutil.copyfileobj(src, dst)
+
+    return "copied"
+
+def deploy_assets(folder, link: bool = False, asset_dir = ASSET_DIR) -> dict:
+    """ Puts the templates in a paper folder, skipping the ones that are already up to date.
+
+    Returns what was done for each template: "unchanged", "reflinked", "hardlinked" or "copied".
+    """
+
+    folder = Path(folder)
+    actions = {}
+    for source, target, size, digest in manifest(asset_dir):
+        if is_current(source, folder / target, size, digest):
+            actions[target] = "unchanged"
+        else:
+            with trace.span("asset.copy", target = target, bytes = size) as copy:
+                actions[target] = copy_file(source, folder / target, link)
+                copy.set(method = actions[target])
+        trace.count(f"assets.{actions[target]}")
+
+    return actions
+
+def class_version(path) -> str:
+    """ Returns the version comment of a SciPost.cls file, e.g. "v1e (2018-04-09)". """
+
+    with open(path, "r", errors = "replace") as f:
+        for line in f:
+            match = re.search(r"\\ProvidesClass\{SciPost\}.*?Template (.*)", line)
+            if match:
+                return match.group(1).strip()
+
+    return "unknown"
+
+def stale_classes(folders, asset_dir = ASSET_DIR) -> list:
+    """ Returns (folder, version) of the folders whose SciPost.cls differs from the template. """
+
+    source = Path(asset_dir) / "SciPost.cls"
+    size, digest = source.stat().st_size, file_hash(source)
+
+    stale = []
+    for folder in folders:
+        target = Path(folder) / "SciPost.cls"
+        if target.exists() and not is_current(source, target, size, digest):
+            stale.append((str(folder), class_version(target)))
+
+    return stale
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge assets", description = "Deploy the templates to paper folders, or find outdated ones.")
+    parser.add_argument("command", choices = ["deploy", "stale"])
+    parser.add_argument("folders", nargs = "+")
+    parser.add_argument("--link", action = "store_true", help = "Hardlink the templates when they cannot be cloned.")
+
+    args = parser.parse_args()
+
+    if args.command == "deploy":
+        for folder in args.folders:
+            actions = deploy_assets(folder, args.link)
+            print(f"{folder}: " + ", ".join(f"{target} {action}" for target, action in actions.items()))
+    else:
+        print(f"Template: {class_version(ASSET_DIR / 'SciPost.cls')}")
+        for folder, version in stale_classes(args.folders):
+            print(f"{folder}: {version}")
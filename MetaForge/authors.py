@@ -0,0 +1,119 @@
+import re
+
+from MetaForge.misc import Author, format_line_spacing, print_warning
+
+# Everything that is not part of a name in the AUTHORS block, found in a single scan.
+AUTHOR_TOKENS = re.compile(r"""
+    \\textsuperscript\{(?P<superscript>(?:[^{}]|\{[^{}]*\})*)\}
+  | \$\^\{?(?P<math>(?:[^{}$]|\{[^{}]*\})*?)\}?\$
+  | (?P<separator>,|\\and\b|(?<![\w\\])and(?!\w)|\\\\)
+""", re.VERBOSE)
+
+# Comments, and the lines that hold nothing else. A commented-out author line ends the author before it,
+# even when the comma went with the line.
+COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+COMMENTED_LINE = re.compile(r"^[ \t]*(?<!\\)%[^\n]*$", re.MULTILINE)
+
+# What the EMAIL block is made of: symbols, mail addresses and comments.
+EMAIL_TOKENS = re.compile(r"\$(?P<symbol>[^$]*)\$|mailto:(?P<mail>[^}]*)\}|(?P<comment>(?<!\\)%[^\n]*)")
+
+# The affiliation ids and the symbols in a superscript like "1,2$\star$".
+SUPERSCRIPT = re.compile(r"(?P<id>\d+)|(?P<symbol>\\[A-Za-z]+|[^\s\d,${}])")
+
+def read_superscript(superscript: str) -> tuple:
+    """ Splits a superscript into its affiliation ids and its symbols. """
+
+    ids, symbols = [], []
+    for match in SUPERSCRIPT.finditer(superscript):
+        if match.lastgroup == "id":
+            ids.append(int(match.group("id")))
+        else:
+            symbols.append(match.group("symbol"))
+
+    return ids, symbols
+
+def parse_authors(section: str) -> list:
+    """ Splits the AUTHORS block into (name, affiliation ids, symbols), one per author. """
+
+    # We drop the comments before splitting, so that nothing in them is read as a name or a separator.
+    blocks = [COMMENT.sub("", block) for block in COMMENTED_LINE.split(section)]
+
+    authors = []
+    name, ids, symbols = [], [], []
+
+    def finish():
+        text = format_line_spacing("".join(name)).strip()
+        if text:
+            authors.append((text, tuple(ids), tuple(symbols)))
+        name.clear()
+        ids.clear()
+        symbols.clear()
+
+    for block in blocks:
+        position = 0
+        for match in AUTHOR_TOKENS.finditer(block):
+            name.append(block[position:match.start()])
+            position = match.end()
+
+            if match.lastgroup == "separator":
+                finish()
+            else:
+                new_ids, new_symbols = read_superscript(match.group(match.lastgroup))
+                ids.extend(new_ids)
+                symbols.extend(new_symbols)
+
+        name.append(block[position:])
+        finish()
+
+    return authors
+
+def pair_emails(section: str) -> list:
+    """ Pairs every mail address of the EMAIL block with the symbol right before it, as (symbol, mail).
+
+    A symbol without an address is dropped and an address without a symbol gets None, so that
+    one missing piece does not shift every pair after it.
+    """
+
+    pairs = []
+    symbol = None
+    for match in EMAIL_TOKENS.finditer(section):
+        if match.lastgroup == "symbol":
+            symbol = match.group("symbol").strip()
+        elif match.lastgroup == "mail":
+            pairs.append((symbol, match.group("mail").strip()))
+            symbol = None
+
+    return pairs
+
+def extract_authors(paper) -> list:
+    """ Returns the authors of a paper, with their affiliation ids and their email when they have one. """
+
+    from MetaForge.parsed_paper import ParsedPaper
+
+    paper = ParsedPaper.of(paper)
+    start, end = paper.authors_span
+
+    try:
+        affiliations = paper.affiliations
+    except IndexError:
+        affiliations = {}
+
+    try:
+        emails = paper.emails
+    except IndexError:
+        emails = {}
+
+    authors = []
+    for name, ids, symbols in parse_authors(paper.text[start:end]):
+        # With a single affiliation, authors usually have no superscript.
+        if not ids and len(affiliations) == 1:
+            ids = tuple(affiliations)
+
+        unknown = [affid for affid in ids if affid not in affiliations]
+        if unknown:
+            print_warning(f"{name} has unknown affiliations: {', '.join(map(str, unknown))}")
+
+        email = next((emails[symbol] for symbol in symbols if symbol in emails), None)
+        authors.append(Author(name, email, ids))
+
+    return authors
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.misc import print_error, print_warning
+
+def read_manifest(path: str) -> list:
+    """ Reads a .csv or .json manifest of papers to publish.
+
+    Every entry has a tex path, a DOI and a date (DD-MM-YYYY or days from today). A CSV manifest
+    may have a "tex,doi,date" header, a JSON one is a list of such objects or of [tex, doi, date]
+    lists. Relative tex paths are relative to the manifest.
+    """
+
+    path = Path(path).resolve()
+    with open(path, "r", newline = "") as f:
+        if path.suffix == ".json":
+            rows = json.load(f)
+        else:
+            rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+            if rows and [cell.strip().lower() for cell in rows[0]] == ["tex", "doi", "date"]:
+                rows = rows[1:]
+
+    entries = []
+    for row in rows:
+        if isinstance(row, dict):
+            tex, doi, date = row["tex"], row["doi"], str(row["date"])
+        else:
+            tex, doi, date = [str(cell).strip() for cell in row]
+
+        entries.append({"tex": str((path.parent / tex).resolve()), "doi": doi, "date": date})
+
+    return entries
+
+def glob_manifest(pattern: str, date: str) -> list:
+    """ Builds a manifest from the tex files matching a glob.
+
+    The DOI of each paper is read from its folder name, with underscores for dots, like the
+    formatted file is named (e.g. SciPostPhys_16_2_045/main.tex).
+    """
+
+    entries = []
+    for tex in sorted(glob.glob(pattern, recursive = True)):
+        tex = Path(tex).resolve()
+        doi = tex.parent.name.replace("_", ".")
+
+        if not re.fullmatch(r"SciPost\w+(\.\d+)+", doi):
+            print_warning(f"Skipping {tex}: its folder is not named after a DOI.")
+            continue
+
+        entries.append({"tex": str(tex), "doi": doi, "date": date})
+
+    return entries
+
+def format_paper(entry: dict) -> dict:
+    """ Formats a single paper of the batch. Runs in a worker process, and never raises. """
+
+    from MetaForge.make_publication_format import make_publication_format, resolve_publication_date
+
+    result = dict(entry, ok = False, messages = [], dois = {})
+    try:
+        result["date"] = resolve_publication_date(entry["date"])
+        formatted, report = make_publication_format(entry["tex"], entry["doi"], result["date"], check_dois = False)
+
+        result["messages"] = [list(message) for message in report.messages()]
+        result["ok"] = report.ok
+
+        # The DOIs are checked by the parent for all papers at once.
+        try:
+            result["dois"] = dict(formatted.bibliography_index.by_doi)
+        except IndexError:
+            result["messages"].append(["warning", "Could not find the bibliography."])
+    except Exception:
+        result["error"] = traceback.format_exc()
+
+    return result
+
+def warm_abstracts(entries: list) -> None:
+    """ Converts the abstracts of a whole batch into the JATS cache up front.
+
+    Those that need pandoc are then converted in a few pandoc processes, rather than one per paper,
+    and the workers find them all in the cache.
+    """
+
+    from MetaForge.cache import jats_cache
+    from MetaForge.project import Project
+    from MetaForge.write_jats_abstract import flatten_abstract
+
+    abstracts = []
+    for entry in entries:
+        try:
+            with Project(entry["tex"]) as project:
+                abstracts.append(flatten_abstract(project.parsed.abstract.text))
+        except Exception:
+            continue # The worker reports whatever is wrong with the paper.
+
+    with trace.span("batch.abstracts", abstracts = len(abstracts)):
+        jats_cache.convert_many(list(dict.fromkeys(abstracts)))
+
+def run_batch(entries: list, workers: int = None, check_dois: bool = True, summary_path: str = None) -> list:
+    """ Formats every paper of a manifest on a pool of processes and checks all their DOIs together. """
+
+    warm_abstracts(entries)
+
+    workers = workers or min(len(entries), os.cpu_count() or 1) or 1
+    with trace.span("batch.format", papers = len(entries), workers = workers), ProcessPoolExecutor(max_workers = workers) as pool:
+        results = list(pool.map(format_paper, entries))
+
+    if check_dois:
+        from MetaForge.doi_offline import DoiIndex, check_dois as check_all_dois
+
+        # Papers of the same issue share many references, so each distinct DOI is only checked once,
+        # and only those that cannot be settled offline go to the resolver.
+        dois = list(dict.fromkeys(doi for result in results for doi in result["dois"]))
+        verdicts = check_all_dois(dois, index = DoiIndex.default())
+
+        for result in results:
+            result["wrong_dois"] = [
+                {"doi": doi, "status": verdicts[doi].status, "fixed": verdicts[doi].normalized if verdicts[doi].fixes else None, "references": ordinals}
+                for doi, ordinals in result["dois"].items() if verdicts[doi].wrong
+            ]
+
+    for result in results:
+        del result["dois"]
+
+    if summary_path is not None:
+        with open(summary_path, "w") as f:
+            json.dump(results, f, indent = 2)
+
+    return results
+
+def print_summary(results: list) -> None:
+    for result in results:
+        name = f"{result['doi']} ({result['tex']})"
+        if "error" in result:
+            print_error(f"{name}: failed")
+            print(result["error"])
+            continue
+
+        wrong = result.get("wrong_dois", [])
+        if result["ok"] and not wrong:
+            print(f"{name}: ok")
+            continue
+
+        print_warning(f"{name}: {len(result['messages'])} messages, {len(wrong)} wrong DOIs")
+
+        # The messages of the rewrite, the linter and the abstract, as the worker printed them.
+        for level, message in result["messages"]:
+            if level == "error":
+                print_error(f"  {message}")
+            elif level == "warning":
+                print_warning(f"  {message}")
+            else:
+                print(f"  {message}")
+
+    failed = sum("error" in result for result in results)
+    print(f"{len(results) - failed} of {len(results)} papers formatted.")
+
+if __name__ == "__main__":
+    print("Creating publishable documents for a batch...")
+
+    parser = argparse.ArgumentParser(prog = "metaforge batch")
+    parser.add_argument("manifest", help = "A .csv/.json manifest of (tex, doi, date), or a glob of tex files with --date.")
+    parser.add_argument("--date", default = None, help = "The publication date of every paper matched by a glob.")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--summary", default = "batch_summary.json")
+    parser.add_argument("--no-doi-check", action = "store_true")
+
+    args = parser.parse_args()
+
+    if Path(args.manifest).suffix in (".csv", ".json"):
+        entries = read_manifest(args.manifest)
+    elif args.date is not None:
+        entries = glob_manifest(args.manifest, args.date)
+    else:
+        parser.error("A glob of tex files needs a --date.")
+
+    results = run_batch(entries, args.workers, not args.no_doi_check, args.summary)
+    print_summary(results)
+
+    raise SystemExit(1 if any("error" in result for result in results) else 0)
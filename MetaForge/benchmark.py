@@ -0,0 +1,150 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from MetaForge.misc import Date, Abstract
+from MetaForge.paper import Paper
+from MetaForge.parsed_paper import ParsedPaper
+from MetaForge.jats import latex_to_jats
+from MetaForge.cache import JatsCache
+from MetaForge.synthetic import JOURNALS, generate_paper
+from MetaForge.stub_server import StubDoiServer
+from MetaForge.doi_check import DoiChecker
+from MetaForge.doi_cache import DoiCache
+from MetaForge import rewrite
+
+def measure(function, repeat: int) -> tuple:
+    """ Returns the best time of a few runs and the peak memory of one more traced run. """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+def quietly(function):
+    """ Silences what a function prints, so that it does not end up in the timings. """
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return function()
+
+    return run
+
+def cases(tex: str, doi: str, server: StubDoiServer, folder: Path) -> dict:
+    """ The functions we time on a paper, by name. """
+
+    date = Date.from_DMY("01-01-2025")
+    abstract = ParsedPaper(tex).abstract.text
+    formatted, _ = rewrite.format_publication(tex, doi, date) # Dates are only set again on formatted papers.
+
+    def check_dois():
+        # A fresh cache every time, so that we time the network checks and not the cache.
+        with tempfile.NamedTemporaryFile(dir = folder, suffix = ".sqlite") as database, DoiCache(database.name) as cache:
+            Paper.find_wrong_dois(tex, DoiChecker(server.url, rate = 1000, burst = 100, backoff = 0.01), cache)
+
+    def get_jats():
+        # Likewise a fresh JATS cache, in the folder of the benchmark rather than that of the user.
+        with tempfile.TemporaryDirectory(dir = folder) as cache_folder:
+            return Abstract(abstract, cache = JatsCache(cache_folder)).get_Jats()
+
+    return {
+        "ParsedPaper": lambda: ParsedPaper(tex),
+        "get_title": lambda: Paper.get_title(tex),
+        "get_abstract": lambda: Paper.get_abstract(tex),
+        "get_dates": lambda: Paper.get_dates(tex),
+        "get_affiliations": lambda: Paper.get_affiliations(tex),
+        "get_emails": lambda: Paper.get_emails(tex),
+        "get_authors": lambda: Paper.get_authors(tex),
+        "all_metadata": lambda: [getattr(ParsedPaper(tex), field) for field in ("title", "abstract", "dates", "affiliations", "emails", "authors", "dois")],
+        "format_publication_format": quietly(lambda: Paper.format_publication_format(tex, doi, date)),
+        "set_date": quietly(lambda: Paper.set_date(formatted, date)),
+        "Abstract.get_Jats": get_jats,
+        "latex_to_jats": lambda: latex_to_jats(abstract),
+        "find_wrong_dois": quietly(check_dois),
+    }
+
+def run_benchmarks(journals: list, sizes: list, repeat: int = 3, latency: float = 0.0, error_rate: float = 0.0,
+                   not_found_rate: float = 0.0, functions: list = None, **options) -> dict:
+    """ Times every public function on a synthetic corpus, returning the results. """
+
+    results = []
+    with StubDoiServer(latency, error_rate, not_found_rate) as server, tempfile.TemporaryDirectory() as folder:
+        for journal in journals:
+            for size in sizes:
+                tex, doi = generate_paper(journal, bibitems = size, **options)
+
+                for name, function in cases(tex, doi, server, Path(folder)).items():
+                    if functions and name not in functions:
+                        continue
+
+                    seconds, peak = measure(function, repeat)
+                    results.append({
+                        "function": name,
+                        "journal": journal,
+                        "bibitems": size,
+                        "bytes": len(tex.encode("utf-8")),
+                        "seconds": seconds,
+                        "per_second": 1 / seconds if seconds else None,
+                        "megabytes_per_second": len(tex.encode("utf-8")) / seconds / 1e6 if seconds else None,
+                        "peak_bytes": peak,
+                    })
+                    print(f"{journal:>22} {size:>6} {name:>26} {seconds * 1e3:10.3f} ms {peak / 1024:10.1f} KiB")
+
+    return {
+        "commit": commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "settings": {"repeat": repeat, "latency": latency, "error_rate": error_rate, "not_found_rate": not_found_rate, **options},
+        "results": results,
+    }
+
+def commit() -> str:
+    """ The git commit the benchmarks ran on, if we are in a checkout. """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, cwd = Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge benchmark", description = "Benchmark MetaForge on synthetic SciPost papers.")
+    parser.add_argument("--output", default = "bench_output.json")
+    parser.add_argument("--journals", nargs = "+", default = list(JOURNALS), choices = list(JOURNALS))
+    parser.add_argument("--sizes", nargs = "+", type = int, default = [10, 100, 1000, 10000], help = "Bibliography sizes.")
+    parser.add_argument("--functions", nargs = "+", default = None, help = "Only time these functions.")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--affiliations", type = int, default = 3)
+    parser.add_argument("--abstract-words", type = int, default = 150)
+    parser.add_argument("--math-density", type = float, default = 0.05)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "Latency of the stub DOI resolver, in seconds.")
+    parser.add_argument("--error-rate", type = float, default = 0.0, help = "Share of stub resolver answers that are 503.")
+    parser.add_argument("--not-found-rate", type = float, default = 0.0, help = "Share of DOIs the stub resolver does not know.")
+
+    args = parser.parse_args()
+    report = run_benchmarks(
+        args.journals, args.sizes, args.repeat, args.latency, args.error_rate, args.not_found_rate, args.functions,
+        affiliations = args.affiliations, abstract_words = args.abstract_words, math_density = args.math_density,
+    )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent = 1)
+
+    print(f"Saved {len(report['results'])} results to {args.output}.")
@@ -0,0 +1,145 @@
+import re
+
+from array import array
+from typing import NamedTuple
+
+# Everything we index in a bibliography, found in a single scan. Every alternative starts
+# with a literal, so that the scan can skip quickly over the text in between.
+TOKENS = re.compile(r"""
+    \\(?:
+        bibitem(?:\[[^\]]*\])?\{(?P<key>[^}]*)\}
+      | doi\{(?P<doi>(?:[^{}\n]|\{[^{}\n]*\})*)\}
+      | (?:url|href)\{(?P<url>.*?)\}
+    )
+  | (?:arXiv:|arxiv\.org/abs/)\s*(?P<arxiv>\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})
+""", re.VERBOSE)
+
+# What every DOI has in it, after whatever resolver URL or "doi:" label was pasted before it. Anything else in a \doi{}
+# is not a DOI at all, like a placeholder, and is not indexed.
+DOI_START = re.compile(r"10\.\d+/")
+
+# Anything after an unescaped % is a comment.
+COMMENT = re.compile(r"\\%|%[^\n]*")
+
+def uncomment(text: str) -> str:
+    """ Removes the comments of a text, keeping its lines. """
+
+    return COMMENT.sub(lambda match: match.group() if match.group() == "\\%" else "", text)
+
+class BibItem(NamedTuple):
+    """ A single entry of the bibliography. """
+
+    key: str
+    ordinal: int # The number the entry is cited with, starting at 1.
+    line: int # The line of the paper the \bibitem is on.
+    dois: tuple
+    urls: tuple
+    arxiv: tuple
+    file: str = None # The file the \bibitem is in, for papers of several files.
+
+class Bibliography():
+    """ A compact index of the bibitems of a paper, with their DOIs, URLs and arXiv ids.
+
+    The references are stored in flat arrays: every DOI, URL and arXiv id keeps the ordinal of
+    the bibitem it belongs to (0 if it comes before the first one).
+    """
+
+    def __init__(self, text: str, first_line: int = 1, locate = None):
+        self.keys = []
+        self.lines = array("I")
+        self.files = [] # Only for papers of several files, where locate maps a line of the paper to its (file, line).
+
+        self.dois, self.doi_items = [], array("I")
+        self.urls, self.url_items = [], array("I")
+        self.arxiv, self.arxiv_items = [], array("I")
+
+        self.by_key = {}
+        self.by_doi = {} # Every DOI with the ordinals of the bibitems that cite it.
+
+        # Comments are removed line by line, so that line numbers are kept.
+        text = uncomment(text)
+        line, position = first_line, 0
+        for match in TOKENS.finditer(text):
+            kind = match.lastgroup
+            ordinal = len(self.keys)
+
+            if kind == "key":
+                line += text.count("\n", position, match.start())
+                position = match.start()
+
+                self.keys.append(match.group("key"))
+                if locate is None:
+                    self.lines.append(line)
+                else:
+                    file, file_line = locate(line)
+                    self.files.append(file)
+                    self.lines.append(file_line)
+                self.by_key.setdefault(match.group("key"), len(self.keys))
+            elif kind == "doi":
+                doi = match.group("doi")
+                if not DOI_START.search(doi):
+                    continue
+
+                self.dois.append(doi)
+                self.doi_items.append(ordinal)
+
+                ordinals = self.by_doi.setdefault(doi, [])
+                if ordinal not in ordinals:
+                    ordinals.append(ordinal)
+            elif kind == "url":
+                self.urls.append(match.group("url"))
+                self.url_items.append(ordinal)
+            elif kind == "arxiv":
+                self.arxiv.append(match.group("arxiv"))
+                self.arxiv_items.append(ordinal)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def unique_dois(self) -> list:
+        """ The distinct DOIs, in the order they are first cited. """
+
+        return list(self.by_doi)
+
+    def ordinals(self, doi: str) -> list:
+        """ The ordinals of the bibitems that cite a DOI, with 0 for a DOI before the first bibitem. """
+
+        return self.by_doi.get(doi, [])
+
+    def references(self, doi: str) -> str:
+        """ The bibitems that cite a DOI, as we report them, e.g. "3, 7". """
+
+        return ", ".join(str(ordinal) if ordinal else "outside any bibitem" for ordinal in self.ordinals(doi))
+
+    def duplicates(self) -> dict:
+        """ The DOIs cited by more than one bibitem. """
+
+        return {doi: ordinals for doi, ordinals in self.by_doi.items() if len(ordinals) > 1}
+
+    def item(self, ordinal: int) -> BibItem:
+        """ Returns the bibitem with a given ordinal (starting at 1). """
+
+        def of(values, items):
+            return tuple(value for value, item in zip(values, items) if item == ordinal)
+
+        return BibItem(
+            self.keys[ordinal - 1], ordinal, self.lines[ordinal - 1],
+            of(self.dois, self.doi_items), of(self.urls, self.url_items), of(self.arxiv, self.arxiv_items),
+            self.files[ordinal - 1] if self.files else None
+        )
+
+    def items(self) -> list:
+        """ Returns every bibitem, grouping their references in a single pass. """
+
+        grouped = [([], [], []) for _ in self.keys]
+        for index, (values, items) in enumerate([(self.dois, self.doi_items), (self.urls, self.url_items), (self.arxiv, self.arxiv_items)]):
+            for value, item in zip(values, items):
+                if item:
+                    grouped[item - 1][index].append(value)
+
+        files = self.files or [None] * len(self.keys)
+
+        return [
+            BibItem(key, ordinal, line, tuple(dois), tuple(urls), tuple(arxiv), file)
+            for ordinal, (key, line, file, (dois, urls, arxiv)) in enumerate(zip(self.keys, self.lines, files, grouped), start = 1)
+        ]
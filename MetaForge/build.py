@@ -0,0 +1,289 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.misc import Date, print_error, print_warning
+from MetaForge.parsed_paper import ParsedPaper
+from MetaForge.assets import ASSETS, manifest, deploy_assets
+
+# Where a paper folder remembers the inputs each stage was last run with.
+STATE_FILE = ".metaforge_state.json"
+
+def digest(*parts) -> str:
+    content = hashlib.sha256()
+    for part in parts:
+        content.update(str(part).encode("utf-8"))
+        content.update(b"\0")
+
+    return content.hexdigest()
+
+class Build():
+    """ The publication pipeline of a paper as a graph of stages, each rerun only when its inputs change.
+
+    format -> abstract -> jats, then the DOI check and the templates. Every stage has a key made
+    of its own inputs (the paper and the DOI/date for format, the abstract span for abstract and
+    jats, the bibliography span for the DOI check, the template hashes for the templates). A stage
+    runs when its key differs from the one in the state file, when its outputs are missing, or
+    when a stage it depends on ran. The messages a stage returns are kept in the state file too,
+    and printed again whenever the stage is skipped.
+    """
+
+    def __init__(self, paper_path: str, doi: str, date: str, check_dois: bool = True, compile: bool = False):
+        self.paper_path = Path(paper_path).resolve()
+        self.folder = self.paper_path.parent
+        self.doi = doi
+        self.date = date
+        self.check_dois = check_dois
+
+        self.output = self.folder / f"{doi.replace('.', '_')}.tex"
+        self.abstract_path = self.folder / "Abstract.txt"
+        self.state_path = self.folder / STATE_FILE
+
+        self.stages = [
+            # (name, stages it depends on, inputs, outputs, action)
+            ("format", [], self.format_inputs, [self.output], self.run_format),
+            ("abstract", [], self.abstract_inputs, [self.abstract_path], self.run_abstract),
+            ("jats", ["abstract"], self.jats_inputs, [self.abstract_path], self.run_jats),
+            ("dois", [], self.doi_inputs, [], self.run_dois),
+            ("assets", [], self.asset_inputs, [self.folder / target for _, target in ASSETS], self.run_assets),
+        ]
+
+        # Compiling needs a TeX installation, so it is only part of the build when asked for.
+        if compile:
+            self.stages.append(("compile", ["format", "assets"], self.compile_inputs, [self.output.with_suffix(".pdf")], self.run_compile))
+
+        self._formatted = None
+
+    # ============================================================
+
+    def load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state: dict) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir = self.folder, prefix = f"{STATE_FILE}.")
+        try:
+            with os.fdopen(descriptor, "w") as f:
+                json.dump(state, f, indent = 1)
+            os.replace(temporary, self.state_path)
+        finally:
+            # The temporary file is only left when something failed before it replaced the state.
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+    @property
+    def formatted(self) -> ParsedPaper:
+        """ The formatted paper, read back from the folder if the format stage did not run. """
+
+        if self._formatted is None:
+            from MetaForge.project import Project
+
+            with Project(self.output) as project:
+                self._formatted = project.parsed
+
+        return self._formatted
+
+    def span_text(self, name: str) -> str:
+        try:
+            start, end = getattr(self.formatted, name)
+        except IndexError:
+            return ""
+
+        return self.formatted.text[start:end]
+
+    # ============================================================
+
+    def format_inputs(self) -> str:
+        from MetaForge.project import Project
+
+        # Every file the format stage reads, so that a change to an included section reruns it too.
+        with Project(self.paper_path) as project:
+            return digest(*[hashlib.sha256(source.data).hexdigest() for source in project.files], self.doi, self.date)
+
+    def abstract_inputs(self) -> str:
+        return digest(self.span_text("abstract_span"))
+
+    def jats_inputs(self) -> str:
+        from MetaForge.jats import CONVERTER_VERSION
+
+        return digest(self.span_text("abstract_span"), CONVERTER_VERSION)
+
+    def doi_inputs(self) -> str:
+        return digest(self.span_text("bibliography_span"), self.check_dois)
+
+    def asset_inputs(self) -> str:
+        return digest(*[target_digest for _, _, _, target_digest in manifest()])
+
+    def compile_inputs(self) -> str:
+        return digest(self.formatted.text, self.asset_inputs())
+
+    def run_format(self) -> list:
+        from MetaForge.paper import Paper
+        from MetaForge import rewrite
+        from MetaForge.lint import describe_hit, print_hits
+
+        from MetaForge.project import Project, publication_paths
+
+        with Project(self.paper_path) as project:
+            formatted, report = rewrite.format_publication(project.text, self.doi, Date.from_DMY(self.date))
+            Paper.print_report(report)
+
+            project.write_edits(report.edits, publication_paths(self.paper_path, self.output.stem))
+
+        self._formatted = ParsedPaper(formatted)
+
+        # Like make_publication_format, we report anything of the template that survived the rewrite.
+        with Project(self.output) as output:
+            hits = output.lint(self.doi.split(".")[0])
+            print_hits(hits, self.output.name)
+
+        return report.messages() + [(hit.level, describe_hit(hit, self.output.name)) for hit in hits]
+
+    def abstract_text(self) -> str:
+        try:
+            return self.formatted.abstract.text
+        except IndexError:
+            return None
+
+    def run_abstract(self) -> list:
+        text = self.abstract_text()
+        self.abstract_path.write_text(text or "")
+
+        if text is None:
+            print_error("No abstract found.")
+            return [("error", "No abstract found.")]
+
+        return []
+
+    def run_jats(self) -> None:
+        from MetaForge.write_jats_abstract import write_jats_abstract
+
+        # After a run, Abstract.txt holds the JATS too, so that we start again from the abstract of the paper,
+        # e.g. when only the converter changed.
+        self.abstract_path.write_text(self.abstract_text() or "")
+        write_jats_abstract(str(self.abstract_path))
+
+    def run_dois(self) -> list:
+        from MetaForge.paper import Paper
+
+        if not self.check_dois:
+            return []
+
+        _, messages = Paper.wrong_dois(self.formatted)
+        Paper.print_messages(messages)
+
+        return messages
+
+    def run_assets(self) -> None:
+        deploy_assets(self.folder)
+
+    def run_compile(self) -> None:
+        from MetaForge.latex import compile_paper, print_compile_report
+
+        result = compile_paper(self.output, self.doi)
+        print_compile_report([result])
+
+        if not result["ok"]:
+            raise RuntimeError(f"Could not compile {self.output.name}.")
+
+    # ============================================================
+
+    def run(self, force: bool = False) -> list:
+        """ Runs the stages whose inputs changed. Returns the names of the stages that ran. """
+
+        from MetaForge.paper import Paper
+
+        state = self.load_state()
+        keys = state.setdefault("stages", {})
+        messages = state.setdefault("messages", {})
+
+        ran = []
+        for name, depends, inputs, outputs, action in self.stages:
+            key = inputs()
+            stale = (
+                force or keys.get(name) != key
+                or any(not output.exists() for output in outputs)
+                or any(dependency in ran for dependency in depends)
+            )
+
+            if stale:
+                with trace.span(name, paper = str(self.paper_path)):
+                    messages[name] = [list(message) for message in action() or []]
+                ran.append(name)
+
+                keys[name] = key
+                self.save_state(state)
+            else:
+                # A rerun that skips a stage still shows what was wrong the last time it ran.
+                trace.count("build.skipped")
+                Paper.print_messages(messages.get(name, []))
+
+        return ran
+
+    def versions(self) -> tuple:
+        """ The (path, modification time, size) of the paper and of every file it includes. """
+
+        from MetaForge.project import Project
+
+        with Project(self.paper_path) as project:
+            return tuple((source.path, *source.version) for source in project.tree())
+
+    def watch(self, interval: float = 0.5) -> None:
+        """ Reruns the pipeline every time the paper, or a file it includes, is saved, until interrupted. """
+
+        last = None
+        while True:
+            try:
+                modified = self.versions()
+            except FileNotFoundError:
+                modified = None # Editors may replace the file while saving it.
+
+            if modified is not None and modified != last:
+                last = modified
+                start = time.perf_counter()
+                try:
+                    ran = self.run()
+                    print(f"Ran {', '.join(ran) or 'nothing'} in {time.perf_counter() - start:.3f} s.")
+                except Exception as error:
+                    print_warning(f"Build failed: {error}")
+
+            time.sleep(interval)
+
+if __name__ == "__main__":
+    from MetaForge.make_publication_format import resolve_publication_date
+
+    parser = argparse.ArgumentParser(prog = "metaforge build", description = "Incrementally build the publication files of a paper.")
+    parser.add_argument("latex_file")
+    parser.add_argument("target_doi")
+    parser.add_argument("publish_date") # DD-MM-YYYY or int (for days from today).
+    parser.add_argument("--watch", action = "store_true", help = "Rebuild whenever the paper, or a file it includes, is saved.")
+    parser.add_argument("--interval", type = float, default = 0.5, help = "How often to look for changes when watching, in seconds.")
+    parser.add_argument("--force", action = "store_true", help = "Run every stage.")
+    parser.add_argument("--no-doi-check", action = "store_true")
+    parser.add_argument("--compile", action = "store_true", help = "Also compile the formatted paper with latexmk.")
+
+    args = parser.parse_args()
+    build = Build(args.latex_file, args.target_doi, resolve_publication_date(args.publish_date), not args.no_doi_check, args.compile)
+
+    if args.watch:
+        try:
+            build.watch(args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        try:
+            ran = build.run(args.force)
+        except RuntimeError as error:
+            print_error(str(error))
+            raise SystemExit(1)
+
+        print(f"Ran {', '.join(ran) or 'nothing'}.")
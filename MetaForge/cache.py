@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import os
+import re
+import tempfile
+
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.jats import CONVERTER_VERSION, resolve_backend, to_jats_many
+
+# The cache lives in the user cache folder unless told otherwise.
+DEFAULT_CACHE_DIR = Path(os.environ.get("METAFORGE_CACHE_DIR", Path.home() / ".cache" / "metaforge"))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# How many writes a process does before it trims the cache back to size.
+PRUNE_EVERY = 100
+
+def normalize_abstract(text: str) -> str:
+    """ Normalizes the whitespace of an abstract, keeping its paragraph breaks. """
+
+    paragraphs = [re.sub(r"\s+", " ", paragraph).strip() for paragraph in re.split(r"\n\s*\n", text)]
+
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+
+class JatsCache():
+    """ A content-addressed, size-bounded on-disk cache of JATS conversions. """
+
+    def __init__(self, folder = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.folder = Path(folder) if folder is not None else DEFAULT_CACHE_DIR / "jats"
+        self.max_bytes = max_bytes
+        self.writes = 0
+
+    def key(self, text: str, backend: str = "auto") -> str:
+        """ Returns the cache key of an abstract for a given backend. """
+
+        # "auto" converts differently with and without pandoc, so that the key holds what it resolves to.
+        content = f"{CONVERTER_VERSION}\0{resolve_backend(backend)}\0{normalize_abstract(text)}"
+
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.folder / key[:2] / f"{key}.xml"
+
+    def get(self, key: str):
+        """ Returns the cached conversion for a key, or None if there is none. """
+
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding = "utf-8") as f:
+                jats = f.read()
+        except FileNotFoundError:
+            return None
+
+        # We touch the entry so that pruning evicts the least recently used ones first.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return jats
+
+    def put(self, key: str, jats: str) -> None:
+        """ Stores a conversion. Concurrent writers of the same key are harmless. """
+
+        path = self.path(key)
+        path.parent.mkdir(parents = True, exist_ok = True)
+
+        # We write to a temporary file first, so that readers never see half an entry.
+        descriptor, temporary = tempfile.mkstemp(dir = path.parent, suffix = ".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding = "utf-8") as f:
+                f.write(jats)
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok = True)
+            raise
+
+        self.writes += 1
+        if self.writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def convert(self, text: str, backend: str = "auto") -> str:
+        """ Returns the JATS of an abstract, converting it only if it is not cached yet. """
+
+        return self.convert_many([text], backend)[0]
+
+    def convert_many(self, texts: list, backend: str = "auto") -> list:
+        """ Returns the JATS of many abstracts, converting those that are not cached yet together. """
+
+        keys = [self.key(text, backend) for text in texts]
+        results = [self.get(key) for key in keys]
+
+        missing = [index for index, jats in enumerate(results) if jats is None]
+        trace.count("jats_cache.hit", len(texts) - len(missing))
+        trace.count("jats_cache.miss", len(missing))
+
+        for index, jats in zip(missing, to_jats_many([texts[index] for index in missing], backend) if missing else []):
+            results[index] = jats
+            try:
+                self.put(keys[index], jats)
+            except OSError:
+                pass # A read-only or full disk should not stop the conversion.
+
+        return results
+
+    def entries(self) -> list:
+        """ Returns (modification time, size, path) of every entry, oldest first. """
+
+        entries = []
+        for path in self.folder.glob("*/*.xml"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue # Removed by another process in the meantime.
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        return sorted(entries)
+
+    def prune(self, max_bytes: int = None) -> int:
+        """ Evicts the least recently used entries until the cache fits. Returns how many were removed. """
+
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+
+            path.unlink(missing_ok = True)
+            total -= size
+            removed += 1
+
+        return removed
+
+    def clear(self) -> int:
+        return self.prune(0)
+
+# The cache shared by all abstracts of a process.
+jats_cache = JatsCache()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge jats-cache", description = "Inspect and prune the JATS abstract cache.")
+    parser.add_argument("command", choices = ["info", "prune", "clear"])
+    parser.add_argument("--folder", default = None)
+    parser.add_argument("--max-size", type = int, default = DEFAULT_MAX_BYTES, help = "Size limit in bytes when pruning.")
+
+    args = parser.parse_args()
+    cache = JatsCache(args.folder, args.max_size)
+
+    if args.command == "info":
+        entries = cache.entries()
+        print(f"Folder: {cache.folder}")
+        print(f"Entries: {len(entries)}")
+        print(f"Size: {sum(size for _, size, _ in entries)} bytes")
+    elif args.command == "prune":
+        print(f"Removed {cache.prune()} entries.")
+    else:
+        print(f"Removed {cache.clear()} entries.")
@@ -1,7 +1,7 @@
 import argparse
 
 from MetaForge.paper import Paper
-from MetaForge.misc import Date
+from MetaForge.misc import Date, write_atomic
 
 from datetime import date
 from datetime import timedelta
@@ -9,7 +9,7 @@ from datetime import timedelta
 if __name__ == "__main__":
     print("Changing date...")
     
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(prog = "metaforge date")
     parser.add_argument("latex_file")
     parser.add_argument("publish_date") # DD-MM-YYYY
 
@@ -18,17 +18,15 @@ if __name__ == "__main__":
     # We read the file first
     with open(args.latex_file, "r") as f:
         paper = f.read()
-        f.close()
     
-    # We now open it with write permissions to clean it first.
-    with open(args.latex_file, "w") as f:
-        if args.publish_date.isdigit():
-            # We want to publish with a delay.
-            publication_date = (date.today() + timedelta(days = int(args.publish_date))).strftime("%d-%m-%Y")
-        else:
-            # We want to publish on a specific date.
-            publication_date = args.publish_date
-        
-        paper = Paper.set_date(paper, Date.from_DMY(publication_date))
-        f.write(paper)
-        f.close()
+    if args.publish_date.isdigit():
+        # We want to publish with a delay.
+        publication_date = (date.today() + timedelta(days = int(args.publish_date))).strftime("%d-%m-%Y")
+    else:
+        # We want to publish on a specific date.
+        publication_date = args.publish_date
+    
+    paper = Paper.set_date(paper, Date.from_DMY(publication_date))
+    
+    # Only once the new paper is complete do we replace the old one, so that a failure leaves it untouched.
+    write_atomic(args.latex_file, paper)
@@ -0,0 +1,118 @@
+import argparse
+import json
+import runpy
+import subprocess
+import sys
+
+# Every subcommand, with the module whose command line it runs. Modules are only imported
+# once their subcommand is chosen, so each command only pays for what it uses.
+COMMANDS = {
+    "publish": ("MetaForge.make_publication_format", "Write the publication version of a paper."),
+    "date": ("MetaForge.change_date", "Change the publication date of a formatted paper."),
+    "jats": ("MetaForge.write_jats_abstract", "Convert an Abstract.txt to JATS."),
+    "batch": ("MetaForge.batch", "Publish a whole manifest of papers."),
+    "schedule": ("MetaForge.scheduler", "Schedule a queue of formatted papers and date them."),
+    "build": ("MetaForge.build", "Incrementally build the publication files of a paper."),
+    "compile": ("MetaForge.latex", "Compile formatted papers and check their PDFs."),
+    "lint": ("MetaForge.lint", "Look for template leftovers in formatted papers."),
+    "project": ("MetaForge.project", "Show the files of a LaTeX project and where its fields come from."),
+    "deposit": ("MetaForge.crossref", "Write the Crossref deposit of a manifest of papers."),
+    "assets": ("MetaForge.assets", "Deploy the templates or find outdated SciPost.cls files."),
+    "jats-cache": ("MetaForge.cache", "Inspect or clear the cache of JATS abstracts."),
+    "doi-cache": ("MetaForge.doi_cache", "Inspect, warm or purge the cache of DOI checks."),
+    "doi-index": ("MetaForge.doi_offline", "Build the offline index of known DOIs, or check DOIs against it."),
+    "daemon": ("MetaForge.daemon", "Keep MetaForge warm in the background, and send it jobs."),
+    "synthetic": ("MetaForge.synthetic", "Generate a synthetic SciPost paper."),
+    "benchmark": ("MetaForge.benchmark", "Benchmark MetaForge on synthetic papers."),
+}
+
+# How long importing the module of a quick command may take, in seconds.
+IMPORT_BUDGETS = {
+    "date": 0.15,
+    "jats": 0.15,
+    "jats-cache": 0.15,
+    "publish": 0.2,
+    "daemon": 0.15, # The client, which editorial tools start for every small request.
+}
+
+# Modules only the commands that go to the network, or run in parallel, should load.
+HEAVY_MODULES = ("tqdm", "requests", "asyncio", "ssl", "sqlite3", "multiprocessing", "concurrent.futures")
+
+IMPORT_PROBE = """
+import sys, time, json, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps([time.perf_counter() - start, list(sys.modules)]))
+"""
+
+def import_cost(module: str, repeat: int = 3) -> tuple:
+    """ Imports a module in fresh interpreters. Returns the best time and the modules it loaded. """
+
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE, module], capture_output = True, text = True, check = True).stdout
+        seconds, loaded = json.loads(output)
+        best = min(best, seconds)
+
+    return best, loaded
+
+def check_import_budgets(repeat: int = 3, scale: float = 1.0) -> bool:
+    """ Checks that the quick commands import within their budget and without the heavy modules. Returns True if they do. """
+
+    from MetaForge.misc import print_error
+
+    ok = True
+    for command, budget in IMPORT_BUDGETS.items():
+        module = COMMANDS[command][0]
+        seconds, loaded = import_cost(module, repeat)
+        heavy = [name for name in HEAVY_MODULES if name in loaded]
+
+        print(f"{command:>12} {seconds * 1e3:8.1f} ms (budget {budget * scale * 1e3:.0f} ms)")
+        if seconds > budget * scale:
+            print_error(f"{command}: importing {module} takes {seconds * 1e3:.1f} ms.")
+            ok = False
+        if heavy:
+            print_error(f"{command}: importing {module} loads {', '.join(heavy)}.")
+            ok = False
+
+    return ok
+
+def main(argv: list = None) -> int:
+    commands = "\n".join(f"  {name:<12} {description}" for name, (_, description) in COMMANDS.items())
+    commands += "\n  import-time  Check that the quick commands still start fast."
+
+    parser = argparse.ArgumentParser(
+        prog = "metaforge",
+        description = "Prepare SciPost papers for publication.",
+        epilog = f"commands:\n{commands}\n\nRun metaforge <command> -h for the options of a command.",
+        formatter_class = argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices = list(COMMANDS) + ["import-time"], metavar = "command")
+    parser.add_argument("arguments", nargs = argparse.REMAINDER)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        parser.print_help()
+        return 2
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import-time":
+        budget_parser = argparse.ArgumentParser(prog = "metaforge import-time")
+        budget_parser.add_argument("--repeat", type = int, default = 3)
+        budget_parser.add_argument("--scale", type = float, default = 1.0, help = "Multiply the budgets, e.g. on slow machines.")
+        budget_args = budget_parser.parse_args(args.arguments)
+
+        return 0 if check_import_budgets(budget_args.repeat, budget_args.scale) else 1
+
+    # The module runs as if it was started with python -m, with our arguments. It also has to be
+    # the __main__ module, so that the workers of batch and schedule can find their functions.
+    # runpy then sets sys.argv[0] to the path of the module, so each command names itself with
+    # the prog of its parser instead.
+    sys.argv = [f"metaforge {args.command}"] + args.arguments
+    runpy.run_module(COMMANDS[args.command][0], run_name = "__main__", alter_sys = True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,548 @@
+import argparse
+import html
+import os
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+
+from importlib import resources
+from pathlib import Path
+from xml.sax.saxutils import XMLGenerator
+
+from MetaForge import trace
+from MetaForge.misc import Date, print_error, print_warning
+from MetaForge.parsed_paper import ParsedPaper
+from MetaForge.jats import latex_to_jats
+
+CROSSREF_VERSION = "5.3.1"
+CROSSREF_NAMESPACE = f"http://www.crossref.org/schema/{CROSSREF_VERSION}"
+JATS_NAMESPACE = "http://www.ncbi.nlm.nih.gov/JATS1"
+XSI_NAMESPACE = "http://www.w3.org/2001/XMLSchema-instance"
+
+DOI_PREFIX = "10.21468"
+
+# The official schema, vendored with fetch_schema into the package together with everything it includes.
+SCHEMA_URL = f"https://www.crossref.org/schemas/crossref{CROSSREF_VERSION}.xsd"
+SCHEMA_DIR = Path(resources.files("MetaForge") / "schemas")
+
+# The journals we deposit for: (full title, abbreviated title, electronic ISSN if we have it on record).
+JOURNALS = {
+    "SciPostPhys": ("SciPost Physics", "SciPost Phys.", "2542-4653"),
+    "SciPostPhysCore": ("SciPost Physics Core", "SciPost Phys. Core", "2666-9366"),
+    "SciPostPhysProc": ("SciPost Physics Proceedings", "SciPost Phys. Proc.", "2666-4003"),
+    "SciPostPhysLectNotes": ("SciPost Physics Lecture Notes", "SciPost Phys. Lect. Notes", "2590-1990"),
+    "SciPostPhysCodeb": ("SciPost Physics Codebases", "SciPost Phys. Codebases", None),
+    "SciPostChem": ("SciPost Chemistry", "SciPost Chem.", None),
+}
+
+FORMULA = re.compile(r"<jats:inline-formula>.*?<!\[CDATA\[(.*?)\]\]>.*?</jats:inline-formula>", re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+
+def plain_text(tex: str) -> str:
+    """ Turns a LaTeX snippet like a title into plain text, keeping its formulas as $...$. """
+
+    text = latex_to_jats(tex, strict = False)
+    text = FORMULA.sub(lambda match: f"${match.group(1)}$", text)
+    text = html.unescape(TAG.sub("", text))
+
+    return " ".join(text.split())
+
+def issue_numbers(doi: str) -> tuple:
+    """ Splits a DOI like SciPostPhys.13.4.021 into its (volume, issue, article number), missing ones as None. """
+
+    numbers = doi.split(".")[1:]
+    volume = numbers[0] if len(numbers) > 1 else None
+    issue = numbers[1] if len(numbers) > 2 else None
+
+    return volume, issue, numbers[-1]
+
+class DepositWriter():
+    """ Writes a Crossref deposit incrementally, one journal article at a time.
+
+    Nothing but the paper being written is kept in memory, so a deposit of a whole backlog
+    costs as much memory as its largest paper.
+
+        with open("deposit.xml", "w") as f, DepositWriter(f, email = "admin@scipost.org") as deposit:
+            for path, doi, date in papers:
+                deposit.write_paper(open(path).read(), doi, date)
+    """
+
+    def __init__(self, stream, email: str, depositor: str = "SciPost", registrant: str = "SciPost", batch_id: str = None):
+        self.stream = stream
+        self.generator = XMLGenerator(stream, encoding = "utf-8", short_empty_elements = True)
+        self.email = email
+        self.depositor = depositor
+        self.registrant = registrant
+        self.timestamp = time.strftime("%Y%m%d%H%M%S")
+        self.batch_id = batch_id or f"metaforge-{self.timestamp}"
+        self.articles = 0
+
+    # ============================================================
+
+    def open(self, name: str, attributes: dict = None) -> None:
+        self.generator.startElement(name, attributes or {})
+
+    def close(self, name: str) -> None:
+        self.generator.endElement(name)
+
+    def element(self, name: str, text = None, attributes: dict = None) -> None:
+        self.open(name, attributes)
+        if text is not None:
+            self.generator.characters(str(text))
+        self.close(name)
+
+    def raw(self, xml: str) -> None:
+        """ Writes XML we already have as text, like the JATS of an abstract, as is. """
+
+        # The generator writes whitespace unescaped, and closes any pending start tag first.
+        self.generator.ignorableWhitespace(xml)
+
+    # ============================================================
+
+    def start(self) -> None:
+        self.generator.startDocument()
+        self.open("doi_batch", {
+            "version": CROSSREF_VERSION,
+            "xmlns": CROSSREF_NAMESPACE,
+            "xmlns:xsi": XSI_NAMESPACE,
+            "xmlns:jats": JATS_NAMESPACE,
+            "xsi:schemaLocation": f"{CROSSREF_NAMESPACE} https://www.crossref.org/schemas/crossref{CROSSREF_VERSION}.xsd",
+        })
+
+        self.open("head")
+        self.element("doi_batch_id", self.batch_id)
+        self.element("timestamp", self.timestamp)
+        self.open("depositor")
+        self.element("depositor_name", self.depositor)
+        self.element("email_address", self.email)
+        self.close("depositor")
+        self.element("registrant", self.registrant)
+        self.close("head")
+
+        self.open("body")
+
+    def end(self) -> None:
+        self.close("body")
+        self.close("doi_batch")
+        self.generator.endDocument()
+        self.stream.write("\n")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, *exception):
+        # We leave a broken deposit unterminated, so that it cannot be mistaken for a complete one.
+        if exception_type is None:
+            self.end()
+
+    # ============================================================
+
+    def publication_date(self, date: Date, media_type: str = "online", year_only: bool = False) -> None:
+        self.open("publication_date", {"media_type": media_type})
+        if not year_only:
+            self.element("month", f"{date.month:02d}")
+            self.element("day", f"{date.day:02d}")
+        self.element("year", date.year)
+        self.close("publication_date")
+
+    def contributors(self, authors: list, affiliations: dict) -> None:
+        self.open("contributors")
+        for position, author in enumerate(authors):
+            # Crossref wants the family name apart; we take it to be the last word of the name.
+            names = plain_text(author.name).split()
+            sequence = "first" if position == 0 else "additional"
+
+            self.open("person_name", {"sequence": sequence, "contributor_role": "author"})
+            if len(names) > 1:
+                self.element("given_name", " ".join(names[:-1]))
+            self.element("surname", names[-1])
+
+            institutions = [affiliations[affid] for affid in author.affiliations if affid in affiliations]
+            if institutions:
+                self.open("affiliations")
+                for institution in institutions:
+                    self.open("institution")
+                    self.element("institution_name", institution)
+                    self.close("institution")
+                self.close("affiliations")
+
+            self.close("person_name")
+        self.close("contributors")
+
+    def citations(self, paper: ParsedPaper, doi: str) -> None:
+        """ The citation list of a paper, with the DOI of every bibitem that has one. """
+
+        try:
+            items = paper.bibliography_index.items()
+        except IndexError:
+            print_warning(f"{doi}: no bibliography found, the article has no citations.")
+            return
+
+        citations = [item for item in items if item.dois or item.arxiv or item.urls]
+        if not citations:
+            return
+
+        self.open("citation_list")
+        for item in citations:
+            self.open("citation", {"key": f"ref{item.ordinal}"})
+            if item.dois:
+                self.element("doi", item.dois[0])
+            elif item.arxiv:
+                self.element("unstructured_citation", f"arXiv:{item.arxiv[0]}")
+            else:
+                self.element("unstructured_citation", item.urls[0])
+            self.close("citation")
+        self.close("citation_list")
+
+    def write_paper(self, paper, doi: str, date: Date) -> bool:
+        """ Writes the journal article of a paper. Returns False, writing nothing, if the paper lacks its metadata. """
+
+        paper = ParsedPaper.of(paper)
+        journal = doi.split(".")[0]
+
+        # Everything that can fail is extracted before we write anything, so that the deposit stays well formed.
+        try:
+            title = plain_text(paper.title)
+            abstract = paper.abstract.jats
+        except IndexError as error:
+            print_error(f"{doi}: {error}")
+            return False
+
+        try:
+            authors = paper.authors
+            affiliations = {affid: plain_text(affiliation) for affid, affiliation in paper.affiliations.items()}
+        except (IndexError, ValueError) as error:
+            print_warning(f"{doi}: {error} The article has no contributors.")
+            authors, affiliations = [], {}
+
+        if journal not in JOURNALS:
+            print_warning(f"{doi}: {journal} is not a known journal, it is deposited under its code.")
+        full_title, abbreviated_title, issn = JOURNALS.get(journal, (journal, None, None))
+        volume, issue, article_number = issue_numbers(doi)
+
+        with trace.span("crossref.article", doi = doi):
+            self.open("journal")
+
+            self.open("journal_metadata", {"language": "en"})
+            self.element("full_title", full_title)
+            if abbreviated_title:
+                self.element("abbrev_title", abbreviated_title)
+            if issn:
+                self.element("issn", issn, {"media_type": "electronic"})
+            self.close("journal_metadata")
+
+            if volume is not None:
+                self.open("journal_issue")
+                self.publication_date(date, year_only = True)
+                self.open("journal_volume")
+                self.element("volume", volume)
+                self.close("journal_volume")
+                if issue is not None:
+                    self.element("issue", issue)
+                self.close("journal_issue")
+
+            self.open("journal_article", {"publication_type": "full_text"})
+            self.open("titles")
+            self.element("title", title)
+            self.close("titles")
+
+            if authors:
+                self.contributors(authors, affiliations)
+
+            self.open("jats:abstract")
+            self.raw(abstract)
+            self.close("jats:abstract")
+
+            self.publication_date(date)
+            self.open("publisher_item")
+            self.element("item_number", article_number, {"item_number_type": "article_number"})
+            self.close("publisher_item")
+
+            self.open("doi_data")
+            self.element("doi", f"{DOI_PREFIX}/{doi}")
+            self.element("resource", f"https://scipost.org/{DOI_PREFIX}/{doi}")
+            self.close("doi_data")
+
+            self.citations(paper, doi)
+
+            self.close("journal_article")
+            self.close("journal")
+
+        self.stream.flush()
+        self.articles += 1
+        trace.count("crossref.articles")
+
+        return True
+
+# ============================================================
+
+# The part of the Crossref schema we write, as (child, minimum, maximum) sequences; None is unbounded.
+# Deposits are checked against the official XSD when lxml and the vendored schema are there, and
+# against this structural subset otherwise, in which case Crossref may still reject what it accepts.
+SCHEMA = {
+    "doi_batch": [("head", 1, 1), ("body", 1, 1)],
+    "head": [("doi_batch_id", 1, 1), ("timestamp", 1, 1), ("depositor", 1, 1), ("registrant", 1, 1)],
+    "depositor": [("depositor_name", 1, 1), ("email_address", 1, 1)],
+    "body": [("journal", 1, None)],
+    "journal": [("journal_metadata", 1, 1), ("journal_issue", 0, 1), ("journal_article", 0, None)],
+    "journal_metadata": [("full_title", 1, None), ("abbrev_title", 0, None), ("issn", 0, 6)],
+    "journal_issue": [("publication_date", 1, 10), ("journal_volume", 0, 1), ("issue", 0, 1)],
+    "journal_volume": [("volume", 1, 1)],
+    "journal_article": [
+        ("titles", 1, 1), ("contributors", 0, 1), ("jats:abstract", 0, None), ("publication_date", 1, 10),
+        ("publisher_item", 0, 1), ("doi_data", 1, 1), ("citation_list", 0, 1),
+    ],
+    "titles": [("title", 1, 1)],
+    "contributors": [("person_name", 1, None)],
+    "person_name": [("given_name", 0, 1), ("surname", 1, 1), ("affiliations", 0, 1)],
+    "affiliations": [("institution", 1, None)],
+    "institution": [("institution_name", 1, 1)],
+    "publication_date": [("month", 0, 1), ("day", 0, 1), ("year", 1, 1)],
+    "publisher_item": [("item_number", 1, 3)],
+    "doi_data": [("doi", 1, 1), ("resource", 1, 1)],
+    "citation_list": [("citation", 1, None)],
+    "citation": [("doi", 0, 1), ("unstructured_citation", 0, 1)],
+}
+
+# What the text of the leaves must look like.
+TEXT = {
+    "timestamp": r"\d+",
+    "email_address": r"[^@\s]+@[^@\s]+",
+    "issn": r"\d{4}-\d{3}[\dX]",
+    "year": r"\d{4}",
+    "month": r"(0[1-9]|1[0-2])",
+    "day": r"(0[1-9]|[12]\d|3[01])",
+    "doi": r"10\.\d{4,9}/\S+",
+    "resource": r"(https?|ftp)://\S+",
+    "title": r".*\S.*",
+    "full_title": r".*\S.*",
+    "surname": r".*\S.*",
+}
+
+# The attributes some elements must have, with their allowed values (None for anything).
+ATTRIBUTES = {
+    "journal_article": {"publication_type": {"full_text", "abstract_only", "bibliographic_record"}},
+    "citation": {"key": None},
+    "person_name": {"contributor_role": {"author", "editor", "chair", "reviewer", "translator"}, "sequence": {"first", "additional"}},
+}
+
+def local_name(tag: str) -> str:
+    namespace, _, name = tag.rpartition("}")
+    return f"jats:{name}" if namespace == "{" + JATS_NAMESPACE else name
+
+def check_sequence(name: str, children: list) -> str:
+    """ Returns what is wrong with the children of an element, or None if they follow its sequence. """
+
+    position = 0
+    for child, minimum, maximum in SCHEMA[name]:
+        count = 0
+        while position < len(children) and children[position] == child:
+            count += 1
+            position += 1
+
+        if count < minimum:
+            return f"expected {child} in {name}"
+        if maximum is not None and count > maximum:
+            return f"too many {child} in {name}"
+
+    if position < len(children):
+        return f"unexpected {children[position]} in {name}"
+
+    return None
+
+def check_structure(path: str) -> list:
+    """ Checks a deposit against the subset of the schema we write, streaming through it. Returns the errors, as (where, message). """
+
+    errors = []
+    stack = [] # (name, children, element) of the open elements.
+
+    for event, element in ElementTree.iterparse(path, events = ("start", "end")):
+        name = local_name(element.tag)
+        inside_jats = any(open_name.startswith("jats:") for open_name, _, _ in stack)
+
+        if event == "start":
+            if stack and not inside_jats:
+                stack[-1][1].append(name)
+            stack.append((name, [], element))
+            continue
+
+        _, children, _ = stack.pop()
+        if inside_jats:
+            continue
+
+        where = "/".join([open_name for open_name, _, _ in stack] + [name])
+        if not stack and element.tag != "{" + CROSSREF_NAMESPACE + "}doi_batch":
+            errors.append((where, f"the root must be doi_batch in the {CROSSREF_NAMESPACE} namespace"))
+
+        if name in SCHEMA:
+            problem = check_sequence(name, children)
+            if problem:
+                errors.append((where, problem))
+        elif children and not name.startswith("jats:"):
+            errors.append((where, f"{name} cannot have children"))
+
+        if name in TEXT and not re.fullmatch(TEXT[name], (element.text or "").strip(), re.DOTALL):
+            errors.append((where, f"invalid {name}: {element.text!r}"))
+
+        for attribute, allowed in ATTRIBUTES.get(name, {}).items():
+            value = element.get(attribute)
+            if value is None:
+                errors.append((where, f"{name} needs a {attribute}"))
+            elif allowed is not None and value not in allowed:
+                errors.append((where, f"invalid {attribute} of {name}: {value}"))
+
+        # We forget every closed article, so that validation also runs in constant memory.
+        if name in ("journal", "doi_batch"):
+            element.clear()
+
+    return errors
+
+def load_schema(path = None):
+    """ Returns the official schema as an lxml XMLSchema, or None without lxml or the vendored XSD. """
+
+    path = SCHEMA_DIR / f"crossref{CROSSREF_VERSION}.xsd" if path is None else Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        from lxml import etree
+    except ImportError:
+        return None
+
+    return etree.XMLSchema(etree.parse(str(path)))
+
+def check_schema(path: str, schema) -> list:
+    """ Checks a deposit against an lxml XMLSchema while streaming through it. Returns the first error, as (where, message). """
+
+    from lxml import etree
+
+    try:
+        for _, element in etree.iterparse(str(path), schema = schema, tag = "{" + CROSSREF_NAMESPACE + "}journal"):
+            element.clear()
+    except etree.XMLSyntaxError as error:
+        return [(f"line {error.lineno}", error.msg)]
+
+    return []
+
+def validate_deposit(path: str, schema = None) -> list:
+    """ Checks a deposit against the official schema if we can, and against the subset we write otherwise.
+
+    Returns the errors, as (where, message).
+    """
+
+    schema = load_schema(schema)
+    if schema is None:
+        return check_structure(path)
+
+    return check_schema(path, schema)
+
+def fetch_schema(url: str = SCHEMA_URL, folder = None) -> list:
+    """ Vendors the official schema, and every file it includes or imports by a relative path, keeping their layout. Returns the paths written. """
+
+    import urllib.request
+    from urllib.parse import urljoin
+
+    folder = SCHEMA_DIR if folder is None else Path(folder)
+    base = url.rsplit("/", 1)[0] + "/"
+
+    pending, seen, written = [url], {url}, []
+    while pending:
+        location = pending.pop()
+        with urllib.request.urlopen(location, timeout = 30) as response:
+            data = response.read()
+
+        target = folder / location[len(base):]
+        target.parent.mkdir(parents = True, exist_ok = True)
+        target.write_bytes(data)
+        written.append(target)
+
+        for reference in re.findall(rb'schemaLocation="([^"]+)"', data):
+            reference = urljoin(location, reference.decode("utf-8"))
+            if reference.startswith(base) and reference not in seen:
+                seen.add(reference)
+                pending.append(reference)
+
+    return written
+
+def write_deposit(entries: list, output: str, email: str, **options) -> int:
+    """ Writes the deposit of a manifest of papers (see batch.read_manifest). Returns how many articles were written. """
+
+    from MetaForge.make_publication_format import resolve_publication_date
+    from MetaForge.project import Project
+
+    # A deposit needs at least one article, so Crossref would reject the body of an empty one.
+    if not entries:
+        raise ValueError("The manifest has no papers to deposit.")
+
+    # The deposit is only moved into place once it is complete, so that a paper failing halfway
+    # neither leaves a truncated deposit behind nor spoils the one that was there.
+    output = Path(output).resolve()
+    temporary = output.with_name(f".{output.name}.partial")
+    try:
+        with open(temporary, "w", encoding = "utf-8") as f, DepositWriter(f, email, **options) as deposit:
+            for entry in entries:
+                # Papers split over several files are deposited as a whole.
+                with Project(entry["tex"]) as project:
+                    deposit.write_paper(project.parsed, entry["doi"], Date.from_DMY(resolve_publication_date(entry["date"])))
+
+        if deposit.articles == 0:
+            raise ValueError("None of the papers could be deposited.")
+
+        os.replace(temporary, output)
+    except BaseException:
+        temporary.unlink(missing_ok = True)
+        raise
+
+    return deposit.articles
+
+if __name__ == "__main__":
+    from MetaForge.batch import read_manifest, glob_manifest
+
+    parser = argparse.ArgumentParser(prog = "metaforge deposit", description = "Write the Crossref deposit of a manifest of papers.")
+    parser.add_argument("manifest", nargs = "?", help = "A .csv or .json manifest of tex,doi,date entries.")
+    parser.add_argument("--glob", help = "Deposit every paper matching a glob instead, e.g. 'issue/*/main.tex'.")
+    parser.add_argument("--date", default = "0", help = "The publication date of the papers found with --glob.")
+    parser.add_argument("--output", default = "deposit.xml")
+    parser.add_argument("--email", help = "The email address of the depositor.")
+    parser.add_argument("--depositor", default = "SciPost")
+    parser.add_argument("--registrant", default = "SciPost")
+    parser.add_argument("--batch-id", default = None)
+    parser.add_argument("--no-validate", action = "store_true")
+    parser.add_argument("--fetch-schema", action = "store_true", help = f"Vendor the official schema from {SCHEMA_URL} and exit.")
+
+    args = parser.parse_args()
+    if args.fetch_schema:
+        print(f"Saved {len(fetch_schema())} schema files to {SCHEMA_DIR}.")
+        raise SystemExit(0)
+
+    if args.email is None:
+        parser.error("A deposit needs the --email of the depositor.")
+
+    if args.glob:
+        entries = glob_manifest(args.glob, args.date)
+    elif args.manifest:
+        entries = read_manifest(args.manifest)
+    else:
+        parser.error("Give a manifest or --glob.")
+
+    try:
+        written = write_deposit(entries, args.output, args.email, depositor = args.depositor, registrant = args.registrant, batch_id = args.batch_id)
+    except ValueError as error:
+        print_error(str(error))
+        raise SystemExit(1)
+
+    print(f"Wrote {written} of {len(entries)} articles to {args.output}.")
+
+    if not args.no_validate:
+        if load_schema() is None:
+            print_warning("Without lxml or the vendored schema (see --fetch-schema), the deposit is only checked against the part of the schema we write.")
+
+        errors = validate_deposit(args.output)
+        for where, message in errors:
+            print_error(f"{where}: {message}")
+
+        if errors:
+            raise SystemExit(1)
+
+        print("The deposit is valid.")
@@ -0,0 +1,429 @@
+import argparse
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.cache import DEFAULT_CACHE_DIR
+from MetaForge.misc import print_error
+
+# Where the daemon listens, unless told otherwise.
+DEFAULT_SOCKET = Path(os.environ.get("METAFORGE_SOCKET", DEFAULT_CACHE_DIR / "daemon.sock"))
+
+# What the jobs import, imported once when the daemon starts.
+WARM_MODULES = ("MetaForge.rewrite", "MetaForge.make_publication_format", "MetaForge.scheduler", "MetaForge.project", "MetaForge.pandoc")
+
+class DaemonError(RuntimeError):
+    """ Raised by the client when a job failed, with the traceback of the failure. """
+
+class WarmState():
+    """ Everything that is expensive to set up, kept from one job to the next: the imports, the compiled
+    rule sets and linters, the JATS and DOI caches, the DOI index and the keep-alive connections to doi.org.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._doi_cache = None
+        self._checker = None
+        self._index = None
+        self.index_loaded = False
+
+    def warm(self) -> None:
+        """ Imports and builds everything up front, so that even the first job is fast. """
+
+        # The rule sets are compiled when their modules are imported, the linters on first use.
+        for module in WARM_MODULES:
+            importlib.import_module(module)
+
+        from MetaForge.lint import LINT_RULES, lint_paper
+
+        for journal in LINT_RULES:
+            lint_paper("", journal)
+
+        # The properties open the DOI cache and index, and start the loop of the checker.
+        for name in ("doi_cache", "checker", "index"):
+            getattr(self, name)
+
+    @property
+    def doi_cache(self):
+        with self.lock:
+            if self._doi_cache is None:
+                from MetaForge.doi_cache import DoiCache
+
+                self._doi_cache = DoiCache()
+
+            return self._doi_cache
+
+    @property
+    def checker(self):
+        with self.lock:
+            if self._checker is None:
+                from MetaForge.doi_check import DoiChecker
+
+                self._checker = DoiChecker()
+                self._checker.keep_warm()
+
+            return self._checker
+
+    @property
+    def index(self):
+        with self.lock:
+            if not self.index_loaded:
+                from MetaForge.doi_offline import DoiIndex
+
+                self._index = DoiIndex.default()
+                self.index_loaded = True
+
+            return self._index
+
+# ============================================================
+# The jobs. Each takes the warm state and the arguments of the request, and returns something JSON can write.
+
+def jsonable(value):
+    """ Turns what the extractors return into JSON values. """
+
+    from MetaForge.misc import Date, Abstract, Author
+
+    if isinstance(value, Date):
+        return value.DMY()
+    if isinstance(value, Abstract):
+        return value.text
+    if isinstance(value, Author):
+        return {"name": value.name, "email": value.email, "affiliations": list(value.affiliations)}
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+
+    return value
+
+def wrong_dois(state: WarmState, parsed, offline: bool = False) -> list:
+    from MetaForge.doi_offline import check_dois
+
+    bibliography = parsed.bibliography_index
+    verdicts = check_dois(bibliography.unique_dois(), state.doi_cache, state.checker, state.index, offline)
+
+    return [
+        {"doi": doi, "normalized": verdict.normalized, "status": verdict.status, "fixes": list(verdict.fixes),
+         "references": bibliography.ordinals(doi)}
+        for doi, verdict in verdicts.items() if verdict.wrong
+    ]
+
+def format_job(state: WarmState, paper: str, doi: str, date: str, check_dois: bool = False) -> dict:
+    from MetaForge.make_publication_format import make_publication_format, resolve_publication_date
+
+    date = resolve_publication_date(date)
+    formatted, report = make_publication_format(paper, doi, date, check_dois = False)
+
+    result = {"date": date, "ok": report.ok, "messages": [list(message) for message in report.messages()]}
+    if check_dois:
+        result["wrong_dois"] = wrong_dois(state, formatted)
+
+    return result
+
+EXTRACTED_FIELDS = ("title", "authors", "abstract", "dates", "affiliations", "emails", "dois")
+
+def extract_job(state: WarmState, paper: str, fields: list = EXTRACTED_FIELDS) -> dict:
+    """ The metadata of a paper, with the file and line every field starts at. """
+
+    from MetaForge.project import Project
+
+    result = {"fields": {}, "locations": {}, "missing": []}
+    with Project(paper) as project:
+        for field in fields:
+            if field not in EXTRACTED_FIELDS:
+                raise ValueError(f"Unknown field {field}.")
+
+            try:
+                result["fields"][field] = jsonable(getattr(project.parsed, field))
+            except IndexError:
+                result["missing"].append(field)
+                continue
+
+            span = "bibliography_span" if field == "dois" else f"{field}_span"
+            if hasattr(project.parsed, span):
+                result["locations"][field] = list(project.locate(getattr(project.parsed, span)[0]))
+
+    return result
+
+def validate_job(state: WarmState, paper: str, offline: bool = False) -> dict:
+    from MetaForge.project import Project
+
+    with Project(paper) as project:
+        return {"wrong_dois": wrong_dois(state, project.parsed, offline)}
+
+def redate_job(state: WarmState, paper: str, date: str, dry_run: bool = False) -> dict:
+    from MetaForge.make_publication_format import resolve_publication_date
+    from MetaForge.scheduler import redate
+
+    return redate((paper, resolve_publication_date(date)), dry_run)
+
+def lint_job(state: WarmState, paper: str, journal: str = None, config: str = None) -> dict:
+    from MetaForge.lint import load_config
+    from MetaForge.project import Project
+
+    with Project(paper) as project:
+        hits = project.lint(journal, load_config(config) if config else None)
+
+    return {"hits": [hit._asdict() for hit in hits]}
+
+def ping_job(state: WarmState) -> dict:
+    return {"pid": os.getpid()}
+
+JOBS = {
+    "format": format_job,
+    "extract": extract_job,
+    "validate": validate_job,
+    "redate": redate_job,
+    "lint": lint_job,
+    "ping": ping_job,
+}
+
+# The arguments that are paths, which the client makes absolute, as the daemon runs elsewhere.
+PATH_ARGUMENTS = ("paper", "config")
+
+# ============================================================
+
+class ThreadOutput(io.TextIOBase):
+    """ Stands in for stdout and stderr, sending what a job prints to the buffer of its own thread. """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, "buffer", None)
+
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+class Handler(socketserver.StreamRequestHandler):
+    """ Answers the JSON requests of a connection, one per line, in order. """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write((json.dumps(self.server.daemon.run(line)) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            # We only stop once the client knows we do.
+            if self.server.daemon.stopping:
+                threading.Thread(target = self.server.shutdown).start()
+                return
+
+class Daemon():
+    """ Runs jobs for clients over a Unix socket, each on its own thread, with the state kept warm in between.
+
+    A request is a line of JSON like {"id": 1, "job": "lint", "args": {"paper": "/path/to/paper.tex"}},
+    and its answer {"id": 1, "ok": true, "result": ..., "output": "what the job printed", "seconds": 0.002},
+    or {"id": 1, "ok": false, "error": "the traceback", ...}. The "stop" job stops the daemon.
+    """
+
+    def __init__(self, path = DEFAULT_SOCKET):
+        self.path = Path(path)
+        self.state = WarmState()
+        self.started = time.time()
+        self.jobs = 0
+        self.server = None
+        self.stopping = False
+
+    def run(self, line: bytes) -> dict:
+        start = time.perf_counter()
+        response = {"id": None, "ok": False}
+
+        buffer = io.StringIO()
+        sys.stdout.local.buffer = sys.stderr.local.buffer = buffer
+        try:
+            request = json.loads(line)
+            response["id"] = request.get("id")
+            job = request["job"]
+
+            with trace.span("daemon.job", job = job):
+                if job == "stop":
+                    self.stopping = True
+                    result = {"pid": os.getpid(), "jobs": self.jobs}
+                elif job == "status":
+                    result = {"pid": os.getpid(), "uptime": time.time() - self.started, "jobs": self.jobs, "socket": str(self.path)}
+                else:
+                    result = JOBS[job](self.state, **request.get("args", {}))
+
+            response.update(ok = True, result = result)
+        except Exception:
+            response["error"] = traceback.format_exc()
+        finally:
+            sys.stdout.local.buffer = sys.stderr.local.buffer = None
+
+        self.jobs += 1
+        response.update(output = buffer.getvalue(), seconds = time.perf_counter() - start)
+
+        return response
+
+    def serve(self) -> None:
+        """ Listens until stopped, by a client or a signal. """
+
+        if self.path.exists():
+            try:
+                with Client(self.path) as client:
+                    client.call("ping")
+                raise RuntimeError(f"A daemon is already listening on {self.path}.")
+            except (ConnectionError, FileNotFoundError):
+                self.path.unlink() # Left behind by a daemon that did not stop cleanly.
+
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        self.state.warm()
+
+        # Only the user may talk to the daemon, as it reads and writes their papers.
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(str(self.path), Handler)
+        finally:
+            os.umask(umask)
+
+        self.server.daemon = self
+        self.server.daemon_threads = True
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target = self.server.shutdown).start())
+
+        sys.stdout, sys.stderr = ThreadOutput(sys.stdout), ThreadOutput(sys.stderr)
+        try:
+            print(f"Listening on {self.path}")
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.path.unlink(missing_ok = True)
+            sys.stdout, sys.stderr = sys.stdout.stream, sys.stderr.stream
+
+# ============================================================
+
+class Client():
+    """ Sends jobs to a running daemon over a single connection. """
+
+    def __init__(self, path = DEFAULT_SOCKET, timeout: float = None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(str(path))
+        except OSError:
+            self.socket.close()
+            raise
+
+        self.file = self.socket.makefile("rwb")
+        self.requests = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def request(self, job: str, **args) -> dict:
+        """ Sends a job and returns the whole answer of the daemon. """
+
+        for name in PATH_ARGUMENTS:
+            if args.get(name) is not None:
+                args[name] = str(Path(args[name]).resolve())
+
+        self.requests += 1
+        self.file.write((json.dumps({"id": self.requests, "job": job, "args": args}) + "\n").encode("utf-8"))
+        self.file.flush()
+
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection.")
+
+        return json.loads(line)
+
+    def call(self, job: str, **args):
+        """ Runs a job on the daemon, printing what it printed, and returns its result. """
+
+        response = self.request(job, **args)
+        sys.stdout.write(response.get("output", ""))
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+
+        return response["result"]
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+
+_local_state = None
+
+def run_job(job: str, path = DEFAULT_SOCKET, **args):
+    """ Runs a job on the daemon if one is listening, or in this process otherwise. """
+
+    global _local_state
+
+    try:
+        with Client(path) as client:
+            return client.call(job, **args)
+    except (FileNotFoundError, ConnectionRefusedError):
+        trace.count("daemon.fallback")
+
+    if _local_state is None:
+        _local_state = WarmState()
+
+    return JOBS[job](_local_state, **args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge daemon", description = "Keep MetaForge warm in the background, and send it jobs.")
+    parser.add_argument("--socket", default = str(DEFAULT_SOCKET))
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    subparsers.add_parser("serve", help = "Run the daemon in the foreground.")
+    subparsers.add_parser("stop", help = "Stop the daemon.")
+    subparsers.add_parser("status", help = "Show whether the daemon is running.")
+
+    format_parser = subparsers.add_parser("format", help = "Write the publication version of a paper.")
+    format_parser.add_argument("paper")
+    format_parser.add_argument("doi")
+    format_parser.add_argument("date", help = "DD-MM-YYYY, or a number of days from today.")
+    format_parser.add_argument("--check-dois", action = "store_true")
+
+    extract_parser = subparsers.add_parser("extract", help = "Extract the metadata of a paper.")
+    extract_parser.add_argument("paper")
+    extract_parser.add_argument("--fields", nargs = "+", default = list(EXTRACTED_FIELDS), choices = EXTRACTED_FIELDS)
+
+    validate_parser = subparsers.add_parser("validate", help = "Check the DOIs of a paper.")
+    validate_parser.add_argument("paper")
+    validate_parser.add_argument("--offline", action = "store_true")
+
+    redate_parser = subparsers.add_parser("redate", help = "Change the publication date of a formatted paper.")
+    redate_parser.add_argument("paper")
+    redate_parser.add_argument("date", help = "DD-MM-YYYY, or a number of days from today.")
+    redate_parser.add_argument("--dry-run", action = "store_true")
+
+    lint_parser = subparsers.add_parser("lint", help = "Look for template leftovers in a formatted paper.")
+    lint_parser.add_argument("paper")
+    lint_parser.add_argument("--journal", default = None)
+    lint_parser.add_argument("--config", default = None)
+
+    args = vars(parser.parse_args())
+    command, path = args.pop("command"), args.pop("socket")
+
+    try:
+        if command == "serve":
+            Daemon(path).serve()
+        elif command in ("stop", "status"):
+            try:
+                with Client(path) as client:
+                    print(json.dumps(client.call(command), indent = 1))
+            except (FileNotFoundError, ConnectionRefusedError):
+                print(f"No daemon is listening on {path}.")
+                raise SystemExit(1 if command == "status" else 0)
+        else:
+            print(json.dumps(run_job(command, path, **args), indent = 1))
+    except RuntimeError as error: # DaemonError too.
+        print_error(str(error))
+        raise SystemExit(1)
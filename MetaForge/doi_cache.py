@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.cache import DEFAULT_CACHE_DIR
+from MetaForge.doi_check import DoiChecker, DoiStatus, is_resolved
+
+DAY = 24 * 60 * 60
+
+# How long an answer of the resolver is trusted, depending on what it was.
+TTL_RESOLVED = 30 * DAY
+TTL_NOT_FOUND = 7 * DAY
+TTL_TRANSIENT = 60 * 60 # Bot protection (403), rate limits and server errors usually pass quickly.
+
+NOT_FOUND = {404, 410}
+
+# SQLite limits the number of parameters of a single query.
+CHUNK = 500
+
+class DoiCache():
+    """ A persistent SQLite cache of the answers of the DOI resolver. """
+
+    def __init__(self, path = None, ttl_resolved: float = TTL_RESOLVED, ttl_not_found: float = TTL_NOT_FOUND, ttl_transient: float = TTL_TRANSIENT):
+        self.path = Path(path) if path is not None else DEFAULT_CACHE_DIR / "dois.sqlite"
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+
+        self.ttl_resolved = ttl_resolved
+        self.ttl_not_found = ttl_not_found
+        self.ttl_transient = ttl_transient
+
+        # Several processes may share the cache, so we wait for each other instead of failing.
+        self.connection = sqlite3.connect(self.path, timeout = 30, check_same_thread = False)
+
+        # Threads, like the jobs of the daemon, share the connection, one query or transaction at a time.
+        self.lock = threading.RLock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS dois (doi TEXT PRIMARY KEY, status INTEGER NOT NULL, location TEXT, checked_at REAL NOT NULL)")
+        self.connection.commit()
+
+    def ttl(self, status: int) -> float:
+        """ How long an answer with this status stays valid. """
+
+        if is_resolved(status):
+            return self.ttl_resolved
+        if status in NOT_FOUND:
+            return self.ttl_not_found
+
+        return self.ttl_transient
+
+    def lookup(self, dois: list, now: float = None) -> dict:
+        """ Returns the fresh cached DoiStatus of the given DOIs, in one query per few hundred DOIs. """
+
+        now = time.time() if now is None else now
+        keys = {doi: doi.lower() for doi in dois} # DOIs are case insensitive.
+        unique = list(dict.fromkeys(keys.values()))
+
+        fresh = {}
+        for i in range(0, len(unique), CHUNK):
+            chunk = unique[i:i + CHUNK]
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT doi, status, location, checked_at FROM dois WHERE doi IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+
+            for key, status, location, checked_at in rows:
+                if now - checked_at < self.ttl(status):
+                    fresh[key] = (status, location)
+
+        # Every spelling of a cached DOI is found under the spelling it was asked for.
+        return {doi: DoiStatus(doi, *fresh[key]) for doi, key in keys.items() if key in fresh}
+
+    def store(self, results, now: float = None) -> None:
+        """ Stores DoiStatus results. """
+
+        now = time.time() if now is None else now
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO dois (doi, status, location, checked_at) VALUES (?, ?, ?, ?)",
+                [(result.doi.lower(), result.status, result.location, now) for result in results]
+            )
+
+    def check(self, dois: list, checker: DoiChecker = None, on_result = None) -> dict:
+        """ Checks DOIs, only asking the resolver for those that are not cached or have expired. """
+
+        results = self.lookup(dois)
+        if on_result is not None:
+            for result in results.values():
+                on_result(result)
+
+        # Only one spelling of each DOI that is not cached goes to the resolver.
+        missing = {}
+        for doi in dois:
+            if doi not in results:
+                missing.setdefault(doi.lower(), doi)
+
+        trace.count("doi_cache.hit", len(results))
+        trace.count("doi_cache.miss", len(missing))
+        if missing:
+            checker = DoiChecker() if checker is None else checker
+            with trace.span("doi.check", dois = len(missing)):
+                fresh = checker.check(list(missing.values()), on_result)
+
+            self.store(fresh.values())
+            fresh = {doi.lower(): result for doi, result in fresh.items()}
+            for doi in dois:
+                if doi not in results:
+                    results[doi] = fresh[doi.lower()]._replace(doi = doi)
+
+        return results
+
+    def purge(self, now: float = None) -> int:
+        """ Removes the expired entries. Returns how many were removed. """
+
+        now = time.time() if now is None else now
+        with self.lock:
+            expired = [
+                (key,) for key, status, checked_at in self.connection.execute("SELECT doi, status, checked_at FROM dois")
+                if now - checked_at >= self.ttl(status)
+            ]
+            with self.connection:
+                self.connection.executemany("DELETE FROM dois WHERE doi = ?", expired)
+
+        return len(expired)
+
+    def rows(self) -> list:
+        with self.lock:
+            return self.connection.execute("SELECT doi, status, location, checked_at FROM dois ORDER BY doi").fetchall()
+
+    def export(self, path: str) -> int:
+        """ Writes the cache to a .csv or .json file. Returns the number of entries. """
+
+        rows = self.rows()
+        fields = ["doi", "status", "location", "checked_at"]
+
+        with open(path, "w", newline = "") as f:
+            if str(path).endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(fields)
+                writer.writerows(rows)
+            else:
+                json.dump([dict(zip(fields, row)) for row in rows], f, indent = 1)
+
+        return len(rows)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge doi-cache", description = "Inspect, warm and export the DOI resolution cache.")
+    parser.add_argument("command", choices = ["stats", "warm", "export", "purge"])
+    parser.add_argument("files", nargs = "*", help = "The .tex files to warm the cache with, or the file to export to.")
+    parser.add_argument("--database", default = None)
+
+    args = parser.parse_args()
+    cache = DoiCache(args.database)
+
+    if args.command == "stats":
+        rows = cache.rows()
+        print(f"Database: {cache.path}")
+        print(f"Entries: {len(rows)}")
+        print(f"Resolved: {sum(is_resolved(row[1]) for row in rows)}")
+        print(f"Not found: {sum(row[1] in NOT_FOUND for row in rows)}")
+    elif args.command == "warm":
+        from MetaForge.parsed_paper import ParsedPaper
+
+        dois = []
+        for file in args.files:
+            dois += ParsedPaper(Path(file).read_text()).dois
+
+        results = cache.check(dois)
+        print(f"Checked {len(results)} DOIs.")
+    elif args.command == "export":
+        if len(args.files) != 1:
+            parser.error("export needs exactly one output file.")
+        print(f"Exported {cache.export(args.files[0])} entries.")
+    else:
+        print(f"Removed {cache.purge()} expired entries.")
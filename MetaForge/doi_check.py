@@ -0,0 +1,254 @@
+import asyncio
+import random
+import ssl
+import threading
+import time
+
+from typing import NamedTuple
+from urllib.parse import quote, urlsplit
+
+from MetaForge import trace
+
+# The DOI foundation resolver. A resolvable DOI answers with a redirect to its publisher.
+DOI_RESOLVER = "https://doi.org/"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+}
+
+# Statuses worth asking again for, after a while.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# What we report when the resolver could not be reached at all.
+UNREACHABLE = 500
+
+# What we report when the answer of the resolver cannot be read, e.g. for a header line longer than the reader allows.
+MALFORMED = 502
+
+class DoiStatus(NamedTuple):
+    """ The answer of the resolver for a DOI. """
+
+    doi: str
+    status: int
+    location: str = None # Where the resolver redirects to, if it does.
+
+def is_resolved(status: int) -> bool:
+    """ Whether a status means the DOI exists. The resolver answers with a redirect for those. """
+
+    return 200 <= status < 400
+
+class TokenBucket():
+    """ Limits the rate of requests to a host, allowing short bursts. """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Host():
+    """ The keep-alive connections, connection limit and rate limit of a single host. """
+
+    def __init__(self, scheme: str, hostname: str, port: int, connections: int, rate: float, burst: int):
+        self.scheme = scheme
+        self.hostname = hostname
+        self.port = port
+        self.idle = [] # (reader, writer) pairs ready to be reused.
+        self.slots = asyncio.Semaphore(connections)
+        self.bucket = TokenBucket(rate, burst)
+
+    async def connect(self) -> tuple:
+        context = ssl.create_default_context() if self.scheme == "https" else None
+
+        return await asyncio.open_connection(self.hostname, self.port, ssl = context)
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+class DoiChecker():
+    """ Checks DOIs against the resolver with HEAD requests over pooled keep-alive connections.
+
+    At most `concurrency` requests are in flight overall and `connections` per host, each host
+    is limited to `rate` requests per second, and 429/5xx answers or network errors are retried
+    up to `retries` times with jittered exponential backoff.
+    """
+
+    def __init__(self, resolver: str = DOI_RESOLVER, concurrency: int = 20, connections: int = 8, rate: float = 20.0,
+                 burst: int = 10, retries: int = 3, backoff: float = 0.5, timeout: float = 10.0, headers: dict = None):
+        self.resolver = resolver if resolver.endswith("/") else resolver + "/"
+        self.concurrency = concurrency
+        self.connections = connections
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = HEADERS if headers is None else headers
+
+        self.hosts = {}
+        self.limit = None
+        self.loop = None # Only set once the checker is kept warm.
+
+    def keep_warm(self) -> None:
+        """ Keeps the connections open from one check to the next, on an event loop of its own thread, e.g. in the daemon. """
+
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target = self.loop.run_forever, name = "doi-checker", daemon = True).start()
+
+    def host(self, scheme: str, hostname: str, port: int) -> Host:
+        key = (scheme, hostname, port)
+        if key not in self.hosts:
+            self.hosts[key] = Host(scheme, hostname, port, self.connections, self.rate, self.burst)
+
+        return self.hosts[key]
+
+    async def head(self, url: str) -> tuple:
+        """ Sends a HEAD request, returning the status and the (lowercase) headers of the answer. """
+
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        host = self.host(parts.scheme, parts.hostname, port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        request = f"HEAD {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        request += "".join(f"{name}: {value}\r\n" for name, value in self.headers.items())
+        request = (request + "\r\n").encode("latin-1")
+
+        await host.bucket.acquire()
+        async with host.slots:
+            # A pooled connection may have been closed by the server meanwhile, in which case we open a fresh one.
+            while True:
+                reused = bool(host.idle)
+                reader, writer = host.idle.pop() if reused else await host.connect()
+
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    head = await reader.readuntil(b"\r\n\r\n")
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if not reused:
+                        raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split(" ")[1])
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            if headers.get("connection", "").lower() == "close" or lines[0].startswith("HTTP/1.0"):
+                writer.close()
+            else:
+                host.idle.append((reader, writer))
+
+        return status, headers
+
+    def delay(self, attempt: int, headers: dict = None) -> float:
+        """ How long to wait before the next attempt, honouring Retry-After when the server sends one. """
+
+        retry_after = (headers or {}).get("retry-after", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def check_one(self, doi: str) -> DoiStatus:
+        """ Checks a single DOI. """
+
+        url = self.resolver + quote(doi, safe = "/:;()[]<>@+=,-._~")
+        status, headers = UNREACHABLE, {}
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.limit:
+                    with trace.span("http.head", doi = doi, attempt = attempt) as request:
+                        status, headers = await asyncio.wait_for(self.head(url), self.timeout)
+                        request.set(status = status)
+            except asyncio.LimitOverrunError:
+                # Asking again would only give the same answer, and the other DOIs are checked regardless.
+                status, headers = MALFORMED, {}
+                break
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                status, headers = UNREACHABLE, {}
+            else:
+                if status not in RETRY_STATUSES:
+                    break
+
+            if attempt < self.retries:
+                trace.count("http.retries")
+                await asyncio.sleep(self.delay(attempt, headers))
+
+        trace.count("doi.checked")
+        if not is_resolved(status):
+            trace.count("doi.unresolved")
+
+        return DoiStatus(doi, status, headers.get("location"))
+
+    async def stream(self, dois: list):
+        """ Checks DOIs concurrently, yielding their statuses as soon as each one is known. """
+
+        # A warm checker shares its limit and connections between the checks running on its loop.
+        if self.loop is None or self.limit is None:
+            self.limit = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self.check_one(doi)) for doi in dict.fromkeys(dois)]
+
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.loop is None:
+                self.close()
+
+    def close(self) -> None:
+        """ Closes the pooled connections. """
+
+        for host in self.hosts.values():
+            host.close()
+        self.hosts = {}
+
+    async def gather(self, dois: list, on_result = None) -> dict:
+        statuses = {}
+        async for result in self.stream(dois):
+            statuses[result.doi] = result
+            if on_result is not None:
+                on_result(result)
+
+        return statuses
+
+    def check(self, dois: list, on_result = None) -> dict:
+        """ Checks DOIs, returning a DoiStatus per distinct DOI. on_result is called as each one completes. """
+
+        if not dois:
+            return {}
+
+        if self.loop is not None:
+            return asyncio.run_coroutine_threadsafe(self.gather(dois, on_result), self.loop).result()
+
+        return asyncio.run(self.gather(dois, on_result))
@@ -0,0 +1,354 @@
+import argparse
+import gzip
+import heapq
+import json
+import mmap
+import os
+import re
+import tempfile
+
+from pathlib import Path
+from typing import NamedTuple
+
+from MetaForge import trace
+from MetaForge.cache import DEFAULT_CACHE_DIR
+from MetaForge.misc import print_error, print_warning
+
+# A DOI is "10.", a registrant code of at least four digits (maybe subdivided), a slash and a suffix.
+# The suffix may be almost anything, but not what would break the \doi link it is written in.
+DOI = re.compile(r"10\.\d{4,9}(?:\.\d+)*/[^\s\\{}\"]+")
+
+# What gets pasted in front of a DOI: a resolver URL or a "doi:" label.
+PREFIX = re.compile(r"^(?:(?:https?://)?(?:dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+# LaTeX escapes the \doi macro does not need, and the character they stand for.
+LATEX_ESCAPES = [("{\\_}", "_"), ("\\_", "_"), ("\\textunderscore{}", "_"), ("\\textunderscore", "_"), ("\\%", "%"), ("\\&", "&"), ("\\#", "#")]
+
+TRAILING_PUNCTUATION = ".,;:"
+
+# The statuses of the answers we give without asking the resolver.
+MALFORMED = 400
+KNOWN = 200
+
+# The first line of an index, which sorts before every DOI.
+INDEX_HEADER = b"# MetaForge DOI index\n"
+
+# Where the index is looked for when none is given.
+DEFAULT_INDEX = Path(os.environ.get("METAFORGE_DOI_INDEX", DEFAULT_CACHE_DIR / "dois.index"))
+
+# How many DOIs are sorted in memory at once while building an index.
+SORT_CHUNK = 1_000_000
+
+class Verdict(NamedTuple):
+    """ What we know about a DOI as it is written in a paper. """
+
+    doi: str # As written.
+    normalized: str # None if it is not a DOI at all.
+    status: int = None # None if it could not be checked.
+    fixes: tuple = () # What had to be changed to get the normalized DOI.
+    source: str = None # "grammar", "index" or "resolver".
+
+    @property
+    def wrong(self) -> bool:
+        """ Whether the DOI is wrong as written, i.e. malformed, in need of a fix, or not resolving. """
+
+        return bool(self.fixes) or (self.status is not None and not 200 <= self.status < 400)
+
+def normalize_doi(doi: str) -> tuple:
+    """ Returns the DOI a \\doi{} argument should have been, and what had to be fixed, or (None, fixes) if it is no DOI. """
+
+    fixes = []
+    normalized = doi
+
+    prefix = PREFIX.match(normalized)
+    if prefix:
+        fixes.append(f"removed the {prefix.group().strip()} prefix")
+        normalized = normalized[prefix.end():]
+
+    if re.search(r"\s", normalized):
+        normalized = re.sub(r"\s+", "", normalized)
+        fixes.append("removed whitespace")
+
+    for escaped, character in LATEX_ESCAPES:
+        if escaped in normalized:
+            normalized = normalized.replace(escaped, character)
+            fixes.append(f"unescaped {escaped}")
+
+    stripped = normalized.rstrip(TRAILING_PUNCTUATION)
+    if stripped != normalized:
+        fixes.append(f"removed the trailing {normalized[len(stripped):]!r}")
+        normalized = stripped
+
+    # A closing bracket without its opening one comes from the sentence around the DOI.
+    for opening, closing in ("()", "[]"):
+        while normalized.endswith(closing) and normalized.count(closing) > normalized.count(opening):
+            normalized = normalized[:-1]
+            fixes.append(f"removed an unbalanced {closing!r}")
+
+    if not DOI.fullmatch(normalized):
+        return None, tuple(fixes)
+
+    return normalized, tuple(fixes)
+
+def index_key(doi: str) -> bytes:
+    # DOIs are case insensitive.
+    return doi.lower().encode("utf-8")
+
+class DoiIndex():
+    """ A sorted file of known DOIs, one per line, searched in place through a memory map.
+
+    Looking up a DOI is a binary search over the lines of the file, so that an index of the
+    hundred million DOIs of a Crossref dump costs a few page reads per DOI, and no memory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if self.data[:len(INDEX_HEADER)] != INDEX_HEADER:
+            self.data.close()
+            raise ValueError(f"{self.path} is not a DOI index.")
+
+    @classmethod
+    def default(cls):
+        """ The index in the cache folder (or at METAFORGE_DOI_INDEX), or None if there is none. """
+
+        try:
+            return cls(DEFAULT_INDEX)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def __contains__(self, doi: str) -> bool:
+        data = self.data
+        key = index_key(doi)
+
+        low, high = len(INDEX_HEADER), len(data)
+        while low < high:
+            middle = (low + high) // 2
+            start = data.rfind(b"\n", 0, middle) + 1
+            end = data.find(b"\n", start)
+            end = len(data) if end == -1 else end
+
+            line = data[start:end]
+            if line == key:
+                return True
+            if line < key:
+                low = end + 1
+            else:
+                high = start
+
+        return False
+
+    def __len__(self) -> int:
+        # Counted a few megabytes at a time, as the index may not fit in memory.
+        step = 1 << 24
+
+        return sum(self.data[start:start + step].count(b"\n") for start in range(0, len(self.data), step)) - 1
+
+    def close(self) -> None:
+        self.data.close()
+
+# ============================================================
+
+def open_text(path: Path):
+    return gzip.open(path, "rt", encoding = "utf-8") if path.suffix == ".gz" else open(path, "r", encoding = "utf-8")
+
+def read_dois(path):
+    """ Yields the DOIs of a source of known DOIs:
+
+    - a Crossref public data file (.json with an "items" list, or .jsonl, maybe gzipped),
+    - one of our Crossref deposits (.xml), for our own past publications,
+    - or a plain list of DOIs, one per line.
+    """
+
+    path = Path(path)
+    kind = Path(path.stem).suffix if path.suffix == ".gz" else path.suffix
+
+    with open_text(path) as f:
+        if kind == ".json":
+            for item in json.load(f).get("items", []):
+                yield item.get("DOI")
+        elif kind == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line).get("DOI")
+        elif kind == ".xml":
+            for match in re.finditer(r"<doi_data>\s*<doi>([^<]+)</doi>", f.read()):
+                yield match.group(1)
+        else:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    yield line.strip()
+
+def cached_dois(database = None) -> list:
+    """ The DOIs the resolver has already resolved, from the DOI cache. """
+
+    from MetaForge.doi_cache import DoiCache
+
+    cache = DoiCache(database)
+    try:
+        return [row[0] for row in cache.rows() if 200 <= row[1] < 400]
+    finally:
+        cache.close()
+
+def build_index(dois, output, chunk: int = SORT_CHUNK) -> int:
+    """ Writes an index of DOIs, however many, sorting them in chunks on disk. Returns the number of DOIs. """
+
+    output = Path(output)
+    output.parent.mkdir(parents = True, exist_ok = True)
+
+    with tempfile.TemporaryDirectory(dir = output.parent) as folder:
+        runs = []
+
+        def flush(keys: list) -> None:
+            run = Path(folder) / f"{len(runs)}.run"
+            run.write_bytes(b"".join(key + b"\n" for key in sorted(set(keys))))
+            runs.append(run)
+
+        keys = []
+        for doi in dois:
+            normalized, _ = normalize_doi(doi) if doi else (None, ())
+            if normalized is None:
+                continue
+
+            keys.append(index_key(normalized))
+            if len(keys) >= chunk:
+                flush(keys)
+                keys = []
+        flush(keys)
+
+        # The sorted runs are merged, dropping the duplicates, into a file that replaces the index at once.
+        files = [open(run, "rb") for run in runs]
+        descriptor, temporary = tempfile.mkstemp(dir = output.parent, suffix = ".tmp")
+        count, last = 0, None
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(INDEX_HEADER)
+                for line in heapq.merge(*files):
+                    if line != last:
+                        f.write(line)
+                        count += 1
+                        last = line
+            os.replace(temporary, output)
+        except BaseException:
+            Path(temporary).unlink(missing_ok = True)
+            raise
+        finally:
+            for file in files:
+                file.close()
+
+    return count
+
+# ============================================================
+
+def prevalidate(dois: list, index: DoiIndex = None) -> dict:
+    """ Gives every DOI the verdict that can be reached offline: malformed, known to the index, or unknown (status None). """
+
+    verdicts = {}
+    for doi in dict.fromkeys(dois):
+        normalized, fixes = normalize_doi(doi)
+        if normalized is None:
+            verdicts[doi] = Verdict(doi, None, MALFORMED, fixes, "grammar")
+        elif index is not None and normalized in index:
+            verdicts[doi] = Verdict(doi, normalized, KNOWN, fixes, "index")
+        else:
+            verdicts[doi] = Verdict(doi, normalized, None, fixes)
+
+    trace.count("doi.malformed", sum(verdict.source == "grammar" for verdict in verdicts.values()))
+    trace.count("doi.indexed", sum(verdict.source == "index" for verdict in verdicts.values()))
+
+    return verdicts
+
+def check_dois(dois: list, cache = None, checker = None, index: DoiIndex = None, offline: bool = False, on_result = None) -> dict:
+    """ Checks DOIs offline first, and only sends those that could not be settled offline to the cache and the resolver.
+
+    Returns a Verdict per distinct DOI. In offline mode, the unsettled ones keep a status of None.
+    """
+
+    with trace.span("doi.offline", dois = len(dois)):
+        verdicts = prevalidate(dois, index)
+
+    unsettled = list(dict.fromkeys(verdict.normalized for verdict in verdicts.values() if verdict.status is None))
+    if unsettled and not offline:
+        from MetaForge.doi_cache import DoiCache
+
+        if cache is None:
+            with DoiCache() as cache:
+                results = cache.check(unsettled, checker, on_result)
+        else:
+            results = cache.check(unsettled, checker, on_result)
+
+        for doi, verdict in verdicts.items():
+            if verdict.status is None:
+                verdicts[doi] = verdict._replace(status = results[verdict.normalized].status, source = "resolver")
+
+    return verdicts
+
+def describe(verdict: Verdict) -> str:
+    """ What is wrong with a DOI, for reports. """
+
+    if verdict.normalized is None:
+        return f"(malformed) - {verdict.doi}"
+
+    status = "not checked" if verdict.status is None else verdict.status
+    fixes = f" - written as {verdict.doi!r}: {', '.join(verdict.fixes)}" if verdict.fixes else ""
+
+    return f"({status}) - https://doi.org/{verdict.normalized}{fixes}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge doi-index", description = "Build or query the offline index of known DOIs.")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    build_parser = subparsers.add_parser("build", help = "Build the index from Crossref data files, deposits or lists of DOIs.")
+    build_parser.add_argument("sources", nargs = "*")
+    build_parser.add_argument("--from-cache", action = "store_true", help = "Also add the DOIs the resolver has resolved before.")
+    build_parser.add_argument("--output", default = str(DEFAULT_INDEX))
+
+    check_parser = subparsers.add_parser("check", help = "Check the DOIs of papers (or DOIs themselves) without the network.")
+    check_parser.add_argument("items", nargs = "+", help = ".tex files or DOIs.")
+    check_parser.add_argument("--index", default = str(DEFAULT_INDEX))
+
+    info_parser = subparsers.add_parser("info")
+    info_parser.add_argument("--index", default = str(DEFAULT_INDEX))
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        def sources():
+            for source in args.sources:
+                yield from read_dois(source)
+            if args.from_cache:
+                yield from cached_dois()
+
+        with trace.span("doi.index.build"):
+            print(f"Indexed {build_index(sources(), args.output)} DOIs in {args.output}.")
+    elif args.command == "info":
+        index = DoiIndex(args.index)
+        print(f"Index: {index.path}")
+        print(f"DOIs: {len(index)}")
+    else:
+        from MetaForge.project import Project
+
+        index = DoiIndex(args.index) if Path(args.index).exists() else None
+        if index is None:
+            print_warning(f"No DOI index at {args.index}, only checking the syntax.")
+
+        dois = []
+        for item in args.items:
+            if item.endswith(".tex"):
+                with Project(item) as project:
+                    dois += project.parsed.bibliography_index.unique_dois()
+            else:
+                dois.append(item)
+
+        verdicts = check_dois(dois, index = index, offline = True)
+        for verdict in verdicts.values():
+            if verdict.wrong:
+                print_error(describe(verdict))
+
+        unsettled = sum(verdict.status is None for verdict in verdicts.values())
+        wrong = sum(verdict.wrong for verdict in verdicts.values())
+        print(f"{len(verdicts)} DOIs: {wrong} wrong, {len(verdicts) - wrong - unsettled} known, {unsettled} left for the resolver.")
+
+        raise SystemExit(1 if wrong else 0)
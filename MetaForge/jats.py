@@ -0,0 +1,326 @@
+import re
+import shutil
+import unicodedata
+
+from functools import lru_cache
+
+from MetaForge import trace
+
+# Bumped whenever the output of the native converter changes.
+CONVERTER_VERSION = "3"
+
+class UnsupportedSyntax(ValueError):
+    """ Raised when the native converter meets LaTeX it does not know how to convert. """
+
+# The tags that pandoc writes without a namespace and that we need prefixed.
+PANDOC_TAGS = ["p", "inline-formula", "disp-formula", "alternatives", "tex-math", "italic", "bold", "sc", "monospace"]
+
+# Text-level commands and the JATS tag their argument is wrapped in.
+STYLE_COMMANDS = {
+    "emph": "italic",
+    "textit": "italic",
+    "textsl": "italic",
+    "textbf": "bold",
+    "textsc": "sc",
+    "texttt": "monospace",
+    "textrm": None,
+    "textnormal": None,
+    "mbox": None,
+}
+
+# Accent commands, e.g. \'e or \"{o}, and the combining character they add.
+ACCENTS = {
+    "'": "́",
+    "`": "̀",
+    '"': "̈",
+    "^": "̂",
+    "~": "̃",
+    "=": "̄",
+    ".": "̇",
+    "c": "̧",
+    "v": "̌",
+    "u": "̆",
+    "H": "̋",
+}
+
+# Commands that stand for a single character.
+SYMBOLS = {
+    "ss": "ß",
+    "o": "ø",
+    "O": "Ø",
+    "aa": "å",
+    "AA": "Å",
+    "ae": "æ",
+    "AE": "Æ",
+    "l": "ł",
+    "L": "Ł",
+    "i": "ı",
+    "ldots": "…",
+    "dots": "…",
+    "textendash": "–",
+    "textemdash": "—",
+    "LaTeX": "LaTeX",
+    "TeX": "TeX",
+}
+
+# Characters that LaTeX escapes with a backslash.
+ESCAPED = set("%&_#${} ,;")
+
+# Smart punctuation, applied to text only (never to math), longest first.
+PUNCTUATION = [
+    ("---", "—"),
+    ("--", "–"),
+    ("...", "…"),
+    ("``", "“"),
+    ("''", "”"),
+    ("`", "‘"),
+    ("'", "’"),
+]
+
+TOKEN = re.compile(r"""
+    (?P<display>\$\$(?P<display_body>.+?)\$\$|\\\[(?P<bracket_body>.+?)\\\])
+  | (?P<inline>\\\((?P<paren_body>.+?)\\\))
+  | (?P<dollar>\$)
+  | (?P<command>\\(?:[A-Za-z]+\*?|.))
+  | (?P<open>\{)
+  | (?P<close>\})
+  | (?P<tie>~)
+  | (?P<text>[^$\\{}~]+)
+""", re.VERBOSE | re.DOTALL)
+
+# An inline $...$ formula as pandoc reads it: no space after the opening dollar,
+# no space before the closing one, and the closing one not followed by a digit.
+INLINE_DOLLAR = re.compile(r"\$(?=\S)((?:[^$\\]|\\.)+?)(?<=\S)\$(?!\d)", re.DOTALL)
+
+
+def escape_xml(text: str) -> str:
+    """ Escapes the characters that are not allowed in XML text. """
+
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+def smart_punctuation(text: str) -> str:
+    """ Replaces dashes, ellipses and quotes with their typographic versions. """
+
+    for plain, fancy in PUNCTUATION:
+        text = text.replace(plain, fancy)
+
+    # Straight double quotes open after a space (or at the start) and close otherwise.
+    text = re.sub(r'(^|(?<=[\s(\[]))"', "“", text)
+
+    return text.replace('"', "”")
+
+def tex_math(tex: str, display: bool = False) -> str:
+    """ Wraps a LaTeX formula in the JATS formula elements. """
+
+    tex = tex.strip().replace("]]>", "]]]]><![CDATA[>") # A CDATA section cannot contain its own terminator.
+    tag = "disp-formula" if display else "inline-formula"
+
+    return f"<jats:{tag}><jats:alternatives><jats:tex-math><![CDATA[{tex}]]></jats:tex-math></jats:alternatives></jats:{tag}>"
+
+
+class _Converter():
+    """ A recursive-descent converter over the tokens of a single paragraph. """
+
+    def __init__(self, text: str, strict: bool):
+        self.text = text
+        self.strict = strict
+        self.tokens = list(TOKEN.finditer(text))
+        self.position = 0
+
+    def next(self):
+        token = self.tokens[self.position] if self.position < len(self.tokens) else None
+        self.position += 1
+
+        return token
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def argument(self) -> str:
+        """ Converts the next {group} (or single token) and returns it as JATS. """
+
+        token = self.peek()
+        if token is None:
+            return ""
+
+        if token.lastgroup == "open":
+            self.next()
+            return self.convert(until_close = True)
+
+        if token.lastgroup == "text":
+            # Like LaTeX, we skip the spaces in front of a bare argument, which only takes the first character, as in \'e.
+            self.next()
+            text = token.group().lstrip()
+            if not text:
+                return self.argument()
+
+            self.pending = text[1:]
+            return escape_xml(text[0])
+
+        return self.convert(single = True)
+
+    def raw_argument(self) -> str:
+        """ Returns the next {group} (or character) as plain text, without converting it. """
+
+        token = self.peek()
+        if token is not None and token.lastgroup == "open":
+            depth, start = 0, token.start()
+            while (token := self.next()) is not None:
+                depth += {"open": 1, "close": -1}.get(token.lastgroup, 0)
+                if depth == 0:
+                    return self.text[start + 1:token.start()]
+
+        return self.argument()
+
+    def convert(self, until_close: bool = False, single: bool = False) -> str:
+        output = []
+        self.pending = ""
+
+        while (token := self.next()) is not None:
+            kind = token.lastgroup
+
+            if kind == "close":
+                if until_close:
+                    break
+                continue # Stray closing braces are dropped, as LaTeX would complain anyway.
+            elif kind == "open":
+                output.append(self.convert(until_close = True))
+            elif kind == "text":
+                output.append(escape_xml(smart_punctuation(token.group())))
+            elif kind == "tie":
+                output.append(" ")
+            elif kind == "display":
+                output.append(tex_math(token.group("display_body") or token.group("bracket_body"), display = True))
+            elif kind == "inline":
+                output.append(tex_math(token.group("paren_body")))
+            elif kind == "dollar":
+                match = INLINE_DOLLAR.match(self.text, token.start())
+                if match:
+                    output.append(tex_math(match.group(1)))
+                    while self.peek() is not None and self.peek().start() < match.end():
+                        self.next()
+                else:
+                    output.append("$") # A lonely dollar is just a dollar.
+            elif kind == "command" and token.group() == "\\\\":
+                # A line break becomes a single space, however many spaces surround it.
+                if output:
+                    output[-1] = output[-1].rstrip(" ")
+                output.append(" ")
+                if self.peek() is not None and self.peek().lastgroup == "text":
+                    self.pending = self.next().group().lstrip(" ")
+            elif kind == "command":
+                output.append(self.command(token.group()[1:]))
+
+            if single:
+                break # What is left of a bare argument goes after the command that took it.
+
+            if self.pending:
+                output.append(escape_xml(smart_punctuation(self.pending)))
+                self.pending = ""
+
+        return "".join(output)
+
+    def command(self, name: str) -> str:
+        if name in STYLE_COMMANDS:
+            tag = STYLE_COMMANDS[name]
+            content = self.argument()
+            return f"<jats:{tag}>{content}</jats:{tag}>" if tag else content
+
+        if name in ACCENTS:
+            base = self.raw_argument()
+            return escape_xml(unicodedata.normalize("NFC", base + ACCENTS[name]))
+
+        if name in SYMBOLS:
+            return SYMBOLS[name]
+
+        if name in ESCAPED:
+            return " " if name in " ,;" else escape_xml(name)
+
+        if self.strict:
+            raise UnsupportedSyntax(f"Unsupported LaTeX command: \\{name}")
+
+        # Like pandoc, we drop the unknown command but keep whatever it wraps.
+        return ""
+
+
+def latex_to_jats(text: str, strict: bool = True) -> str:
+    """ Converts a LaTeX abstract to JATS XML without any external programs. """
+
+    paragraphs = [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text)]
+    paragraphs = [re.sub(r"\s+", " ", paragraph) for paragraph in paragraphs if paragraph]
+
+    return " ".join(f"<jats:p>{_Converter(paragraph, strict).convert()}</jats:p>" for paragraph in paragraphs)
+
+def format_pandoc_jats(abstract_jats: str) -> str:
+    """ Formats the raw pandoc JATS output the way we publish it. """
+
+    for tag in PANDOC_TAGS:
+        abstract_jats = abstract_jats.replace(f"<{tag}>", f"<jats:{tag}>")
+        abstract_jats = abstract_jats.replace(f"</{tag}>", f"</jats:{tag}>")
+
+    # We remove the newlines that are inserted by the JATS format.
+    abstract_jats = abstract_jats.replace("\n", " ")
+    abstract_jats = abstract_jats.strip() # And we remove the leading and trailing spaces.
+
+    return abstract_jats
+
+def pandoc_to_jats(text: str) -> str:
+    """ Converts an abstract to JATS XML by running pandoc over its pipes. """
+
+    from MetaForge.pandoc import pandoc_pool
+
+    return pandoc_pool.convert([text])[0]
+
+@lru_cache(maxsize = None)
+def pandoc_available() -> bool:
+    return shutil.which("pandoc") is not None
+
+def resolve_backend(backend: str) -> str:
+    """ The backend a conversion really uses: "auto" falls back to pandoc only where it is installed. """
+
+    if backend == "auto":
+        return "auto+pandoc" if pandoc_available() else "auto+native"
+
+    return backend
+
+def to_jats(text: str, backend: str = "auto") -> str:
+    """ Converts an abstract to JATS XML.
+
+    The backend is one of "native", "pandoc" or "auto". The latter uses the native converter and
+    only falls back to pandoc (when it is installed) for LaTeX the native converter does not know.
+    """
+
+    return to_jats_many([text], backend)[0]
+
+def to_jats_many(texts: list, backend: str = "auto") -> list:
+    """ Converts many abstracts to JATS XML, like to_jats, with all those that need pandoc converted together. """
+
+    results = [None] * len(texts)
+    pending = [] # The indices of the abstracts that go to pandoc.
+
+    for index, text in enumerate(texts):
+        if backend == "pandoc":
+            pending.append(index)
+            continue
+
+        if backend == "native":
+            results[index] = latex_to_jats(text)
+            continue
+
+        try:
+            with trace.span("jats.native", characters = len(text)):
+                results[index] = latex_to_jats(text)
+        except UnsupportedSyntax:
+            trace.count("jats.unsupported")
+            if pandoc_available():
+                pending.append(index)
+            else:
+                results[index] = latex_to_jats(text, strict = False)
+
+    if pending:
+        from MetaForge.pandoc import pandoc_pool
+
+        for index, jats in zip(pending, pandoc_pool.convert([texts[index] for index in pending])):
+            results[index] = jats
+
+    return results
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.misc import print_error, print_warning
+
+# latexmk keeps its .aux and .fdb_latexmk state next to the paper, so that a recompile only reruns what changed.
+LATEXMK = ["latexmk", "-pdf", "-interaction=nonstopmode", "-file-line-error", "-synctex=1"]
+PDFLATEX = ["pdflatex", "-interaction=nonstopmode", "-file-line-error", "-synctex=1"]
+
+# How many times we run pdflatex when latexmk is not installed, at most.
+PDFLATEX_RUNS = 3
+
+DEFAULT_TIMEOUT = 300
+
+# What we report from a log: errors, warnings and over/underfull boxes.
+LOG_ERROR = re.compile(r"^(?:(?P<file>[^\s:]+\.(?:tex|sty|cls|bbl)):(?P<line>\d+): |! )(?P<message>.+)$", re.MULTILINE)
+# Packages continue their warnings on lines starting with their name in parentheses.
+LOG_WARNING = re.compile(r"^(?:LaTeX(?P<font> Font)?|Package (?P<package>\S+)|Class (?P<class>\S+)) Warning: (?P<message>.*(?:\n\(\S+\) {2,}.*)*)", re.MULTILINE)
+LOG_CONTINUATION = re.compile(r"\n\(\S+\) {2,}")
+LOG_BADBOX = re.compile(r"^(?:Over|Under)full \\[hv]box .*$", re.MULTILINE)
+LOG_INPUT_LINE = re.compile(r"on input line (\d+)")
+
+# TeX wraps its log at 79 characters (bytes, for pdfTeX).
+LOG_WIDTH = 79
+
+# The lines that start a message of their own, and so never continue the line before.
+LOG_ENTRY = re.compile(r"^(?:! |[^\s:]+\.(?:tex|sty|cls|bbl):\d+: |(?:LaTeX(?: Font)?|Package \S+|Class \S+) Warning: |(?:Over|Under)full \\[hv]box )")
+
+STREAM = re.compile(rb"(?<!end)stream\r?\n")
+
+# How far back from a stream we look for its dictionary.
+DICTIONARY_WINDOW = 512
+
+def unwrap_log(log: str) -> str:
+    """ Joins the lines TeX broke at the log width.
+
+    TeX breaks a line as soon as it has printed LOG_WIDTH characters, so a line that was exactly that
+    long is followed by an empty line, which we drop, rather than by a continuation. A log with longer
+    lines was written with a larger max_print_line, and is left as it is.
+    """
+
+    lines = log.split("\n")
+    if any(len(line) > LOG_WIDTH for line in lines):
+        return log
+
+    joined = []
+    wrapped = False
+    for line in lines:
+        if wrapped and not line:
+            wrapped = False
+            continue
+
+        if wrapped and not LOG_ENTRY.match(line):
+            joined[-1] += line
+        else:
+            joined.append(line)
+
+        wrapped = LOG_WIDTH in (len(line), len(line.encode("utf-8")))
+
+    return "\n".join(joined)
+
+def parse_log(log: str) -> dict:
+    """ Collects the errors, warnings and bad boxes of a LaTeX log. """
+
+    log = unwrap_log(log)
+
+    errors = []
+    for match in LOG_ERROR.finditer(log):
+        errors.append({"file": match.group("file"), "line": int(match.group("line")) if match.group("line") else None, "message": match.group("message").strip()})
+
+    warnings = []
+    for match in LOG_WARNING.finditer(log):
+        message = " ".join(LOG_CONTINUATION.sub(" ", match.group("message")).split())
+        line = LOG_INPUT_LINE.search(message)
+        warnings.append({
+            "source": match.group("package") or match.group("class") or ("LaTeX Font" if match.group("font") else "LaTeX"),
+            "line": int(line.group(1)) if line else None,
+            "message": message,
+        })
+
+    return {
+        "errors": errors,
+        "warnings": warnings,
+        "badboxes": len(LOG_BADBOX.findall(log)),
+        "rerun": "Rerun to get" in log or "Label(s) may have changed" in log,
+    }
+
+def inflated_streams(data: bytes):
+    """ Yields the inflated content of every Flate compressed stream of a PDF. """
+
+    position = 0
+    while True:
+        match = STREAM.search(data, position)
+        if match is None:
+            return
+
+        start = match.end()
+        end = data.find(b"endstream", start)
+        if end == -1:
+            return
+        position = end + len(b"endstream")
+
+        preceding = data[max(match.start() - DICTIONARY_WINDOW, 0):match.start()]
+        dictionary = preceding[preceding.rfind(b" obj"):]
+
+        if b"/FlateDecode" not in dictionary:
+            continue # Uncompressed streams are searched as part of the file.
+
+        try:
+            # A decompressor stops at the end of the compressed data, whatever whitespace follows.
+            yield zlib.decompressobj().decompress(data[start:end])
+        except zlib.error:
+            continue
+
+def check_pdf(path, doi: str) -> dict:
+    """ Checks that the pages of a PDF link to the DOI in their header, as the \\rhead of a formatted paper does.
+
+    The header links live in link annotations, which pdflatex puts in compressed object streams,
+    so we look through the inflated streams as well as the file itself.
+    """
+
+    data = Path(path).read_bytes()
+    target = f"scipost.org/{doi}".encode("utf-8")
+
+    links, pages = 0, 0
+    for chunk in [data, *inflated_streams(data)]:
+        links += chunk.count(target)
+        pages += len(re.findall(rb"/Type\s*/Page\b(?!s)", chunk))
+
+    return {"pages": pages, "header_links": links, "header_doi": links > 0}
+
+def run(command: list, folder: Path, timeout: float) -> tuple:
+    """ Runs a command in its own process group, killing the whole group on a timeout. Returns (return code, timed out). """
+
+    process = subprocess.Popen(command, cwd = folder, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL,
+                               stdin = subprocess.DEVNULL, start_new_session = True)
+    try:
+        return process.wait(timeout = timeout), False
+    except subprocess.TimeoutExpired:
+        # latexmk starts pdflatex and bibtex as children, which have to go too.
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, AttributeError):
+            process.kill()
+        process.wait()
+        return None, True
+
+def doi_of(tex: Path) -> str:
+    """ The DOI of a formatted paper, from its file name (e.g. SciPostPhys_16_2_045.tex). """
+
+    doi = tex.stem.replace("_", ".")
+
+    return doi if re.fullmatch(r"SciPost\w+(\.\d+)+", doi) else None
+
+def compile_paper(tex, doi: str = None, timeout: float = DEFAULT_TIMEOUT, force: bool = False) -> dict:
+    """ Compiles a formatted paper and checks the result. Never raises. """
+
+    tex = Path(tex).resolve()
+    doi = doi or doi_of(tex)
+    pdf = tex.with_suffix(".pdf")
+    result = {"tex": str(tex), "doi": doi, "ok": False, "timed_out": False, "errors": [], "warnings": [], "badboxes": 0}
+
+    start = time.perf_counter()
+    with trace.span("latex", tex = tex.name) as span:
+        if shutil.which("latexmk"):
+            command = LATEXMK + (["-g"] if force else []) + [tex.name]
+            returncode, timed_out = run(command, tex.parent, timeout)
+        elif shutil.which("pdflatex"):
+            # Without latexmk we rerun pdflatex ourselves, as long as the log asks for it.
+            deadline = time.monotonic() + timeout
+            for _ in range(PDFLATEX_RUNS):
+                returncode, timed_out = run(PDFLATEX + [tex.name], tex.parent, max(deadline - time.monotonic(), 0))
+                if timed_out or returncode != 0 or not parse_log(read_log(tex))["rerun"]:
+                    break
+        else:
+            result["errors"].append({"file": None, "line": None, "message": "Neither latexmk nor pdflatex is installed."})
+            return result
+
+        span.set(returncode = returncode, timed_out = timed_out)
+
+    result.update(returncode = returncode, timed_out = timed_out, seconds = time.perf_counter() - start)
+
+    report = parse_log(read_log(tex))
+    result.update(errors = report["errors"], warnings = report["warnings"], badboxes = report["badboxes"])
+    if timed_out:
+        result["errors"].append({"file": None, "line": None, "message": f"Timed out after {timeout} s."})
+
+    if pdf.exists():
+        result["pdf"] = str(pdf)
+        if doi is not None:
+            result.update(check_pdf(pdf, doi))
+            if not result["header_doi"]:
+                result["errors"].append({"file": None, "line": None, "message": f"The PDF headers do not link to {doi}."})
+
+    result["ok"] = returncode == 0 and not result["errors"] and pdf.exists()
+    trace.count("latex.compiled")
+
+    return result
+
+def read_log(tex: Path) -> str:
+    try:
+        return tex.with_suffix(".log").read_text(errors = "replace")
+    except FileNotFoundError:
+        return ""
+
+def compile_papers(papers: list, workers: int = None, timeout: float = DEFAULT_TIMEOUT, force: bool = False) -> list:
+    """ Compiles many papers on a bounded pool, one TeX process per core. papers are tex paths or (tex, doi) pairs. """
+
+    jobs = [paper if isinstance(paper, (tuple, list)) else (paper, None) for paper in papers]
+    workers = workers or min(len(jobs), os.cpu_count() or 1) or 1
+
+    # The work happens in the TeX processes, so threads are enough to keep every core busy.
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        return list(pool.map(lambda job: compile_paper(job[0], job[1], timeout, force), jobs))
+
+def print_compile_report(results: list) -> None:
+    for result in results:
+        name = Path(result["tex"]).name
+        if result["ok"]:
+            print(f"{name}: {result.get('pages', '?')} pages, {len(result['warnings'])} warnings, {result['badboxes']} bad boxes")
+        else:
+            print_error(f"{name}: failed")
+
+        for error in result["errors"]:
+            where = f"{error['file']}:{error['line']}: " if error["file"] else ""
+            print_error(f"  {where}{error['message']}")
+        for warning in result["warnings"]:
+            print_warning(f"  {warning['source']}: {warning['message']}")
+
+if __name__ == "__main__":
+    from MetaForge.batch import read_manifest
+
+    parser = argparse.ArgumentParser(prog = "metaforge compile", description = "Compile formatted papers and check their PDFs.")
+    parser.add_argument("papers", nargs = "*", help = "Formatted tex files, named after their DOI.")
+    parser.add_argument("--manifest", help = "Compile the formatted papers of a batch manifest instead.")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--timeout", type = float, default = DEFAULT_TIMEOUT, help = "Seconds each paper may take.")
+    parser.add_argument("--force", action = "store_true", help = "Recompile even if nothing changed.")
+    parser.add_argument("--summary", default = None, help = "Also write the report as JSON to this file.")
+
+    args = parser.parse_args()
+    papers = [(tex, None) for tex in args.papers]
+    if args.manifest:
+        # The formatted paper sits next to the original, named after its DOI.
+        papers += [(str(Path(entry["tex"]).parent / f"{entry['doi'].replace('.', '_')}.tex"), entry["doi"]) for entry in read_manifest(args.manifest)]
+    if not papers:
+        parser.error("Give tex files or --manifest.")
+
+    results = compile_papers(papers, args.workers, args.timeout, args.force)
+    print_compile_report(results)
+
+    if args.summary is not None:
+        with open(args.summary, "w") as f:
+            json.dump(results, f, indent = 2)
+
+    failed = [result for result in results if not result["ok"]]
+    print(f"Compiled {len(results) - len(failed)} of {len(results)} papers.")
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,236 @@
+import argparse
+import json
+import re
+
+from collections import deque
+from typing import NamedTuple
+
+from MetaForge import trace
+from MetaForge.misc import print_error, print_warning
+
+class LintRule(NamedTuple):
+    """ Literal strings that should not be left in a formatted paper. """
+
+    id: str
+    patterns: tuple
+    message: str
+    level: str = "error"
+
+class Hit(NamedTuple):
+    """ Where a rule matched. Lines and columns start at 1. The file is only known when linting a project. """
+
+    rule: str
+    level: str
+    line: int
+    column: int
+    text: str
+    message: str
+    file: str = None
+
+class Automaton():
+    """ An Aho-Corasick automaton, finding every occurrence of many strings in a single pass over a text. """
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]] # The (length, value) of every keyword ending in a state.
+
+        for keyword, value in keywords:
+            state = 0
+            for character in keyword:
+                if character not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][character] = len(self.goto) - 1
+                state = self.goto[state][character]
+            self.output[state].append((len(keyword), value))
+
+        # The failure links, breadth first, so that the shorter prefixes are linked before the longer ones.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.goto[state].items():
+                queue.append(next_state)
+
+                fallback = self.fail[state]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(character, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+        # From the root we can jump straight to the next character a keyword starts with.
+        self.first = re.compile("[" + "".join(re.escape(character) for character in self.goto[0]) + "]") if self.goto[0] else None
+
+    def find(self, text: str):
+        """ Yields the (start, value) of every occurrence of every keyword, overlapping ones included. """
+
+        if self.first is None:
+            return
+
+        goto, fail, output = self.goto, self.fail, self.output
+        state, position, length = 0, 0, len(text)
+        while position < length:
+            if state == 0:
+                match = self.first.search(text, position)
+                if match is None:
+                    return
+                position = match.start()
+
+            character = text[position]
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+
+            for keyword_length, value in output[state]:
+                yield position - keyword_length + 1, value
+
+            position += 1
+
+# Everything from an unescaped % on is a comment.
+COMMENT = re.compile(r"(?<!\\)%")
+
+COMMON_LINT_RULES = [
+    LintRule("doi-todo", ("TODO: DOI",), "The DOI placeholder was not replaced."),
+    LintRule("journal-reference", ("??? (20??)", "?? (202?)"), "The journal reference in the header still has placeholders."),
+    LintRule("publication-date", ("??-??-????",), "The publication date was not set."),
+    LintRule("crossmark-date", ("YYYY-MM-DD",), "The crossmark link has no date."),
+    LintRule("linenumbers", ("\\linenumbers",), "Line numbers are still on."),
+    LintRule("urlstyle", ("\\urlstyle{sf}",), "Links are still in sans serif.", "warning"),
+    LintRule("footmisc", ("{footmisc}",), "The footmisc package is still loaded.", "warning"),
+]
+
+# The DOI placeholder of the template of each journal, as left in the header link and the \doi.
+DOI_PLACEHOLDERS = {
+    "SciPostPhys": "SciPostPhys.?.?.???",
+    "SciPostPhysCore": "SciPostPhysCore.?.?.???",
+    "SciPostChem": "SciPostChem.?.?.???",
+    "SciPostPhysLectNotes": "SciPostPhysLectNotes.???",
+    "SciPostPhysCodeb": "SciPostPhysCodeb.?",
+    "SciPostPhysProc": "SciPostPhysProc.?",
+}
+
+def doi_placeholder_rule(journal: str) -> LintRule:
+    return LintRule("doi-placeholder", (DOI_PLACEHOLDERS[journal],), "The DOI still has placeholders.")
+
+# The rules of each journal. Unknown journals get the common rules and every DOI placeholder.
+LINT_RULES = {journal: COMMON_LINT_RULES + [doi_placeholder_rule(journal)] for journal in DOI_PLACEHOLDERS}
+LINT_RULES["SciPostPhysProc"] = LINT_RULES["SciPostPhysProc"] + [
+    LintRule("page-numbers", ("??.\\thepage",), "The page numbers have no issue number."),
+]
+DEFAULT_LINT_RULES = COMMON_LINT_RULES + [doi_placeholder_rule(journal) for journal in DOI_PLACEHOLDERS]
+
+JOURNAL = re.compile(r"\\doi\{10\.21468/(SciPost\w+?)\.")
+
+class Linter():
+    """ Checks formatted papers against a set of rules, compiled once into a single automaton. """
+
+    def __init__(self, rules: list):
+        self.rules = {rule.id: rule for rule in rules}
+        self.automaton = Automaton((pattern, (rule.id, pattern)) for rule in rules for pattern in rule.patterns)
+
+    def lint(self, text: str) -> list:
+        """ Returns every hit in a document, in document order, ignoring what is commented out. """
+
+        hits = []
+        for number, line in enumerate(text.split("\n"), start = 1):
+            comment = COMMENT.search(line)
+            code = line if comment is None else line[:comment.start()]
+
+            seen = set() # Patterns of a rule starting at the same place are reported once.
+            for start, (rule_id, pattern) in self.automaton.find(code):
+                if (start, rule_id) in seen:
+                    continue
+                seen.add((start, rule_id))
+
+                rule = self.rules[rule_id]
+                hits.append(Hit(rule_id, rule.level, number, start + 1, pattern, rule.message))
+
+        hits.sort(key = lambda hit: (hit.line, hit.column))
+        trace.count("lint.hits", len(hits))
+
+        return hits
+
+def load_config(path: str) -> dict:
+    """ Reads the per-journal changes to the rules from a JSON file like
+
+        {"*": {"disable": ["urlstyle"]},
+         "SciPostPhysProc": {"rules": [{"id": "draft", "patterns": ["DRAFT"], "message": "Still a draft.", "level": "warning"}]}}
+
+    where "*" applies to every journal.
+    """
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+def journal_rules(journal: str = None, config: dict = None) -> list:
+    """ The rules for a journal, with the changes of a config. """
+
+    rules = list(LINT_RULES.get(journal, DEFAULT_LINT_RULES))
+    for key in ("*", journal):
+        changes = (config or {}).get(key, {})
+        disabled = set(changes.get("disable", []))
+        rules = [rule for rule in rules if rule.id not in disabled]
+        rules += [LintRule(rule["id"], tuple(rule["patterns"]), rule["message"], rule.get("level", "error")) for rule in changes.get("rules", [])]
+
+    return rules
+
+_linters = {}
+
+def lint_paper(text: str, journal: str = None, config: dict = None) -> list:
+    """ Lints a formatted paper with the rules of its journal, which is found in its \\doi when not given. """
+
+    if journal is None:
+        match = JOURNAL.search(text)
+        journal = match.group(1) if match else None
+
+    # The automata are built once per journal, unless a config changes the rules.
+    if config:
+        return Linter(journal_rules(journal, config)).lint(text)
+    if journal not in _linters:
+        _linters[journal] = Linter(journal_rules(journal))
+
+    return _linters[journal].lint(text)
+
+def describe_hit(hit: Hit, name: str) -> str:
+    return f"{hit.file or name}:{hit.line}:{hit.column}: [{hit.rule}] {hit.message} ({hit.text!r})"
+
+def print_hits(hits: list, name: str) -> None:
+    for hit in hits:
+        message = describe_hit(hit, name)
+        if hit.level == "error":
+            print_error(message)
+        else:
+            print_warning(message)
+
+if __name__ == "__main__":
+    from MetaForge.project import Project
+
+    parser = argparse.ArgumentParser(prog = "metaforge lint", description = "Look for template leftovers in formatted papers.")
+    parser.add_argument("papers", nargs = "+")
+    parser.add_argument("--journal", default = None, help = "The journal of the papers, read from their DOI by default.")
+    parser.add_argument("--config", default = None, help = "A JSON file with per-journal rule changes.")
+    parser.add_argument("--check", action = "store_true", help = "Exit with 1 if there are errors, e.g. in CI.")
+    parser.add_argument("--strict", action = "store_true", help = "With --check, warnings fail too.")
+    parser.add_argument("--json", action = "store_true", help = "Print the hits as JSON lines.")
+
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else None
+
+    failing = {"error", "warning"} if args.strict else {"error"}
+    failed = False
+    for path in args.papers:
+        # Papers split over several files are linted as a whole, with every hit in the file it is in.
+        with Project(path) as project:
+            hits = project.lint(args.journal, config)
+
+        if args.json:
+            for hit in hits:
+                print(json.dumps(hit._asdict()))
+        else:
+            print_hits(hits, path)
+
+        failed = failed or any(hit.level in failing for hit in hits)
+
+    if args.check and failed:
+        raise SystemExit(1)
@@ -2,77 +2,96 @@ import argparse
 
 from MetaForge.misc import Date, print_error
 from MetaForge.paper import Paper, Abstract
+from MetaForge.parsed_paper import ParsedPaper
 from MetaForge.write_jats_abstract import write_jats_abstract
+from MetaForge.assets import deploy_assets
+from MetaForge.lint import describe_hit, print_hits
+from MetaForge.project import Project, publication_paths
+from MetaForge import rewrite, trace
 
 from pathlib import Path
 from datetime import date, timedelta
 
-def make_publication_format(paper_path: str, doi: str, date: str) -> None:
-    with open(paper_path, "r") as f:
-        # Given the paper_path we want to find its parent folder if possible.
-        folder = paper_path.split("/")[0] # For this to work, publications should be in folders in a directory where this is called.
-        
-        target_name = doi.replace(".", "_")
-        with open(f"{folder}/{target_name}.tex", "w") as f2:
-            formatted = Paper.format_publication_format(f.read(), doi, Date.from_DMY(date))
-            f2.write(formatted)
+def resolve_publication_date(argument: str) -> str:
+    """ Turns a DD-MM-YYYY date, or a number of days from today, into a DD-MM-YYYY date. """
+    
+    if argument.isdigit():
+        # We want to publish with a delay.
+        return (date.today() + timedelta(days = int(argument))).strftime("%d-%m-%Y")
+    
+    return argument
 
-            # Check if there are malformed dois.
+def make_publication_format(paper_path: str, doi: str, date: str, check_dois: bool = True) -> tuple:
+    """ Writes the publication version of a paper, its abstract and the templates into the folder of the paper.
+    
+    Returns the formatted paper and the report of the rewrite.
+    """
+    
+    # The publication files go next to the paper, wherever this is called from.
+    paper_path = Path(paper_path).resolve()
+    folder = paper_path.parent
+    
+    target_name = doi.replace(".", "_")
+    with trace.span("format", paper = str(paper_path), doi = doi):
+        # A paper split over several files is formatted as one, but only the files the rules change are written.
+        with Project(paper_path) as project:
+            formatted, report = rewrite.format_publication(project.text, doi, Date.from_DMY(date))
+            Paper.print_report(report)
+            
+            with trace.span("write", path = f"{target_name}.tex"):
+                project.write_edits(report.edits, publication_paths(paper_path, target_name))
+    
+    # Anything of the template that survived the rewrite is reported with its position.
+    with trace.span("lint"), Project(folder / f"{target_name}.tex") as output:
+        hits = output.lint(doi.split(".")[0])
+        print_hits(hits, f"{target_name}.tex")
+    
+    # What goes wrong after the rewrite goes in its report too, for those who collect the messages, like the batch.
+    report.notes += [(hit.level, describe_hit(hit, f"{target_name}.tex")) for hit in hits]
+    
+    # We index the formatted paper once and extract everything else from it.
+    formatted = ParsedPaper(formatted)
+    
+    # Check if there are malformed dois.
+    if check_dois:
+        with trace.span("dois"):
             Paper.find_wrong_dois(formatted)
-        
-        # We also want a JATS version of the abstract in the folder.
+    
+    # We also want a JATS version of the abstract in the folder.
+    with trace.span("abstract"):
         try:
             abstract = Paper.get_abstract(formatted)
             abstractJats = abstract.jats
             
             if abstractJats == "" or abstractJats == None:
                 raise Exception("No abstract found.")
-            
+        
         except:
             print_error("No abstract found.")
+            report.notes.append(("error", "No abstract found."))
             abstract = Abstract("")
         
-        f.close()
-    
-    with open(f"{folder}/Abstract.txt", "w") as f2:
-        f2.write(abstract.text)
-    
-    write_jats_abstract(f"{folder}/Abstract.txt")
-    
-    # We copy the crossmark image to the folder.
-    imagepath = "CROSSMARK_BW_square_no_text.png"
-    
-    source = Path(f"../MetaForge/{imagepath}")
-    newpath = Path(f"{folder}/{imagepath}")
-    newpath.write_bytes(source.read_bytes())
-    
-    # We also copy the most up-to-date SciPost.cls file.
-    imagepath = "SciPost.cls"
-    
-    source = Path(f"../MetaForge/{imagepath}")
-    newpath = Path(f"{folder}/{imagepath}")
-    newpath.write_bytes(source.read_bytes())
+        with open(folder / "Abstract.txt", "w") as f2:
+            f2.write(abstract.text)
+        
+        write_jats_abstract(str(folder / "Abstract.txt"))
     
-    # And the .gitignore file.    
-    source = Path(f"../MetaForge/gitignore.txt")
-    newpath = Path(f"{folder}/.gitignore")
-    newpath.write_bytes(source.read_bytes())
+    # We copy the crossmark image, the most up-to-date SciPost.cls file and the .gitignore file, unless they are already there.
+    with trace.span("assets"):
+        deploy_assets(folder)
     
-    pass
+    return formatted, report
 
 if __name__ == "__main__":
     print("Creating publishable documents...")
     
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(prog = "metaforge publish")
     parser.add_argument("latex_file")
     parser.add_argument("target_doi") # Journal.??.?.???
     parser.add_argument("publish_date") # DD-MM-YYYY or blank for today or int (for days from today).
-
+    
     args = parser.parse_args()
-    publication_date = args.publish_date
-    if args.publish_date.isdigit():
-        # We want to publish with a delay.
-        publication_date = (date.today() + timedelta(days = int(args.publish_date))).strftime("%d-%m-%Y")
+    publication_date = resolve_publication_date(args.publish_date)
     
     print("Publication date:", publication_date)
     make_publication_format(args.latex_file, args.target_doi, publication_date)
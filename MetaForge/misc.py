@@ -1,47 +1,49 @@
-import subprocess
+import os
 import re
+import shutil
+import tempfile
+
+from MetaForge import trace
+from MetaForge.cache import jats_cache
 
 class Author():
     """ A class to represent an author. """
     
-    def __init__(self, name, email = None, affiliation = None):
+    # Collaborations list hundreds of authors, so we keep them compact.
+    __slots__ = ("name", "email", "affiliations")
+    
+    def __init__(self, name, email = None, affiliations = ()):
         self.name = name
         self.email = email
-        self.affiliation = affiliation
+        self.affiliations = tuple(affiliations) # The ids of the affiliations, as keyed by Paper.get_affiliations.
+    
+    def __repr__(self):
+        return f"Author({self.name!r}, {self.email!r}, {self.affiliations!r})"
 
 class Abstract():
     """ A class to represent an abstract. """
     
-    def __init__(self, text):
+    def __init__(self, text, backend = "auto", cache = None):
         self.text = text
-        self.jats = self.get_Jats()
+        self.backend = backend
+        self.cache = cache # The JatsCache to convert through, the one in the user cache folder by default.
+        self._jats = None
     
-    def get_Jats(self):
-        """ Returns the JATS XML for the abstract. """
-        # First we create a temporary file with the original abstract.
-        
-        with open("abstract.txt", "w") as f:
-            f.write(self.text)
+    @property
+    def jats(self):
+        """ The JATS XML of the abstract, converted on first use. """
         
-        # Then we use pandoc to convert it to JATS.
-        subprocess.run(["pandoc", "-t", "jats", "abstract.txt", "-o", "abstract.xml"])
+        if self._jats is None:
+            self._jats = self.get_Jats()
         
-        # We read the JATS XML, and delete the temporary files.
-        abstract_jats = open("abstract.xml", "r").read()        
-        subprocess.run(["rm", "abstract.txt"])
-        subprocess.run(["rm", "abstract.xml"])
-        
-        # Finally we have to format the JATS XML.
-        tags_to_change = ["p", "inline-formula", "alternatives", "tex-math"]
-        for tag in tags_to_change:
-            abstract_jats = abstract_jats.replace(f"<{tag}>", f"<jats:{tag}>")
-            abstract_jats = abstract_jats.replace(f"</{tag}>", f"</jats:{tag}>")
-        
-        # We remove the newlines that are inserted by the JATS format.
-        abstract_jats = abstract_jats.replace("\n", " ")
-        abstract_jats = abstract_jats.strip() # And we remove the leading and trailing spaces.
+        return self._jats
+    
+    def get_Jats(self):
+        """ Returns the JATS XML for the abstract. """
         
-        return abstract_jats
+        # The native converter handles the LaTeX abstracts usually contain, pandoc is only a fallback.
+        # Conversions are cached on disk, so reruns on the same abstract skip them entirely.
+        return (jats_cache if self.cache is None else self.cache).convert(self.text, self.backend)
     
     def __repr__(self):
         return self.text
@@ -103,12 +105,48 @@ def format_line_spacing(text: str) -> str:
     
     return text
 
+def write_atomic(path, text: str, encoding: str = None, newline: str = None) -> None:
+    """ Replaces the content of a file, such that it is either completely written or left untouched. """
+    
+    path = os.path.abspath(path)
+    folder = os.path.dirname(path)
+    
+    # We write next to the file, so that the rename stays on the same filesystem.
+    descriptor, temporary = tempfile.mkstemp(dir = folder, prefix = f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(descriptor, "w", encoding = encoding, newline = newline) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        if os.path.exists(path):
+            shutil.copymode(path, temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    
+    # The rename itself only survives a crash once the folder is synced too.
+    try:
+        directory = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return # Folders cannot be opened on Windows.
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+
 def print_error(error_message: str):
     """ Prints an error message. """
     
+    trace.event("error", error_message)
     print(f"\033[91m{error_message}\033[0m")
 
 def print_warning(warning_message: str):
     """ Prints a warning message. """
     
+    trace.event("warning", warning_message)
     print(f"\033[93m{warning_message}\033[0m")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import re
+import subprocess
+import threading
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+from MetaForge import trace
+from MetaForge.misc import print_warning
+
+# An abstract used to be converted from an abstract.txt, which pandoc reads as markdown.
+PANDOC = ["pandoc", "--from", "markdown", "--to", "jats"]
+
+# How many abstracts a single pandoc process converts, and how many run at once.
+BATCH_SIZE = 64
+MAX_WORKERS = 4
+
+DEFAULT_TIMEOUT = 120
+
+class PandocError(RuntimeError):
+    """ Raised when pandoc fails, or when the output of a batch cannot be split back into its abstracts. """
+
+class PandocPool():
+    """ A bounded pool of pandoc processes, each converting a batch of abstracts through its pipes.
+
+    The abstracts of a batch are joined with separator paragraphs, which come out of pandoc as
+    paragraphs of their own, and the output is split back at them. Nothing is written to disk, so
+    that any number of threads and processes can convert at the same time.
+    """
+
+    def __init__(self, workers: int = None, batch_size: int = BATCH_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        self.workers = workers or min(MAX_WORKERS, os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+        # Shared by every thread of the process, however many conversions they start.
+        self.slots = threading.BoundedSemaphore(self.workers)
+
+    def run(self, text: str) -> str:
+        """ Runs a single pandoc process on a markdown document and returns its JATS. """
+
+        with self.slots, trace.span("pandoc", characters = len(text)):
+            try:
+                process = subprocess.run(PANDOC, input = text, capture_output = True, encoding = "utf-8", timeout = self.timeout)
+            except (OSError, subprocess.TimeoutExpired) as error:
+                raise PandocError(f"Could not run pandoc: {error}") from error
+
+        trace.count("pandoc.launches")
+        if process.returncode != 0:
+            raise PandocError(f"pandoc failed: {process.stderr.strip()}")
+
+        return process.stdout
+
+    def convert_batch(self, texts: list) -> list:
+        """ Converts abstracts with one pandoc process, or one by one if the batch does not split back apart. """
+
+        from MetaForge.jats import format_pandoc_jats
+
+        if len(texts) == 1:
+            return [format_pandoc_jats(self.run(texts[0]))]
+
+        # The separators are plain words, which markdown leaves alone, and no abstract contains.
+        marker = f"METAFORGE{uuid.uuid4().hex.upper()}SEPARATOR"
+        document = "".join(f"{text}\n\n{marker}{index}\n\n" for index, text in enumerate(texts))
+        separator = re.compile(rf"\s*<p>{marker}(\d+)</p>\s*")
+
+        try:
+            output = self.run(document)
+            pieces = separator.split(output)
+
+            # split alternates the abstracts with the indices of the separators that follow them.
+            if [int(index) for index in pieces[1::2]] != list(range(len(texts))) or pieces[-1].strip():
+                raise PandocError("The separators of the batch did not come out as they went in.")
+
+            return [format_pandoc_jats(piece) for piece in pieces[0:-1:2]]
+        except PandocError as error:
+            # An abstract that leaks into the next one, e.g. with an unclosed block, spoils the whole batch.
+            trace.count("pandoc.fallback")
+            print_warning(f"{error} Converting the {len(texts)} abstracts one by one.")
+
+            return [format_pandoc_jats(self.run(text)) for text in texts]
+
+    def convert(self, texts: list) -> list:
+        """ Converts many abstracts in as few pandoc processes as the pool allows, keeping their order. """
+
+        texts = list(texts)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self.convert_batch(batches[0]) if batches else []
+
+        with ThreadPoolExecutor(max_workers = self.workers) as pool:
+            return [jats for batch in pool.map(self.convert_batch, batches) for jats in batch]
+
+# The pool shared by all conversions of a process.
+pandoc_pool = PandocPool()
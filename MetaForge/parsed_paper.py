@@ -0,0 +1,203 @@
+import re
+
+from functools import cached_property
+
+from MetaForge.misc import Date, Abstract, format_line_spacing
+from MetaForge.bibliography import Bibliography
+from MetaForge.authors import pair_emails, extract_authors
+
+# Every marker the extractors care about, found in a single scan of the paper.
+# "END TODO: X" is tried first so that it is not mistaken for the start of a section.
+MARKERS = re.compile(r"END TODO: ([A-Z]+)|TODO: ([A-Z]+)|\\begin\{thebibliography\}\{|\\end\{thebibliography\}|\\rhead\{")
+
+AFFILIATION = re.compile(r"\{\\bf (\d+)\}")
+AFFILIATION_END = re.compile(r"[{%]")
+RECEIVED = re.compile(r"Received (.*?) \\newline", re.DOTALL)
+ACCEPTED = re.compile(r"Accepted (.*?) \\newline", re.DOTALL)
+RHEAD = re.compile(r"\\rhead\{\\small \\href\{https://scipost\.org(.*?)\}\}")
+
+class ParsedPaper():
+    """ A paper indexed in one pass, whose fields are extracted lazily from their own span. """
+
+    def __init__(self, text: str, locate_line = None):
+        self.text = text
+        self.locate_line = locate_line # Maps (line, column) to (file, line, column) for papers of several files.
+
+        # The offsets of every "TODO: X" (also those inside "END TODO: X") and "END TODO: X" marker.
+        self.todo = {}
+        self.end_todo = {}
+        self.offsets = {}
+
+        for match in MARKERS.finditer(text):
+            if match.group(1):
+                self.end_todo.setdefault(match.group(1), []).append(match.start())
+                self.todo.setdefault(match.group(1), []).append(match.start() + 4)
+            elif match.group(2):
+                self.todo.setdefault(match.group(2), []).append(match.start())
+            else:
+                self.offsets.setdefault(match.group(), []).append(match.start())
+
+    @classmethod
+    def of(cls, paper):
+        """ Returns the paper itself if it is already parsed, or parses it. Projects of several files are parsed once. """
+
+        if isinstance(paper, cls):
+            return paper
+
+        return cls(paper) if isinstance(paper, str) else paper.parsed
+
+    def span(self, name: str, start: str, end: str, before: str = "") -> tuple:
+        """ Finds the (start, end) offsets of the text between "TODO: {name}{start}" and the next {end}. """
+
+        opening = f"TODO: {name}{start}"
+        for position in self.todo.get(name, []):
+            if self.text.startswith(opening, position) and self.text.startswith(before, position - len(before)):
+                body = position + len(opening)
+                closing = self.text.find(end, body)
+
+                if closing != -1:
+                    return body, closing
+
+                break # No later opening marker can have a closing one either.
+
+        raise IndexError(f"Could not find the TODO: {name} section.")
+
+    def section(self, *args, **kwargs) -> str:
+        start, end = self.span(*args, **kwargs)
+
+        return self.text[start:end]
+
+    @cached_property
+    def title_span(self) -> tuple:
+        return self.span("TITLE", " Paste title here\n", "\n% multiline titles: end")
+
+    @cached_property
+    def abstract_span(self) -> tuple:
+        return self.span("ABSTRACT", " Paste abstract here\n", "\n%%%%%%%%%% END TODO: ABSTRACT")
+
+    @cached_property
+    def dates_span(self) -> tuple:
+        return self.span("DATES", "\n", "\n%%%%%%%%%% END TODO: DATES")
+
+    @cached_property
+    def authors_span(self) -> tuple:
+        return self.span("AUTHORS", "\n", "\n%%%%%%%%%% END TODO: AUTHORS")
+
+    @cached_property
+    def affiliations_span(self) -> tuple:
+        return self.span("AFFILIATIONS", "\n", "\n%%%%%%%%%% END")
+
+    @cached_property
+    def emails_span(self) -> tuple:
+        return self.span("EMAIL", "", "% END TODO: EMAIL", before = "% ")
+
+    @cached_property
+    def bibliography_span(self) -> tuple:
+        for position in self.offsets.get("\\begin{thebibliography}{", []):
+            body = position + len("\\begin{thebibliography}{")
+            closing = self.text.find("\\end{thebibliography}", body)
+
+            if closing != -1:
+                return body, closing
+
+        raise IndexError("Could not find the bibliography.")
+
+    @cached_property
+    def title(self) -> str:
+        """ The title of the paper. """
+
+        start, end = self.title_span
+        return format_line_spacing(self.text[start:end])
+
+    @cached_property
+    def abstract(self) -> Abstract:
+        """ The abstract of the paper. """
+
+        start, end = self.abstract_span
+        return Abstract(format_line_spacing(self.text[start:end]))
+
+    @cached_property
+    def dates(self) -> tuple:
+        """ The received and accepted dates of the paper. """
+
+        start, end = self.dates_span
+
+        # We find these in DD-MM-YYYY format.
+        received = RECEIVED.search(self.text, start, end)
+        accepted = ACCEPTED.search(self.text, start, end)
+        if received is None or accepted is None:
+            raise IndexError("Could not find the received and accepted dates.")
+
+        return Date.from_DMY(received.group(1)), Date.from_DMY(accepted.group(1))
+
+    @cached_property
+    def affiliations(self) -> dict:
+        """ The affiliations of the paper, keyed by their ids. """
+
+        start, end = self.affiliations_span
+        section = self.text[start:end] + "%" # A final % closes the last affiliation.
+
+        # We collect every {\bf k} id together with the text that follows it up to the next { or %.
+        affids, affiliations = [], {}
+        for match in AFFILIATION.finditer(section):
+            text_start = match.end() + 1 if section.startswith(" ", match.end()) else match.end()
+            text_end = AFFILIATION_END.search(section, text_start)
+
+            affids.append(int(match.group(1)))
+            affiliations.setdefault(affids[-1], format_line_spacing(section[text_start:text_end.start()]))
+
+        if not affids: # There is only one affiliation OR something went wrong. We return all as is.
+            return {1: section[:-1]}
+
+        if affids != list(range(1, len(affids) + 1)):
+            raise ValueError("Affiliation ids are not in order. Are there missing affiliations?")
+
+        return affiliations
+
+    @cached_property
+    def emails(self) -> dict:
+        """ The emails of the paper, keyed by their symbols. """
+
+        start, end = self.emails_span
+
+        return {mailsymbol: mail for mailsymbol, mail in pair_emails(self.text[start:end]) if mailsymbol is not None}
+
+    @cached_property
+    def authors(self) -> list:
+        """ The authors of the paper, with their affiliation ids and emails. """
+
+        return extract_authors(self)
+
+    @cached_property
+    def bibliography(self) -> str:
+        """ The text of the bibliography, from after \\begin{thebibliography}{ to \\end{thebibliography}. """
+
+        start, end = self.bibliography_span
+        return self.text[start:end]
+
+    @cached_property
+    def bibliography_index(self) -> Bibliography:
+        """ The index of the bibitems of the paper. """
+
+        start, end = self.bibliography_span
+        locate = None if self.locate_line is None else (lambda line: self.locate_line(line, 1)[:2])
+
+        return Bibliography(self.text[start:end], first_line = self.text.count("\n", 0, start) + 1, locate = locate)
+
+    @cached_property
+    def dois(self) -> list:
+        """ The DOIs in the bibliography, ignoring anything commented out. """
+
+        return self.bibliography_index.dois
+
+    @cached_property
+    def rheads(self) -> list:
+        """ The links of the page headers, i.e. what follows https://scipost.org in \\rhead. """
+
+        rheads = []
+        for position in self.offsets.get("\\rhead{", []):
+            match = RHEAD.match(self.text, position)
+            if match:
+                rheads.append(match.group(1))
+
+        return rheads
@@ -0,0 +1,391 @@
+import argparse
+import mmap
+import os
+import re
+
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from pathlib import Path
+
+from MetaForge import trace
+from MetaForge.misc import write_atomic, print_error, print_warning
+from MetaForge.rewrite import Edit, apply_edits
+
+INCLUDE = re.compile(r"\\(?:input|include)\{(?P<name>[^{}]+)\}")
+INCLUDE_BYTES = re.compile(rb"\\(?:input|include)\{([^{}]+)\}")
+
+# Everything from an unescaped % on is a comment.
+COMMENT = re.compile(r"(?<!\\)%")
+COMMENT_BYTES = re.compile(rb"(?<!\\)%")
+
+# What the extractors, the rewrite rules and the linter anchor on. An included file with none of
+# these (nor an included file of its own that has one) is left out of the view, so that the
+# chapters of long lecture notes are only mapped and scanned, never decoded or rewritten.
+RELEVANT_MARKERS = (b"TODO: ", b"thebibliography", b"\\rhead{", b"\\linenumbers", b"\\urlstyle{", b"{footmisc}", b"\\thepage", b"\\doi{10.21468/")
+
+def commented(text, position: int, comment = COMMENT) -> bool:
+    """ Whether a position of a text is inside a comment. """
+
+    newline = "\n" if isinstance(text, str) else b"\n"
+    line_start = text.rfind(newline, 0, position) + 1
+
+    return comment.search(text, line_start, position) is not None
+
+# Whether a file contains any of some markers, by (path, markers), with the (mtime, size) version it was scanned at.
+# Only the last version of a file is kept, and at most CONTAINS_ENTRIES of them, the oldest going first.
+_contains = {}
+CONTAINS_ENTRIES = 4096
+
+class SourceFile():
+    """ A file of a project, memory-mapped so that it can be searched without being read. """
+
+    def __init__(self, path: Path, name: str):
+        self.path = path
+        self.name = name # As the user would refer to it, for reports.
+
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.version = (stat.st_mtime_ns, stat.st_size)
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError: # Empty files cannot be mapped.
+                self.data = b""
+
+    @cached_property
+    def decoded(self) -> tuple:
+        """ The file as it is on disk, and its encoding: UTF-8, or Latin-1 for the older papers that are not. """
+
+        data = self.data[:]
+        try:
+            return data.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            return data.decode("latin-1"), "latin-1"
+
+    @property
+    def encoding(self) -> str:
+        return self.decoded[1]
+
+    @cached_property
+    def returns(self) -> list:
+        """ The offsets of the text where the \r of a \r\n line ending was dropped. """
+
+        return [match.start() - index for index, match in enumerate(re.finditer("\r\n", self.decoded[0]))]
+
+    @cached_property
+    def text(self) -> str:
+        # The rules and the extractors anchor on \n, like they did when papers were read with universal newlines.
+        return self.decoded[0].replace("\r\n", "\n") if self.returns else self.decoded[0]
+
+    def raw_offset(self, offset: int) -> int:
+        """ The offset in the file as it is on disk of an offset of the text. """
+
+        return offset + bisect_left(self.returns, offset)
+
+    @cached_property
+    def line_starts(self) -> list:
+        return [0] + [match.end() for match in re.finditer("\n", self.text)]
+
+    def contains(self, markers) -> bool:
+        # Long processes, like the daemon, see the same chapters again and again, so we only scan them once per version.
+        key = (self.path, markers)
+        known = _contains.get(key)
+        if known is None or known[0] != self.version:
+            _contains.pop(key, None)
+            if len(_contains) >= CONTAINS_ENTRIES:
+                _contains.pop(next(iter(_contains), None), None)
+
+            known = _contains[key] = (self.version, any(self.data.find(marker) != -1 for marker in markers))
+
+        return known[1]
+
+    def include_names(self) -> list:
+        """ The names of the files this file includes, found without decoding it. """
+
+        return [match.group(1).decode("utf-8", errors = "replace").strip() for match in INCLUDE_BYTES.finditer(self.data)
+                if not commented(self.data, match.start(), COMMENT_BYTES)]
+
+    def position(self, offset: int) -> tuple:
+        """ The (line, column) of an offset of the text, both starting at 1. """
+
+        line = bisect_right(self.line_starts, offset)
+
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+class Project():
+    """ A LaTeX document spread over several files, seen as the single text the extractors and the rules work on.
+
+    The view is the main file with every relevant \\input and \\include replaced by the file it
+    includes. Files are opened lazily, once the view needs them, and every offset of the view maps
+    back to a file and a line, so that edits of the view are written back to the files they touch.
+    """
+
+    def __init__(self, main, markers: tuple = RELEVANT_MARKERS, expand_all: bool = False):
+        main = Path(main)
+        self.root = main.resolve().parent # TeX resolves includes from the folder of the main file.
+        self.markers = markers
+        self.expand_all = expand_all
+
+        self.sources = {}
+        self.relevant = {}
+        self.main = self.source(main.resolve(), str(main))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self) -> None:
+        for source in self.sources.values():
+            source.close()
+
+    def source(self, path: Path, name: str = None) -> SourceFile:
+        if path not in self.sources:
+            # Included files are named relative to the main file as it was given.
+            self.sources[path] = SourceFile(path, name or str(Path(self.main.name).parent / os.path.relpath(path, self.root)))
+
+        return self.sources[path]
+
+    def resolve(self, name: str) -> Path:
+        """ The file an \\input{name} refers to, with .tex added as TeX does, or None if there is none. """
+
+        path = self.root / name
+        for candidate in (path.with_name(path.name + ".tex"), path):
+            if candidate.is_file():
+                return candidate.resolve()
+
+        return None
+
+    def is_relevant(self, path: Path, stack: tuple) -> bool:
+        """ Whether an included file, or a file it includes, has anything the view is needed for. """
+
+        if path not in self.relevant:
+            source = self.source(path)
+            self.relevant[path] = source.contains(self.markers)
+
+            for name in source.include_names() if not self.relevant[path] else []:
+                child = self.resolve(name)
+                if child is not None and child not in stack and self.is_relevant(child, stack + (path,)):
+                    self.relevant[path] = True
+                    break
+
+        return self.relevant[path]
+
+    # ============================================================
+
+    @cached_property
+    def view(self) -> tuple:
+        """ The pieces of the view as (view offset, source, start, end), in order, and the includes
+        that were expanded as (parent, start and end of the name in the parent, the name, child).
+        """
+
+        segments = []
+        inclusions = []
+        length = 0
+
+        def expand(source: SourceFile, stack: tuple) -> None:
+            nonlocal length
+
+            text = source.text
+            position = 0
+            for match in INCLUDE.finditer(text):
+                if commented(text, match.start()):
+                    continue
+
+                name = match.group("name").strip()
+                path = self.resolve(name)
+                if path is None:
+                    print_warning(f"{source.name}: could not find the included file {name}.")
+                    continue
+                if path in stack:
+                    print_warning(f"{source.name}: {name} includes itself.")
+                    continue
+                if not self.expand_all and not self.is_relevant(path, stack):
+                    continue
+
+                if match.start() > position:
+                    segments.append((length, source, position, match.start()))
+                    length += match.start() - position
+
+                child = self.source(path)
+                inclusions.append((source, match.start("name"), match.end("name"), name, child))
+                expand(child, stack + (path,))
+                position = match.end()
+
+            if len(text) > position:
+                segments.append((length, source, position, len(text)))
+                length += len(text) - position
+
+        with trace.span("project.expand", main = self.main.name):
+            expand(self.main, (self.main.path,))
+            trace.count("project.files", len({source for _, source, _, _ in segments}))
+
+        return segments, inclusions
+
+    @property
+    def segments(self) -> list:
+        return self.view[0]
+
+    @property
+    def inclusions(self) -> list:
+        return self.view[1]
+
+    def tree(self) -> list:
+        """ The main file and every file it includes, directly or not, whether the view needs them or not. """
+
+        found, pending = {}, [self.main]
+        while pending:
+            source = pending.pop()
+            if source.path in found:
+                continue
+
+            found[source.path] = source
+            for name in source.include_names():
+                path = self.resolve(name)
+                if path is not None and path not in found:
+                    pending.append(self.source(path))
+
+        return list(found.values())
+
+    @cached_property
+    def starts(self) -> list:
+        return [start for start, _, _, _ in self.segments]
+
+    @cached_property
+    def text(self) -> str:
+        return "".join(source.text[start:end] for _, source, start, end in self.segments)
+
+    @property
+    def files(self) -> list:
+        """ The files that make up the view, in the order they first appear. """
+
+        return list(dict.fromkeys(source for _, source, _, _ in self.segments))
+
+    @cached_property
+    def parsed(self):
+        from MetaForge.parsed_paper import ParsedPaper
+
+        return ParsedPaper(self.text, self.locate_line)
+
+    # ============================================================
+
+    def segment(self, offset: int) -> tuple:
+        """ The segment of the view an offset is in. """
+
+        if not self.segments:
+            return 0, self.main, 0, 0
+
+        return self.segments[max(bisect_right(self.starts, offset) - 1, 0)]
+
+    def locate(self, offset: int) -> tuple:
+        """ The (file name, line, column) an offset of the view comes from. """
+
+        start, source, source_start, _ = self.segment(offset)
+        line, column = source.position(source_start + offset - start)
+
+        return source.name, line, column
+
+    @cached_property
+    def line_starts(self) -> list:
+        return [0] + [match.end() for match in re.finditer("\n", self.text)]
+
+    def locate_line(self, line: int, column: int) -> tuple:
+        """ The (file name, line, column) a line and column of the view come from. """
+
+        return self.locate(self.line_starts[line - 1] + column - 1)
+
+    def lint(self, journal: str = None, config: dict = None) -> list:
+        """ Lints the view, with every hit pointing to the file and line it is in. """
+
+        from MetaForge.lint import lint_paper
+
+        hits = []
+        for hit in lint_paper(self.text, journal, config):
+            name, line, column = self.locate_line(hit.line, hit.column)
+            hits.append(hit._replace(file = name, line = line, column = column))
+
+        return hits
+
+    # ============================================================
+
+    def write_edits(self, edits: list, rename = None) -> list:
+        """ Writes edits of the view back to the files they touch, and only to those. Returns the written paths.
+
+        Files are replaced in place, or written to rename(path) if given, in which case the includes of
+        their parents are pointed to the new files, and the main file is always written.
+        """
+
+        local = {}
+        for edit in edits:
+            start, source, source_start, source_end = self.segment(edit.start)
+            offset = source_start - start
+            if edit.end + offset > source_end:
+                raise ValueError(f"The {edit.rule} edit of {source.name} runs into an included file.")
+
+            local.setdefault(source, []).append(Edit(edit.start + offset, edit.end + offset, edit.replacement, edit.rule))
+
+        if rename is not None:
+            local.setdefault(self.main, [])
+
+            # A parent has to include the new version of a file, which makes it touched as well.
+            for parent, start, end, name, child in reversed(self.inclusions):
+                if child in local:
+                    target = Path(os.path.relpath(rename(child.path), self.root))
+                    target = target.with_suffix("") if not Path(name).suffix else target
+                    local.setdefault(parent, []).append(Edit(start, end, target.as_posix(), "include"))
+
+        written = []
+        for source, source_edits in local.items():
+            # The edits are made to the file as it is on disk, keeping its line endings and its encoding.
+            newline = "\r\n" if source.returns else "\n"
+            raw, _ = source.decoded
+            text = apply_edits(raw, [
+                Edit(source.raw_offset(edit.start), source.raw_offset(edit.end), edit.replacement.replace("\n", newline), edit.rule)
+                for edit in source_edits
+            ])
+            if rename is None and text == raw:
+                continue
+
+            path = source.path if rename is None else rename(source.path)
+            write_atomic(path, text, encoding = source.encoding, newline = "")
+            written.append(path)
+
+        trace.count("project.written", len(written))
+
+        return written
+
+def publication_paths(main, target_name: str):
+    """ Where the publication version of each file of a paper goes: {target_name}.tex for the main file,
+    and {target_name}_{name} next to every included file that had to change.
+    """
+
+    main = Path(main).resolve()
+
+    def rename(path: Path) -> Path:
+        return main.with_name(f"{target_name}.tex") if path == main else path.with_name(f"{target_name}_{path.name}")
+
+    return rename
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge project", description = "Show the files of a LaTeX project and where its fields come from.")
+    parser.add_argument("main", help = "The main tex file of the paper.")
+    parser.add_argument("--all", action = "store_true", help = "Also expand the included files nothing is extracted from.")
+
+    args = parser.parse_args()
+    with Project(args.main, expand_all = args.all) as project:
+        for source in project.files:
+            print(source.name)
+
+        for field in ("title_span", "authors_span", "abstract_span", "bibliography_span"):
+            try:
+                start, _ = getattr(project.parsed, field)
+            except IndexError:
+                print_error(f"No {field[:-5]} found.")
+                continue
+
+            name, line, column = project.locate(start)
+            print(f"{field[:-5]}: {name}:{line}:{column}")
@@ -0,0 +1,295 @@
+import re
+
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+from MetaForge import trace
+
+class Edit(NamedTuple):
+    """ A replacement of text[start:end] in the original document. """
+
+    start: int
+    end: int
+    replacement: str
+    rule: str
+
+class Rule():
+    """ A declarative rewrite: what to look for in the original document, and what to put in its place.
+
+    The pattern is a regular expression (or a literal string when literal is True) and the
+    replacement is either a string or a function of the match and the publication context.
+    Only the given group of each match is replaced. A rule with "unless" is skipped when that
+    literal string is found in the document.
+    """
+
+    def __init__(self, name: str, pattern: str, replacement, group: int = 0, literal: bool = False, flags: int = 0,
+                 missing: tuple = None, applied: tuple = None, unless: str = None):
+        self.name = name
+        self.pattern = re.compile(re.escape(pattern) if literal else pattern, flags)
+        self.replacement = replacement
+        self.group = group
+        self.missing = missing # (level, message) reported when nothing matches.
+        self.applied = applied # (level, message) reported when something matches.
+        self.unless = unless
+
+    def edits(self, text: str, context: dict) -> list:
+        """ Returns the edits of this rule on a document. """
+
+        if self.unless is not None and self.unless in text:
+            return []
+
+        edits = []
+        for match in self.pattern.finditer(text):
+            replacement = self.replacement(match, context) if callable(self.replacement) else self.replacement
+            edits.append(Edit(match.start(self.group), match.end(self.group), replacement, self.name))
+
+        return edits
+
+    def __repr__(self):
+        return f"Rule({self.name})"
+
+class RewriteReport():
+    """ What a set of rules did to a document. """
+
+    def __init__(self):
+        self.edits = [] # The edits that were applied, in document order.
+        self.missing = [] # The rules that found nothing to rewrite.
+        self.superseded = [] # Edits dropped because they lie within an edit of a higher priority rule.
+        self.conflicts = [] # (dropped edit, kept edit) pairs that partially overlap.
+        self.notes = [] # Any other (level, message) to report.
+
+    @property
+    def applied(self) -> list:
+        """ The names of the rules that rewrote something. """
+
+        return sorted({edit.rule for edit in self.edits})
+
+    @property
+    def ok(self) -> bool:
+        return not any(level == "error" for level, _ in self.messages())
+
+    def messages(self) -> list:
+        """ Returns every (level, message) of the report, in the order the rules were declared. """
+
+        messages = list(self.notes)
+        for edit, kept in self.conflicts:
+            messages.append(("error", f"Rule {edit.rule} overlaps rule {kept.rule} at offset {edit.start}, skipped."))
+
+        return messages
+
+    def merge(self, other) -> None:
+        self.edits = sorted(self.edits + other.edits)
+        self.missing += other.missing
+        self.superseded += other.superseded
+        self.conflicts += other.conflicts
+        self.notes += other.notes
+
+class RuleSet():
+    """ An ordered set of rules, applied together to the original document. Earlier rules take priority. """
+
+    def __init__(self, name: str, rules: list, notes: list = ()):
+        self.name = name
+        self.rules = list(rules)
+        self.notes = list(notes)
+
+    def __add__(self, other):
+        return RuleSet(f"{self.name}+{other.name}", self.rules + other.rules, self.notes + other.notes)
+
+    def collect(self, text: str, context: dict) -> RewriteReport:
+        """ Finds every edit of the rules without changing the document. """
+
+        report = RewriteReport()
+        report.notes += self.notes
+
+        # The accepted edits never overlap, so sorted by their start they are sorted by their end too.
+        accepted, ends = [], []
+        for rule in self.rules:
+            with trace.span("rewrite.rule", rule = rule.name):
+                edits = rule.edits(text, context)
+
+            if not edits:
+                trace.count("rewrite.rules_missing")
+                report.missing.append(rule.name)
+                if rule.missing:
+                    report.notes.append(rule.missing)
+                continue
+
+            if rule.applied:
+                report.notes.append(rule.applied)
+
+            for edit in edits:
+                # The first accepted edit that ends after this one starts is the only one that can contain it.
+                first = bisect_right(ends, edit.start)
+                overlapping = accepted[first] if first < len(accepted) and accepted[first].start < edit.end else None
+
+                if overlapping is None:
+                    position = bisect_left(accepted, edit)
+                    accepted.insert(position, edit)
+                    ends.insert(position, edit.end)
+                elif overlapping.start <= edit.start and edit.end <= overlapping.end:
+                    report.superseded.append(edit)
+                else:
+                    report.conflicts.append((edit, overlapping))
+
+        report.edits = accepted
+        trace.count("rewrite.edits", len(report.edits))
+        trace.count("rewrite.conflicts", len(report.conflicts))
+
+        return report
+
+    def apply(self, text: str, context: dict) -> tuple:
+        """ Rewrites a document, returning the new document and the report of what was done. """
+
+        with trace.span("rewrite", rules = self.name, characters = len(text)):
+            report = self.collect(text, context)
+
+            return apply_edits(text, report.edits), report
+
+def apply_edits(text: str, edits: list) -> str:
+    """ Materializes non-overlapping edits on the original text in a single join. """
+
+    pieces = []
+    position = 0
+    for edit in sorted(edits):
+        pieces.append(text[position:edit.start])
+        pieces.append(edit.replacement)
+        position = edit.end
+    pieces.append(text[position:])
+
+    return "".join(pieces)
+
+def publication_context(doi: str, date) -> dict:
+    """ Returns what the rules need to know about a publication. """
+
+    parts = doi.split(".")
+
+    return {
+        "doi": doi,
+        "journal": parts[0],
+        "parts": parts,
+        "date": date,
+        "DMY": date.DMY() if date is not None else None,
+        "YMD": date.YMD() if date is not None else None,
+        "year": date.year if date is not None else None,
+    }
+
+# ============================================================
+
+def doi_section(match, context) -> str:
+    """ The central DOI section with the crossmark logo, already carrying the publication date. """
+
+    doi = context["doi"]
+    YMD = context["YMD"]
+
+    return f"""}}
+        \\end{{minipage}}
+        \\begin{{minipage}}{{0.25\\textwidth}}
+        \\begin{{center}}
+        \\href{{https://crossmark.crossref.org/dialog/?doi=10.21468/{doi}&amp;domain=pdf&amp;date_stamp={YMD}}}{{\\includegraphics[width=7mm]{{CROSSMARK_BW_square_no_text.png}}}}\\\\
+        \\tiny{{Check for}}\\\\
+        \\tiny{{updates}}
+        \\end{{center}}
+        \\end{{minipage}}
+        \\\\\\\\
+        \\small{{\\doi{{10.21468/{doi}}}"""
+
+DOI_SECTION = r"%%%%%%%%%% TODO: DOI\n(.*?)\n%%%%%%%%%% END TODO: DOI"
+
+# The rules every journal shares.
+COMMON_RULES = RuleSet("common", [
+    Rule("linenumbers", "\n\\linenumbers\n", "\n%\\linenumbers\n", literal = True,
+         missing = ("error", "Could not find linenumbers.")),
+    # Match \url links with \doi and \hrefs
+    Rule("urlstyle", "\n\\urlstyle{sf}\n", "\n\\urlstyle{same}\n", literal = True,
+         missing = ("error", "Could not find urlstyle.")),
+    Rule("footmisc", "\n\\usepackage[bottom]{footmisc}\n", "\n%\\usepackage[bottom]{footmisc}\n", literal = True,
+         applied = ("warning", "Removed (problematic) footmisc package.")),
+    # Add the doi on every page.
+    Rule("rhead-doi", r"\\rhead\{\\small \\href\{https://scipost\.org/(.*?)\}\{", lambda match, context: context["doi"], group = 1,
+         missing = ("error", "Could not find the doi section.")),
+])
+
+# The rules that set the publication date. The crossmark date is only there once the paper has been formatted.
+PUBLISHED_DATE = Rule("published-date", r"Published (.*?)\n%%%%%%%%%% END TODO: DATES", lambda match, context: context["DMY"], group = 1,
+                      missing = ("error", "Could not find the publication date."))
+CROSSMARK_DATE = Rule("crossmark-date", r"&amp;date_stamp=(.*?)\}", lambda match, context: context["YMD"], group = 1,
+                      missing = ("error", "Could not find the URL section."))
+# The year at the top of every page, i.e. the last four characters before the closing parenthesis.
+RHEAD_YEAR = Rule("rhead-year", r"\\rhead\{\\small \\href\{https://scipost\.org.*?(.{4})\)\}\}", lambda match, context: str(context["year"]), group = 1,
+                  missing = ("error", "Could not find the top section."))
+
+DATE_RULES = RuleSet("date", [PUBLISHED_DATE, CROSSMARK_DATE, RHEAD_YEAR])
+
+# When formatting, the crossmark link is written together with its date by the DOI section.
+FORMAT_DATE_RULES = RuleSet("format-date", [PUBLISHED_DATE, RHEAD_YEAR])
+
+# We need to begin a minipage environment next to the dates, keeping the textwidth of the journal.
+MINIPAGE = Rule("minipage", r"\\begin\{minipage\}\{.*?\\textwidth\}\n()%%%%%%%%%% TODO: DATES",
+                "\\noindent\\begin{minipage}{0.68\\textwidth}\n", group = 1,
+                missing = ("error", "Could not find the minipage next to the dates."))
+
+CENTRAL_DOI = Rule("doi-section", DOI_SECTION, doi_section, group = 1, flags = re.DOTALL,
+                   missing = ("error", "Could not find the DOI section."))
+
+# SciPost Phys. ?, ??? (20??), SciPost Phys. Core ?, ??? (20??), SciPost Chem. ?, ??? (20??)
+VOLUME_PAGE = Rule("journal-reference", r" \?, \?\?\?(?= \(20\?\?\))", lambda match, context: f" {context['parts'][1]}, {context['parts'][3]}")
+
+STANDARD_RULES = RuleSet("standard", [MINIPAGE, VOLUME_PAGE, CENTRAL_DOI])
+
+JOURNAL_RULES = {
+    "SciPostPhys": STANDARD_RULES,
+    "SciPostPhysCore": STANDARD_RULES,
+    "SciPostChem": STANDARD_RULES,
+    # SciPost Phys. Lect. Notes ??? (20??)
+    "SciPostPhysLectNotes": RuleSet("lecture-notes", [
+        MINIPAGE,
+        Rule("journal-reference", r" \?\?\?(?= \(20\?\?\))", lambda match, context: f" {context['parts'][1]}"),
+        CENTRAL_DOI,
+    ]),
+    # SciPost Phys. Codebases ?, ??? (20??) -> SciPost Phys. Codebases ?? (20??)
+    "SciPostPhysCodeb": RuleSet("codebases", [
+        MINIPAGE,
+        Rule("journal-reference", r" \?, \?\?\?(?= \(20\?\?\))", lambda match, context: f" {context['parts'][1]}"),
+        CENTRAL_DOI,
+    ]),
+    "SciPostPhysProc": RuleSet("proceedings", [
+        # The DOI section comes first, so that it takes priority over the DOI it replaces.
+        Rule("doi-section", DOI_SECTION, doi_section, group = 1, flags = re.DOTALL,
+             missing = ("warning", "Could not find the old DOI section at the center.")),
+        # SciPost Phys. Proc. ?, ?? (202?)
+        Rule("journal-reference", r" \?, \?\?(?= \(202\?\))", lambda match, context: f" {context['parts'][1]}, {context['parts'][2]}",
+             missing = ("error", "Could not find the year.")),
+        # Proceedings also carry the issue number on their page numbers.
+        Rule("page-numbers", r"??.\thepage", lambda match, context: f"{context['parts'][2]}.\\thepage", literal = True,
+             missing = ("error", "Could not find the page numbers at the end of each page.")),
+        Rule("minipage", "%%%%%%%%%% TODO: DATES", "\\noindent\\begin{minipage}{0.68\\textwidth}\n%%%%%%%%%% TODO: DATES", literal = True,
+             unless = r"\noindent\begin{minipage}{0.68\textwidth}", applied = ("warning", "Had to add a minipage to fix the central banner.")),
+        Rule("proceedings-doi", r"\doi{10.21468/SciPostPhysProc.?", lambda match, context: f"\\doi{{10.21468/SciPostPhysProc.{context['parts'][1]}", literal = True,
+             missing = ("error", "Could not find the DOI.")),
+    ]),
+}
+
+UNKNOWN_JOURNAL_RULES = RuleSet("unknown", [MINIPAGE, CENTRAL_DOI], notes = [("message", "No known journal found. Please incorporate in the code.")])
+
+# The complete rule sets, built once and shared by every paper.
+PUBLICATION_RULES = {journal: COMMON_RULES + rules + FORMAT_DATE_RULES for journal, rules in JOURNAL_RULES.items()}
+
+def publication_rules(journal: str) -> RuleSet:
+    """ Returns the rules that format a paper of a journal for publication. """
+
+    if journal in PUBLICATION_RULES:
+        return PUBLICATION_RULES[journal]
+
+    return COMMON_RULES + UNKNOWN_JOURNAL_RULES + FORMAT_DATE_RULES
+
+def format_publication(paper: str, doi: str, date) -> tuple:
+    """ Formats a paper for publication, returning the formatted paper and the report of what was done. """
+
+    context = publication_context(doi, date)
+
+    return publication_rules(context["journal"]).apply(paper, context)
+
+def set_date(paper: str, date) -> tuple:
+    """ Sets the publication date of a formatted paper, returning it with the report of what was done. """
+
+    return DATE_RULES.apply(paper, {"DMY": date.DMY(), "YMD": date.YMD(), "year": date.year})
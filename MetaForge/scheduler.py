@@ -0,0 +1,147 @@
+import argparse
+import csv
+import difflib
+import glob
+import json
+import os
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from MetaForge import rewrite, trace
+from MetaForge.misc import Date, print_error, print_warning
+from MetaForge.project import Project
+
+def read_queue(path: str) -> list:
+    """ Reads a queue of formatted papers, in the order they should be published.
+
+    The queue has one tex path per line (or a .csv whose first column is the path, with an
+    optional "tex" header). Relative paths are relative to the queue, # starts a comment.
+    """
+
+    path = Path(path).resolve()
+    with open(path, "r", newline = "") as f:
+        rows = [row for row in csv.reader(f) if row and row[0].strip() and not row[0].lstrip().startswith("#")]
+
+    if rows and rows[0][0].strip().lower() == "tex":
+        rows = rows[1:]
+
+    return [str((path.parent / row[0].strip()).resolve()) for row in rows]
+
+def schedule(papers: list, start, capacity: int, weekdays_only: bool = False) -> list:
+    """ Gives every paper of a queue a publication date, publishing at most capacity papers a day from start on.
+
+    Returns (paper, DD-MM-YYYY date) pairs, in the order of the queue.
+    """
+
+    if capacity < 1:
+        raise ValueError("At least one paper has to be published per day.")
+
+    day = start
+    assignments = []
+    for index, paper in enumerate(papers):
+        if index and index % capacity == 0:
+            day += timedelta(days = 1)
+        while weekdays_only and day.weekday() >= 5:
+            day += timedelta(days = 1)
+
+        assignments.append((paper, day.strftime("%d-%m-%Y")))
+
+    return assignments
+
+def redate(assignment: tuple, dry_run: bool = False) -> dict:
+    """ Sets the publication date of a single paper. Runs in a worker process, and never raises.
+
+    The new paper is the original with only the edited date ranges spliced in, and every file of it
+    is written atomically, and only if a byte of it changed. In a dry run nothing is written, and the diff is returned.
+    """
+
+    path, date = assignment
+    result = {"tex": path, "date": date, "ok": False, "changed": False, "messages": []}
+    try:
+        # The dates may be in an included file, which is then the only one written.
+        with Project(path) as project:
+            paper = project.text
+
+            redated, report = rewrite.set_date(paper, Date.from_DMY(date))
+            result["messages"] = [list(message) for message in report.messages()]
+            result["ok"] = report.ok
+            result["changed"] = redated != paper
+
+            if result["changed"] and dry_run:
+                result["diff"] = "".join(difflib.unified_diff(
+                    paper.splitlines(keepends = True), redated.splitlines(keepends = True), fromfile = path, tofile = f"{path} ({date})"
+                ))
+            elif result["changed"]:
+                project.write_edits(report.edits)
+    except Exception:
+        result["error"] = traceback.format_exc()
+
+    return result
+
+def run_schedule(assignments: list, workers: int = None, dry_run: bool = False) -> list:
+    """ Re-dates every scheduled paper, on a pool of processes when there are enough of them. """
+
+    workers = workers or min(len(assignments), os.cpu_count() or 1) or 1
+    with trace.span("schedule", papers = len(assignments), workers = workers):
+        if workers == 1:
+            return [redate(assignment, dry_run) for assignment in assignments]
+
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            return list(pool.map(redate, assignments, [dry_run] * len(assignments), chunksize = max(1, len(assignments) // (4 * workers))))
+
+def print_schedule(results: list) -> None:
+    for result in results:
+        name = result["tex"]
+        if "error" in result:
+            print_error(f"{name}: failed")
+            print(result["error"])
+            continue
+
+        state = "rescheduled" if result["changed"] else "unchanged"
+        print(f"{result['date']}  {name} ({state})")
+        for level, message in result["messages"]:
+            if level == "error":
+                print_error(f"  {message}")
+            elif level == "warning":
+                print_warning(f"  {message}")
+
+        if result.get("diff"):
+            print(result["diff"], end = "")
+
+if __name__ == "__main__":
+    from MetaForge.make_publication_format import resolve_publication_date
+
+    parser = argparse.ArgumentParser(prog = "metaforge schedule", description = "Schedule a queue of formatted papers for publication, and date them accordingly.")
+    parser.add_argument("queue", nargs = "?", help = "A file with the tex paths of the papers, one per line, in publication order.")
+    parser.add_argument("--glob", help = "Schedule every paper matching a glob instead, in path order.")
+    parser.add_argument("--start", default = "0", help = "The first publication day: DD-MM-YYYY, or a number of days from today.")
+    parser.add_argument("--capacity", type = int, default = 1, help = "How many papers are published per day.")
+    parser.add_argument("--weekdays-only", action = "store_true", help = "Do not publish on weekends.")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--dry-run", action = "store_true", help = "Print the changes instead of writing them.")
+    parser.add_argument("--summary", default = None, help = "Also write the results as JSON to this file.")
+
+    args = parser.parse_args()
+    if args.glob:
+        papers = [str(Path(path).resolve()) for path in sorted(glob.glob(args.glob, recursive = True))]
+    elif args.queue:
+        papers = read_queue(args.queue)
+    else:
+        parser.error("Give a queue or --glob.")
+
+    start = datetime.strptime(resolve_publication_date(args.start), "%d-%m-%Y").date()
+    results = run_schedule(schedule(papers, start, args.capacity, args.weekdays_only), args.workers, args.dry_run)
+    print_schedule(results)
+
+    if args.summary is not None:
+        with open(args.summary, "w") as f:
+            json.dump(results, f, indent = 2)
+
+    failed = [result for result in results if "error" in result or not result["ok"]]
+    changed = sum(result["changed"] for result in results)
+    print(f"{changed} of {len(results)} papers {'would be ' if args.dry_run else ''}rescheduled, {len(failed)} with errors.")
+
+    raise SystemExit(1 if failed else 0)
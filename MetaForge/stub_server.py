@@ -0,0 +1,96 @@
+import hashlib
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Server(ThreadingHTTPServer):
+    # A checker opens all its connections at once. With the default backlog of 5, those beyond it are
+    # dropped and only retried a second later, which would end up in the timings.
+    request_queue_size = 64
+    daemon_threads = True
+
+class StubDoiServer():
+    """ A local stand-in for the DOI resolver, with configurable latency and error rates.
+
+    A DOI is deterministically "not found" for a not_found_rate share of DOIs. Any request fails
+    with a 503 with probability error_rate. Everything else is redirected like doi.org does. The
+    answers for the DOIs in oversized carry a header line longer than any reader should accept.
+
+        with StubDoiServer(latency = 0.01) as server:
+            DoiChecker(server.url).check(dois)
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, not_found_rate: float = 0.0, seed: int = 0,
+                 oversized = ()):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.oversized = set(oversized)
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like the real resolver.
+
+            def setup(self):
+                stub.connections += 1
+                super().setup()
+
+            def do_HEAD(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                doi = self.path.lstrip("/")
+                if stub.random.random() < stub.error_rate:
+                    self.send_response(503)
+                elif stub.is_not_found(doi):
+                    self.send_response(404)
+                else:
+                    self.send_response(302)
+                    self.send_header("Location", f"https://publisher.invalid/{doi}")
+                if doi in stub.oversized:
+                    self.send_header("X-Padding", "x" * 100000)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self.do_HEAD()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.thread = None
+
+    def is_not_found(self, doi: str) -> bool:
+        share = int(hashlib.sha256(doi.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+        return share < self.not_found_rate
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exception):
+        self.stop()
@@ -0,0 +1,207 @@
+import argparse
+import random
+
+# What differs between the templates of the journals:
+# (banner, journal reference in the header, DOI placeholder, a DOI to publish with).
+JOURNALS = {
+    "SciPostPhys": ("SciPost Physics", "SciPost Phys. ?, ??? (20??)", "SciPostPhys.?.?.???", "SciPostPhys.{volume}.{issue}.{page:03d}"),
+    "SciPostPhysCore": ("SciPost Physics Core", "SciPost Phys. Core ?, ??? (20??)", "SciPostPhysCore.?.?.???", "SciPostPhysCore.{volume}.{issue}.{page:03d}"),
+    "SciPostPhysProc": ("SciPost Physics Proceedings", "SciPost Phys. Proc. ?, ?? (202?)", "SciPostPhysProc.?.??", "SciPostPhysProc.{volume}.{page:03d}"),
+    "SciPostPhysLectNotes": ("SciPost Physics Lecture Notes", "SciPost Phys. Lect. Notes ??? (20??)", "SciPostPhysLectNotes.???", "SciPostPhysLectNotes.{page}"),
+    "SciPostPhysCodeb": ("SciPost Physics Codebases", "SciPost Phys. Codebases ?, ??? (20??)", "SciPostPhysCodeb.?", "SciPostPhysCodeb.{page}"),
+    "SciPostChem": ("SciPost Chemistry", "SciPost Chem. ?, ??? (20??)", "SciPostChem.?.?.???", "SciPostChem.{volume}.{issue}.{page:03d}"),
+}
+
+WORDS = (
+    "we study the quantum lattice model with interactions and find that the ground state exhibits "
+    "topological order at low temperature while the excitations remain gapped in the thermodynamic limit "
+    "using exact diagonalization tensor networks and field theory methods"
+).split()
+
+FORMULAS = [r"\nu=1/3", r"E = mc^2", r"\mathcal{O}(N^2)", r"T_c \approx 0.5 J", r"\langle S^z \rangle", r"\beta \to \infty"]
+
+SYMBOLS = [r"\star", r"\dagger", r"\ddagger", r"\circ", r"\diamond", r"\S", r"\P"]
+
+def abstract(rng: random.Random, words: int, math_density: float) -> str:
+    """ A random abstract where about math_density of the words are formulas. """
+
+    tokens = []
+    for i in range(words):
+        if rng.random() < math_density:
+            tokens.append(f"${rng.choice(FORMULAS)}$")
+        elif rng.random() < 0.02:
+            tokens.append(r"\emph{" + rng.choice(WORDS) + "}")
+        else:
+            tokens.append(rng.choice(WORDS))
+
+        if i % 12 == 11:
+            tokens[-1] += "\n" # Abstracts are pasted over several lines.
+
+    # Only the first character is capitalized, as str.capitalize() would lowercase the formulas too.
+    text = " ".join(tokens)
+
+    return text[:1].upper() + text[1:] + "."
+
+def bibliography(rng: random.Random, bibitems: int, duplicates: float = 0.05, commented: float = 0.02) -> str:
+    """ A random bibliography, with some DOIs cited twice and some entries commented out. """
+
+    items = []
+    dois = []
+    for i in range(1, bibitems + 1):
+        if dois and rng.random() < duplicates:
+            doi = rng.choice(dois)
+        else:
+            doi = f"10.{rng.randint(1000, 99999)}/synthetic.{i}"
+            dois.append(doi)
+
+        item = f"\\bibitem{{ref{i}}} A. Author and B. Author, \\emph{{Title number {i}}}, J. Synth. \\textbf{{{i % 97}}}, {i} ({1950 + i % 75}), \\doi{{{doi}}}."
+        if rng.random() < 0.1:
+            item += f"\n\\href{{https://arxiv.org/abs/{2000 + i % 24}.{i:05d}}}{{arXiv:{2000 + i % 24}.{i:05d}}}"
+        if rng.random() < commented:
+            item = "% " + item.replace("\n", "\n% ")
+
+        items.append(item)
+
+    return "\n".join(items)
+
+def generate_paper(journal: str = "SciPostPhys", affiliations: int = 3, abstract_words: int = 150, math_density: float = 0.05,
+                   bibitems: int = 100, seed: int = 0) -> tuple:
+    """ Generates a synthetic paper on the SciPost template of a journal.
+
+    Returns the .tex source and a DOI to publish it with.
+    """
+
+    rng = random.Random(seed)
+    banner, reference, placeholder, doi = JOURNALS[journal]
+    doi = doi.format(volume = rng.randint(1, 20), issue = rng.randint(1, 6), page = rng.randint(1, 300))
+
+    authors = max(affiliations, 1)
+    author_lines = []
+    for i in range(authors):
+        symbol = f"${SYMBOLS[i % len(SYMBOLS)]}$" if i < len(SYMBOLS) else ""
+        separator = "," if i < authors - 2 else (" and" if i == authors - 2 else "")
+        author_lines.append(f"A. Author{i + 1}\\textsuperscript{{{i % affiliations + 1}{symbol}}}{separator}")
+
+    affiliation_lines = "\n\\\\\n".join(f"{{\\bf {i + 1}}} Department {i + 1}, University of Somewhere,\nCity, Country" for i in range(affiliations))
+    email_lines = ",\\quad\n".join(
+        f"${SYMBOLS[i]}$ \\href{{mailto:author{i + 1}@uni.edu}}{{\\small author{i + 1}@uni.edu}}" for i in range(min(authors, len(SYMBOLS)))
+    )
+
+    # Proceedings number their pages with their issue.
+    footer = r"\fancyfoot[C]{\textbf{??.\thepage}}" if journal == "SciPostPhysProc" else r"\fancyfoot[C]{\textbf{\thepage}}"
+
+    body = "\n\n".join(f"\\section{{Section {i}}}\n" + abstract(rng, 200, math_density) for i in range(1, 4))
+
+    tex = f"""\\documentclass{{SciPost}}
+
+\\usepackage[bottom]{{footmisc}}
+
+\\urlstyle{{sf}}
+
+\\fancypagestyle{{SPstyle}}{{
+\\fancyhf{{}}
+\\lhead{{\\colorbox{{scipostblue}}{{\\bf \\color{{white}} ~{banner} }}}}
+\\rhead{{\\small \\href{{https://scipost.org/{placeholder}}}{{{reference}}}}}
+\\renewcommand{{\\headrulewidth}}{{1pt}}
+{footer}
+}}
+
+\\begin{{document}}
+
+\\pagestyle{{SPstyle}}
+
+\\begin{{center}}{{\\Large \\textbf{{\\color{{scipostdeepblue}}{{
+%%%%%%%%%% TODO: TITLE Paste title here
+A synthetic paper on {rng.choice(WORDS)} {rng.choice(WORDS)} \\\\ and {rng.choice(WORDS)}
+% multiline titles: end with a \\\\ to regularize line spacing
+}}}}}}\\end{{center}}
+
+\\begin{{center}}\\textbf{{
+%%%%%%%%%% TODO: AUTHORS
+{chr(10).join(author_lines)}
+%%%%%%%%%% END TODO: AUTHORS
+}}\\end{{center}}
+
+\\begin{{center}}
+%%%%%%%%%% TODO: AFFILIATIONS
+{affiliation_lines}
+%%%%%%%%%% END TODO: AFFILIATIONS
+\\end{{center}}
+
+\\begin{{center}}
+%%%%%%%%%% TODO: EMAIL (IF YOU WANT TO INCLUDE THEM)
+{email_lines}
+%%%%%%%%%% END TODO: EMAIL
+\\end{{center}}
+
+\\section*{{\\color{{scipostdeepblue}}{{Abstract}}}}
+\\boldmath\\textbf{{
+%%%%%%%%%% TODO: ABSTRACT Paste abstract here
+{abstract(rng, abstract_words, math_density)}
+%%%%%%%%%% END TODO: ABSTRACT
+}}
+
+\\vspace{{\\baselineskip}}
+
+%%%%%%%%%% TODO: COPYRIGHT
+\\noindent\\textcolor{{white!90!black}}{{%
+\\fbox{{\\parbox{{0.975\\linewidth}}{{%
+\\textcolor{{white!40!black}}{{\\begin{{tabular}}{{lr}}%
+  \\begin{{minipage}}{{0.6\\textwidth}}%
+    {{\\small Copyright attribution to authors. \\newline
+    This work is a submission to {banner}. \\newline
+    License information to appear upon publication. \\newline
+    Publication information to appear upon publication.}}
+  \\end{{minipage}} & \\begin{{minipage}}{{0.4\\textwidth}}
+%%%%%%%%%% TODO: DATES
+    {{\\small Received {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2023 \\newline Accepted {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024 \\newline
+    Published ??-??-????
+%%%%%%%%%% END TODO: DATES
+  }}\\end{{minipage}}
+\\end{{tabular}}}}
+}}}}
+}}
+%%%%%%%%%% END TODO: COPYRIGHT
+
+%%%%%%%%%% TODO: DOI
+\\doi{{10.21468/{placeholder}}}
+%%%%%%%%%% END TODO: DOI
+
+\\linenumbers
+
+{body}
+
+\\begin{{thebibliography}}{{{bibitems}}}
+{bibliography(rng, bibitems)}
+\\end{{thebibliography}}
+
+\\end{{document}}
+"""
+
+    return tex, doi
+
+def generate_corpus(journals = tuple(JOURNALS), sizes = (10, 100, 1000, 10000), **options):
+    """ Yields (journal, bibitems, tex, doi) for every combination of journal and bibliography size. """
+
+    for journal in journals:
+        for size in sizes:
+            tex, doi = generate_paper(journal, bibitems = size, **options)
+            yield journal, size, tex, doi
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "metaforge synthetic", description = "Generate a synthetic SciPost paper.")
+    parser.add_argument("output")
+    parser.add_argument("--journal", default = "SciPostPhys", choices = list(JOURNALS))
+    parser.add_argument("--affiliations", type = int, default = 3)
+    parser.add_argument("--abstract-words", type = int, default = 150)
+    parser.add_argument("--math-density", type = float, default = 0.05)
+    parser.add_argument("--bibitems", type = int, default = 100)
+    parser.add_argument("--seed", type = int, default = 0)
+
+    args = parser.parse_args()
+    tex, doi = generate_paper(args.journal, args.affiliations, args.abstract_words, args.math_density, args.bibitems, args.seed)
+
+    with open(args.output, "w") as f:
+        f.write(tex)
+
+    print(f"Wrote {args.output}, publish it as {doi}.")
@@ -0,0 +1,214 @@
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+# Set METAFORGE_TRACE to a .json (Chrome trace) or .jsonl file to trace a run, e.g.
+#     METAFORGE_TRACE=trace.json python -m MetaForge.make_publication_format ...
+TRACE_ENV = "METAFORGE_TRACE"
+
+# The process that writes the file named by METAFORGE_TRACE. The processes it starts write files of their own.
+TRACE_OWNER_ENV = "METAFORGE_TRACE_OWNER"
+
+# The span we are currently in, followed across threads and asyncio tasks.
+_current = contextvars.ContextVar("metaforge_span", default = None)
+
+class _NullSpan():
+    """ What span() returns while tracing is off: does nothing, as cheaply as possible. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span():
+    """ A timed, possibly nested, section of a run. """
+
+    def __init__(self, tracer, name: str, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.id = next(tracer.ids)
+        self.parent = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self.token = _current.set(self.id)
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        duration = time.perf_counter() - self.start
+        _current.reset(self.token)
+
+        if exception_type is not None:
+            self.attributes["error"] = exception_type.__name__
+
+        self.tracer.record({
+            "type": "span",
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "start": self.start - self.tracer.origin,
+            "duration": duration,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "attributes": self.attributes,
+        })
+
+        return False
+
+    def set(self, **attributes):
+        """ Adds attributes once they are known, e.g. the status of a request. """
+
+        self.attributes.update(attributes)
+
+class Tracer():
+    """ Collects timing spans, counters and events. Off by default, in which case it costs next to nothing. """
+
+    def __init__(self):
+        self.enabled = False
+        self.ids = itertools.count(1)
+        self.origin = time.perf_counter()
+        self.records = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        with self.lock:
+            self.records = []
+            self.counters = {}
+
+    def record(self, record: dict) -> None:
+        with self.lock:
+            self.records.append(record)
+
+    def span(self, name: str, **attributes):
+        """ Times a block: with span("pandoc", backend = "pandoc"): ... """
+
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """ Adds to a counter, e.g. count("doi.checked"). """
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def event(self, level: str, message: str, **attributes) -> None:
+        """ Records something that happened, like the errors and warnings we print. """
+
+        if not self.enabled:
+            return
+
+        self.record({
+            "type": "event",
+            "level": level,
+            "message": message,
+            "span": _current.get(),
+            "time": time.perf_counter() - self.origin,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "attributes": attributes,
+        })
+
+    def export_jsonl(self, path: str) -> None:
+        """ Writes one JSON object per span, event and counter. """
+
+        with open(path, "w") as f:
+            for record in self.records:
+                f.write(json.dumps(record, default = str) + "\n")
+            for name, value in self.counters.items():
+                f.write(json.dumps({"type": "counter", "name": name, "value": value}) + "\n")
+
+    def export_chrome(self, path: str) -> None:
+        """ Writes the Chrome trace format, viewable in chrome://tracing or Perfetto. """
+
+        events = []
+        for record in self.records:
+            if record["type"] == "span":
+                events.append({
+                    "name": record["name"], "ph": "X", "pid": record["pid"], "tid": record["tid"],
+                    "ts": record["start"] * 1e6, "dur": record["duration"] * 1e6, "args": record["attributes"],
+                })
+            else:
+                events.append({
+                    "name": record["message"], "ph": "i", "s": "t", "pid": record["pid"], "tid": record["tid"],
+                    "ts": record["time"] * 1e6, "args": dict(record["attributes"], level = record["level"]),
+                })
+
+        end = (time.perf_counter() - self.origin) * 1e6
+        for name, value in self.counters.items():
+            events.append({"name": name, "ph": "C", "pid": os.getpid(), "ts": end, "args": {name: value}})
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default = str)
+
+    def export(self, path: str) -> None:
+        """ Exports to JSON lines for a .jsonl file, and to the Chrome trace format otherwise. """
+
+        if str(path).endswith(".jsonl"):
+            self.export_jsonl(path)
+        else:
+            self.export_chrome(path)
+
+# The tracer shared by the whole process.
+tracer = Tracer()
+
+span = tracer.span
+count = tracer.count
+event = tracer.event
+
+def _trace_worker(tracer: Tracer) -> None:
+    """ Traces a process started by a traced one, into a file of its own next to the file of the main process. """
+
+    import multiprocessing.util
+
+    root, extension = os.path.splitext(os.environ[TRACE_ENV])
+
+    # Forked processes start with the records of their parent, which the parent writes itself.
+    tracer.clear()
+    tracer.enable()
+
+    # Pool workers leave through os._exit, which skips atexit, but multiprocessing still runs its finalizers
+    # there. In other processes, the finalizers run at exit like atexit would.
+    multiprocessing.util.Finalize(tracer, tracer.export, args = (f"{root}.{os.getpid()}{extension}",), exitpriority = 10)
+
+def _trace_from_environment() -> None:
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return
+
+    import multiprocessing.util
+
+    tracer.enable()
+    if os.environ.setdefault(TRACE_OWNER_ENV, str(os.getpid())) == str(os.getpid()):
+        atexit.register(tracer.export, path)
+    else:
+        _trace_worker(tracer) # A spawned worker, or any other process of ours started by a traced one.
+
+    # Forked workers do not import us again, so they start their trace after the fork.
+    multiprocessing.util.register_after_fork(tracer, _trace_worker)
+
+_trace_from_environment()
@@ -2,13 +2,21 @@ import argparse
 
 from MetaForge.misc import Abstract
 
+def flatten_abstract(abstract: str) -> str:
+    """ The abstract on a single line, as it is converted. """
+    
+    # We remove newlines or spaces.
+    abstract = abstract.replace("\n", " ")
+    abstract = abstract.strip()
+    
+    return abstract
+
 def write_jats_abstract(abstract_path: str) -> None:
     with open(abstract_path, "r") as f:
         abstract = f.read()
     
     # We remove newlines or spaces and re-write the file.
-    abstract = abstract.replace("\n", " ")
-    abstract = abstract.strip()
+    abstract = flatten_abstract(abstract)
     
     with open(abstract_path, "w") as f:
         f.write(abstract)
@@ -36,7 +44,7 @@ def write_jats_abstract(abstract_path: str) -> None:
 if __name__ == "__main__":
     print("Creating jats format...")
     
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(prog = "metaforge jats")
     parser.add_argument("txt_file")
 
     args = parser.parse_args()
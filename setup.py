@@ -4,4 +4,9 @@ setuptools.setup(
     name = "MetaForge",
     version = "1.0",
     author = "KitenPirate",
-)
\ No newline at end of file
+    packages = ["MetaForge"],
+    package_data = {"MetaForge": ["templates/*", "schemas/**/*.xsd"]},
+    entry_points = {
+        "console_scripts": ["metaforge = MetaForge.cli:main"],
+    },
+)
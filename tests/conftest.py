@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# The tests get caches of their own, set before MetaForge reads where they are, and never touch those of the user.
+os.environ["METAFORGE_CACHE_DIR"] = tempfile.mkdtemp(prefix = "metaforge-tests-")
+os.environ.pop("METAFORGE_DOI_INDEX", None)
+os.environ.pop("METAFORGE_SOCKET", None)
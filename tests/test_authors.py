@@ -0,0 +1,29 @@
+from MetaForge.authors import pair_emails, parse_authors
+
+def test_parse_authors():
+    section = r"""A. Alpha\textsuperscript{1,2$\star$}, B. Beta$^{2}$ and
+C. Gamma\textsuperscript{1}"""
+
+    assert parse_authors(section) == [("A. Alpha", (1, 2), ("\\star",)), ("B. Beta", (2,), ()), ("C. Gamma", (1,), ())]
+
+def test_commented_out_author_between_two_authors():
+    section = r"""A. Alpha\textsuperscript{1},
+C. S\'anchez \~N\textsuperscript{2}
+% E. Removed\textsuperscript{3},
+D. van der Berg\textsuperscript{2} % and F. Inline\textsuperscript{4}
+"""
+
+    assert parse_authors(section) == [
+        ("A. Alpha", (1,), ()),
+        ("C. S\\'anchez \\~N", (2,), ()),
+        ("D. van der Berg", (2,), ()),
+    ]
+
+def test_escaped_percent_is_not_a_comment():
+    assert parse_authors(r"A. 100\% Alpha\textsuperscript{1}") == [("A. 100\\% Alpha", (1,), ())]
+
+def test_pair_emails():
+    section = r"""$\star$ \href{mailto:a@uni.edu}{a@uni.edu}, $\dagger$ % \href{mailto:old@uni.edu}{old}
+\href{mailto:b@uni.edu}{b@uni.edu}, \href{mailto:c@uni.edu}{c@uni.edu}"""
+
+    assert pair_emails(section) == [("\\star", "a@uni.edu"), ("\\dagger", "b@uni.edu"), (None, "c@uni.edu")]
@@ -0,0 +1,33 @@
+import json
+
+from MetaForge.batch import print_summary, read_manifest, run_batch
+from MetaForge.synthetic import generate_paper
+
+def test_two_papers(tmp_path, capsys):
+    rows = []
+    for name, seed in [("good", 1), ("broken", 2)]:
+        tex, doi = generate_paper(bibitems = 5, seed = seed)
+        if name == "broken":
+            tex = tex.replace("\n\\linenumbers\n", "\n")
+
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "main.tex").write_text(tex)
+        rows.append({"tex": f"{name}/main.tex", "doi": doi, "date": "01-02-2025"})
+
+    (tmp_path / "manifest.json").write_text(json.dumps(rows))
+    entries = read_manifest(tmp_path / "manifest.json")
+    results = run_batch(entries, workers = 2, check_dois = False, summary_path = tmp_path / "summary.json")
+
+    good, broken = results
+    assert good["ok"] and not any(level == "error" for level, _ in good["messages"])
+    assert not broken["ok"] and ["error", "Could not find linenumbers."] in broken["messages"]
+    assert (tmp_path / "good" / f"{good['doi'].replace('.', '_')}.tex").exists()
+    assert json.loads((tmp_path / "summary.json").read_text()) == results
+
+    capsys.readouterr()
+    print_summary(results)
+    output = capsys.readouterr().out
+
+    assert f"{good['doi']} ({good['tex']}): ok" in output
+    assert "Could not find linenumbers." in output
+    assert "2 of 2 papers formatted." in output
@@ -0,0 +1,35 @@
+from MetaForge.bibliography import Bibliography
+
+BIBLIOGRAPHY = """\\begin{thebibliography}{9}
+A stray \\doi{10.1000/early} before the entries.
+
+\\bibitem{first} A. Author, \\doi{10.1000/a}.
+% \\bibitem{commented} \\doi{10.1000/commented}
+
+\\bibitem{second} B. Author, 50\\% off, \\doi{10.1000/early}, arXiv:2101.00001.
+\\end{thebibliography}
+"""
+
+def test_index():
+    bibliography = Bibliography(BIBLIOGRAPHY, first_line = 10)
+
+    assert bibliography.keys == ["first", "second"]
+    assert list(bibliography.lines) == [13, 16]
+    assert bibliography.unique_dois() == ["10.1000/early", "10.1000/a"]
+    assert bibliography.item(2).arxiv == ("2101.00001",)
+    assert bibliography.duplicates() == {"10.1000/early": [0, 2]}
+
+def test_references_outside_any_bibitem():
+    bibliography = Bibliography(BIBLIOGRAPHY)
+
+    assert bibliography.references("10.1000/a") == "1"
+    assert bibliography.references("10.1000/early") == "outside any bibitem, 2"
+
+def test_braces_and_junk_in_doi():
+    bibliography = Bibliography("""\\bibitem{a} \\doi{10.1000/{\\_}y}.
+\\bibitem{b} \\doi{TODO}, \\doi{}, \\doi{https://doi.org/10.1000/b}
+\\bibitem{c} \\doi{10.1000/c{\\_}d{\\_}e}
+""")
+
+    assert bibliography.unique_dois() == ["10.1000/{\\_}y", "https://doi.org/10.1000/b", "10.1000/c{\\_}d{\\_}e"]
+    assert bibliography.item(2).dois == ("https://doi.org/10.1000/b",)
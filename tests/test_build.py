@@ -0,0 +1,50 @@
+import pytest
+
+from MetaForge.build import STATE_FILE, Build
+from MetaForge.paper import Paper
+from MetaForge.synthetic import generate_paper
+
+DATE = "01-01-2025"
+
+@pytest.fixture
+def build(tmp_path):
+    tex, doi = generate_paper(bibitems = 5, seed = 4)
+    (tmp_path / "main.tex").write_text(tex.replace("\n\\linenumbers\n", "\n"))
+
+    return Build(tmp_path / "main.tex", doi, DATE)
+
+def test_skipped_stages_replay_their_messages(build, capsys, monkeypatch):
+    checks = []
+    def wrong_dois(paper, *args):
+        checks.append(paper)
+        return ["10.1000/wrong"], [("error", " [1]: (404) - https://doi.org/10.1000/wrong")]
+
+    monkeypatch.setattr(Paper, "wrong_dois", wrong_dois)
+
+    assert build.run() == ["format", "abstract", "jats", "dois", "assets"]
+    first = capsys.readouterr().out
+
+    assert Build(build.paper_path, build.doi, DATE).run() == []
+    second = capsys.readouterr().out
+
+    assert len(checks) == 1
+    for message in ["Could not find linenumbers.", "https://doi.org/10.1000/wrong"]:
+        assert message in first and message in second
+
+def test_lints_the_formatted_paper(build, capsys, monkeypatch):
+    monkeypatch.setattr(Paper, "wrong_dois", lambda paper, *args: ([], []))
+    build.paper_path.write_text(build.paper_path.read_text().replace("\\section{Section 1}\n", "\\section{Section 1}\nSee YYYY-MM-DD.\n"))
+
+    build.run()
+
+    assert "[crossmark-date] The crossmark link has no date." in capsys.readouterr().out
+    assert any("[crossmark-date]" in message for _, message in build.load_state()["messages"]["format"])
+
+def test_state_is_written_whole(build):
+    build.save_state({"stages": {"format": "key"}})
+
+    with pytest.raises(TypeError):
+        build.save_state({"stages": {"format": object()}})
+
+    assert build.load_state() == {"stages": {"format": "key"}}
+    assert [path.name for path in build.folder.iterdir() if path.name.startswith(STATE_FILE)] == [STATE_FILE]
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from MetaForge.assets import ASSETS, ASSET_DIR
+from MetaForge.cli import COMMANDS, HEAVY_MODULES, IMPORT_BUDGETS, import_cost, main
+
+# Slow machines, like shared CI runners, may scale the budgets up.
+SCALE = float(os.environ.get("METAFORGE_IMPORT_SCALE", "1"))
+
+@pytest.mark.parametrize("command", list(IMPORT_BUDGETS))
+def test_import_budget(command):
+    module = COMMANDS[command][0]
+    seconds, loaded = import_cost(module)
+
+    assert seconds <= IMPORT_BUDGETS[command] * SCALE, f"importing {module} takes {seconds * 1e3:.1f} ms"
+    assert [name for name in HEAVY_MODULES if name in loaded] == []
+
+def test_templates_are_package_data():
+    assert ASSET_DIR.parent.name == "MetaForge"
+    assert all((ASSET_DIR / source).is_file() for source, _ in ASSETS)
+
+@pytest.mark.parametrize("command", list(COMMANDS))
+def test_usage_names_the_command(command, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main([command, "-h"])
+
+    assert exit.value.code == 0
+    assert f"usage: metaforge {command} " in capsys.readouterr().out
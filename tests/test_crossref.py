@@ -0,0 +1,108 @@
+import pytest
+
+from MetaForge import crossref
+from MetaForge.synthetic import generate_paper
+
+def manifest(folder, papers: int = 2) -> list:
+    entries = []
+    for seed in range(papers):
+        tex, doi = generate_paper(bibitems = 20, seed = seed)
+        path = folder / f"paper{seed}.tex"
+        path.write_text(tex)
+        entries.append({"tex": str(path), "doi": doi, "date": "01-01-2025"})
+
+    return entries
+
+def test_write_deposit(tmp_path):
+    output = tmp_path / "deposit.xml"
+
+    assert crossref.write_deposit(manifest(tmp_path), output, "admin@scipost.org") == 2
+    assert crossref.validate_deposit(output) == []
+
+def test_failing_paper_keeps_the_previous_deposit(tmp_path, monkeypatch):
+    output = tmp_path / "deposit.xml"
+    output.write_text("previous")
+
+    def fail(*args):
+        raise KeyError("broken")
+
+    monkeypatch.setattr(crossref.DepositWriter, "citations", fail)
+    with pytest.raises(KeyError):
+        crossref.write_deposit(manifest(tmp_path), output, "admin@scipost.org")
+
+    assert output.read_text() == "previous"
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".")] == []
+
+def test_empty_manifest(tmp_path):
+    output = tmp_path / "deposit.xml"
+    output.write_text("previous")
+
+    with pytest.raises(ValueError):
+        crossref.write_deposit([], output, "admin@scipost.org")
+
+    # Nor is a deposit written when no paper could be.
+    (tmp_path / "empty.tex").write_text("Not a paper.")
+    with pytest.raises(ValueError):
+        crossref.write_deposit([{"tex": str(tmp_path / "empty.tex"), "doi": "SciPostPhys.1.2.003", "date": "01-01-2025"}], output, "admin@scipost.org")
+
+    assert output.read_text() == "previous"
+
+# A schema in the Crossref namespace that only accepts a head and a body of journals.
+SCHEMA = f"""<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns="{crossref.CROSSREF_NAMESPACE}" targetNamespace="{crossref.CROSSREF_NAMESPACE}" elementFormDefault="qualified">
+  <xsd:include schemaLocation="parts/journal.xsd"/>
+  <xsd:element name="doi_batch">
+    <xsd:complexType>
+      <xsd:sequence>
+        <xsd:element name="head"><xsd:complexType><xsd:sequence><xsd:any processContents="skip" maxOccurs="unbounded"/></xsd:sequence></xsd:complexType></xsd:element>
+        <xsd:element name="body"><xsd:complexType><xsd:sequence><xsd:element ref="journal" maxOccurs="unbounded"/></xsd:sequence></xsd:complexType></xsd:element>
+      </xsd:sequence>
+      <xsd:anyAttribute processContents="skip"/>
+    </xsd:complexType>
+  </xsd:element>
+</xsd:schema>
+"""
+
+JOURNAL = f"""<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" targetNamespace="{crossref.CROSSREF_NAMESPACE}" elementFormDefault="qualified">
+  <xsd:element name="journal"><xsd:complexType><xsd:sequence><xsd:any processContents="skip" maxOccurs="unbounded"/></xsd:sequence></xsd:complexType></xsd:element>
+</xsd:schema>
+"""
+
+def test_validates_against_the_schema(tmp_path):
+    pytest.importorskip("lxml")
+
+    (tmp_path / "schema" / "parts").mkdir(parents = True)
+    (tmp_path / "schema" / "crossref.xsd").write_text(SCHEMA)
+    (tmp_path / "schema" / "parts" / "journal.xsd").write_text(JOURNAL)
+
+    output = tmp_path / "deposit.xml"
+    crossref.write_deposit(manifest(tmp_path), output, "admin@scipost.org")
+    assert crossref.validate_deposit(output, tmp_path / "schema" / "crossref.xsd") == []
+
+    output.write_text(output.read_text().replace("<journal>", "<journal_article>", 1))
+    (where, message), = crossref.validate_deposit(output, tmp_path / "schema" / "crossref.xsd")
+    assert where.startswith("line ") and "journal_article" in message
+
+def test_fetch_schema(tmp_path):
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+    import threading
+
+    (tmp_path / "site" / "schemas" / "parts").mkdir(parents = True)
+    (tmp_path / "site" / "schemas" / "crossref.xsd").write_text(SCHEMA)
+    (tmp_path / "site" / "schemas" / "parts" / "journal.xsd").write_text(JOURNAL)
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory = str(tmp_path / "site")))
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/schemas/crossref.xsd"
+        written = crossref.fetch_schema(url, tmp_path / "vendored")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sorted(path.relative_to(tmp_path / "vendored").as_posix() for path in written) == ["crossref.xsd", "parts/journal.xsd"]
+    assert (tmp_path / "vendored" / "parts" / "journal.xsd").read_text() == JOURNAL
@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import pytest
+
+from MetaForge import assets, project
+from MetaForge.daemon import Client, Daemon, DaemonError
+from MetaForge.synthetic import generate_paper
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are short, shorter than those of pytest's temporary folders.
+    folder = tempfile.mkdtemp(prefix = "metaforge-", dir = "/tmp")
+    yield Path(folder) / "daemon.sock"
+    shutil.rmtree(folder, ignore_errors = True)
+
+def start_daemon(path: Path) -> subprocess.Popen:
+    environment = dict(os.environ, PYTHONPATH = os.pathsep.join([os.getcwd(), *sys.path]))
+    process = subprocess.Popen([sys.executable, "-m", "MetaForge.daemon", "--socket", str(path), "serve"],
+                               env = environment, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE)
+
+    deadline = time.monotonic() + 30
+    while not path.exists():
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            pytest.fail(f"The daemon did not start: {process.communicate()[1].decode()}")
+        time.sleep(0.05)
+
+    return process
+
+def test_status_lint_and_stop(tmp_path, socket_path):
+    tex, _ = generate_paper(bibitems = 5, seed = 1)
+    (tmp_path / "paper.tex").write_text(tex)
+
+    process = start_daemon(socket_path)
+    try:
+        with Client(socket_path, timeout = 30) as client:
+            status = client.call("status")
+            assert status["pid"] == process.pid and status["socket"] == str(socket_path)
+
+            hits = client.call("lint", paper = str(tmp_path / "paper.tex"))["hits"]
+            assert [(hit["rule"], hit["line"], hit["column"]) for hit in hits][-1] == ("linenumbers", 99, 1)
+
+            with pytest.raises(DaemonError, match = "FileNotFoundError"):
+                client.call("lint", paper = str(tmp_path / "missing.tex"))
+
+            # A daemon already listens there, which a second one does not replace.
+            with pytest.raises(RuntimeError, match = "already listening"):
+                Daemon(socket_path).serve()
+
+            # Which it found out with a ping of its own.
+            assert client.call("status")["jobs"] == 4
+            assert client.call("stop") == {"pid": process.pid, "jobs": 5}
+
+        assert process.wait(timeout = 30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stderr.close()
+
+    assert not socket_path.exists()
+
+def test_caches_keep_the_last_version_of_a_bounded_number_of_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(project, "_contains", {})
+    monkeypatch.setattr(project, "CONTAINS_ENTRIES", 3)
+    monkeypatch.setattr(assets, "_hashes", {})
+    monkeypatch.setattr(assets, "HASH_ENTRIES", 3)
+
+    path = tmp_path / "chapter.tex"
+    for version in range(5):
+        path.write_text("\\input{a}" * version)
+        os.utime(path, ns = (version, version))
+
+        source = project.SourceFile(path, "chapter.tex")
+        try:
+            assert source.contains((b"\\input",)) == (version > 0)
+        finally:
+            source.close()
+        assert assets.file_hash(path) == assets.file_hash(str(path))
+
+    assert len(project._contains) == 1 and len(assets._hashes) == 1
+
+    for index in range(5):
+        (tmp_path / f"{index}.tex").write_text(str(index))
+        assets.file_hash(tmp_path / f"{index}.tex")
+    assert list(assets._hashes) == [str(tmp_path / f"{index}.tex") for index in (2, 3, 4)]
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from MetaForge.doi_cache import DAY, DoiCache
+from MetaForge.doi_check import DoiStatus
+
+def test_ttl(tmp_path):
+    with DoiCache(tmp_path / "dois.sqlite") as cache:
+        cache.store([DoiStatus("10.1000/Found", 302), DoiStatus("10.1000/missing", 404)], now = 0)
+
+        assert set(cache.lookup(["10.1000/found", "10.1000/missing"], now = DAY)) == {"10.1000/found", "10.1000/missing"}
+        assert set(cache.lookup(["10.1000/found", "10.1000/missing"], now = 10 * DAY)) == {"10.1000/found"}
+        assert cache.purge(now = 10 * DAY) == 1
+
+class Checker():
+    """ Answers every DOI as resolved, and remembers what it was asked. """
+
+    def __init__(self):
+        self.asked = []
+
+    def check(self, dois: list, on_result = None) -> dict:
+        self.asked += dois
+        return {doi: DoiStatus(doi, 302) for doi in dois}
+
+def test_case_insensitive(tmp_path):
+    checker = Checker()
+    with DoiCache(tmp_path / "dois.sqlite") as cache:
+        cache.store([DoiStatus("10.1000/Found", 302)])
+        results = cache.check(["10.1000/FOUND", "10.1000/found", "10.1000/New", "10.1000/NEW"], checker)
+
+    assert checker.asked == ["10.1000/New"]
+    assert {doi: result.doi for doi, result in results.items()} == {doi: doi for doi in ["10.1000/FOUND", "10.1000/found", "10.1000/New", "10.1000/NEW"]}
+
+def test_shared_between_threads(tmp_path):
+    # Like the jobs of the daemon, which all use the same cache. Each store has to be seen by the lookup after it,
+    # which interleaved transactions of other threads used to break.
+    with DoiCache(tmp_path / "dois.sqlite") as cache:
+        def work(thread: int) -> None:
+            for batch in range(200):
+                dois = [f"10.1000/{thread}.{batch}.{index}" for index in range(20)]
+                cache.store([DoiStatus(doi, 302) for doi in dois])
+
+                assert len(cache.lookup(dois)) == len(dois)
+
+        with ThreadPoolExecutor(max_workers = 8) as pool:
+            list(pool.map(work, range(8)))
+
+        assert len(cache.rows()) == 8 * 200 * 20
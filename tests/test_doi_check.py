@@ -0,0 +1,67 @@
+from MetaForge.doi_check import MALFORMED, DoiChecker
+from MetaForge.stub_server import StubDoiServer
+
+DOIS = [f"10.21468/SciPostPhys.{index}.1.001" for index in range(20)]
+
+def checker(server, **options) -> DoiChecker:
+    # The rate limit of the real resolver only slows the stub down.
+    return DoiChecker(server.url, **{"rate": 1000, "burst": 1000, "backoff": 0.001, **options})
+
+def test_resolved():
+    with StubDoiServer() as server:
+        statuses = checker(server).check(DOIS)
+
+    assert set(statuses) == set(DOIS)
+    assert all(status.status == 302 for status in statuses.values())
+    assert statuses[DOIS[0]].location == f"https://publisher.invalid/{DOIS[0]}"
+
+def test_not_found():
+    with StubDoiServer(not_found_rate = 1.0) as server:
+        statuses = checker(server, retries = 3).check(DOIS[:3])
+
+        # A 404 is an answer, not a failure worth asking again for.
+        assert server.requests == 3
+
+    assert all(status.status == 404 for status in statuses.values())
+
+def test_retries_server_errors():
+    with StubDoiServer(error_rate = 1.0) as server:
+        statuses = checker(server, retries = 2).check(DOIS[:1])
+
+        assert server.requests == 3
+
+    assert statuses[DOIS[0]].status == 503
+
+def test_recovers_from_server_errors():
+    # With this seed, the stub fails some of the first attempts, which the retries get past.
+    with StubDoiServer(error_rate = 0.3, seed = 1) as server:
+        statuses = checker(server, retries = 10).check(DOIS)
+
+        assert server.requests > len(DOIS)
+
+    assert all(status.status == 302 for status in statuses.values())
+
+def test_reuses_connections():
+    with StubDoiServer(latency = 0.001) as server:
+        checker(server, concurrency = 2, connections = 2).check(DOIS)
+
+        assert server.requests == len(DOIS)
+        assert server.connections <= 2
+
+def test_deduplicates():
+    with StubDoiServer() as server:
+        statuses = checker(server).check(DOIS[:2] * 5)
+
+        assert server.requests == 2
+
+    assert len(statuses) == 2
+
+def test_oversized_header():
+    with StubDoiServer(oversized = DOIS[:1]) as server:
+        statuses = checker(server, retries = 3).check(DOIS[:3])
+
+        # The same answer would come again, so it is not asked for again.
+        assert server.requests == 3
+
+    assert statuses[DOIS[0]].status == MALFORMED
+    assert all(statuses[doi].status == 302 for doi in DOIS[1:3])
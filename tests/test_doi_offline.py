@@ -0,0 +1,71 @@
+import gzip
+import json
+
+import pytest
+
+from MetaForge.doi_offline import KNOWN, MALFORMED, DoiIndex, build_index, check_dois, normalize_doi, read_dois
+
+@pytest.mark.parametrize("written, normalized, fixes", [
+    ("10.1103/PhysRevLett.1.1", "10.1103/PhysRevLett.1.1", 0),
+    ("https://doi.org/10.21468/SciPostPhys.1.1.001", "10.21468/SciPostPhys.1.1.001", 1),
+    ("doi: 10.1000/abc.", "10.1000/abc", 2),
+    ("10.1000/a{\\_}b", "10.1000/a_b", 1),
+    ("10.1000/x(1))", "10.1000/x(1)", 1),
+    ("10.10/too-short", None, 0),
+    ("arXiv:2101.00001", None, 0),
+])
+def test_normalize_doi(written, normalized, fixes):
+    result, applied = normalize_doi(written)
+
+    assert result == normalized
+    assert len(applied) == fixes
+
+def test_build_index_from_every_source(tmp_path):
+    (tmp_path / "works.json").write_text(json.dumps({"items": [{"DOI": "10.1000/B"}, {"DOI": "10.1000/a"}, {}]}))
+    with gzip.open(tmp_path / "works.jsonl.gz", "wt") as f:
+        f.write('{"DOI": "10.1000/c"}\n\n{"DOI": "10.1000/b"}\n')
+    (tmp_path / "deposit.xml").write_text("<doi_data>\n  <doi>10.21468/SciPostPhys.1.1.001</doi></doi_data>")
+    (tmp_path / "list.txt").write_text("# Known DOIs\n10.1000/d\nnot a doi\n\n")
+
+    dois = [doi for source in ["works.json", "works.jsonl.gz", "deposit.xml", "list.txt"] for doi in read_dois(tmp_path / source)]
+    assert dois == ["10.1000/B", "10.1000/a", None, "10.1000/c", "10.1000/b", "10.21468/SciPostPhys.1.1.001", "10.1000/d", "not a doi"]
+
+    # Small chunks, so that several sorted runs are merged.
+    assert build_index(dois, tmp_path / "dois.index", chunk = 2) == 5
+    assert (tmp_path / "dois.index").read_text().splitlines()[1:] == [
+        "10.1000/a", "10.1000/b", "10.1000/c", "10.1000/d", "10.21468/scipostphys.1.1.001",
+    ]
+
+def test_lookup(tmp_path):
+    dois = [f"10.{1000 + index % 7}/item.{index}" for index in range(1000)]
+    build_index(dois, tmp_path / "dois.index", chunk = 300)
+
+    index = DoiIndex(tmp_path / "dois.index")
+    try:
+        assert len(index) == 1000
+        assert all(doi in index for doi in dois)
+        assert "10.1000/ITEM.0" in index
+
+        # Neighbours, prefixes and extensions of indexed DOIs, and DOIs before the first or after the last.
+        for doi in ["10.1000/item.1", "10.1000/item.", "10.1000/item.00", "10.1000/item.0.1", "10.0000/a", "10.9999/z", ""]:
+            assert doi not in index
+    finally:
+        index.close()
+
+def test_not_an_index(tmp_path):
+    (tmp_path / "dois.index").write_text("10.1000/a\n")
+
+    with pytest.raises(ValueError):
+        DoiIndex(tmp_path / "dois.index")
+
+def test_check_offline(tmp_path):
+    build_index(["10.1000/known"], tmp_path / "dois.index")
+    index = DoiIndex(tmp_path / "dois.index")
+    try:
+        verdicts = check_dois(["10.1000/KNOWN", "doi:10.1000/known", "10.1/x", "10.1000/unknown"], index = index, offline = True)
+    finally:
+        index.close()
+
+    assert [(verdict.status, verdict.source, verdict.wrong) for verdict in verdicts.values()] == [
+        (KNOWN, "index", False), (KNOWN, "index", True), (MALFORMED, "grammar", True), (None, None, False),
+    ]
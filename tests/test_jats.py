@@ -0,0 +1,74 @@
+import pytest
+
+from MetaForge.cache import JatsCache
+from MetaForge.jats import UnsupportedSyntax, format_pandoc_jats, latex_to_jats, pandoc_available, pandoc_to_jats, resolve_backend
+
+# Abstracts as they come out of papers, and the JATS both the native converter and pandoc give for them.
+PARITY = [
+    ("We study the \\emph{Ising} model.",
+     "<jats:p>We study the <jats:italic>Ising</jats:italic> model.</jats:p>"),
+    ("We study the \\textbf{Potts} model.",
+     "<jats:p>We study the <jats:bold>Potts</jats:bold> model.</jats:p>"),
+    ("An energy $E = mc^2$ here.",
+     "<jats:p>An energy <jats:inline-formula><jats:alternatives><jats:tex-math><![CDATA[E = mc^2]]></jats:tex-math></jats:alternatives></jats:inline-formula> here.</jats:p>"),
+    ("A sum $$Z = \\sum_n e^{-\\beta E_n}$$ here.",
+     "<jats:p>A sum <jats:disp-formula><jats:alternatives><jats:tex-math><![CDATA[Z = \\sum_n e^{-\\beta E_n}]]></jats:tex-math></jats:alternatives></jats:disp-formula> here.</jats:p>"),
+    ("First paragraph.\n\nSecond paragraph.",
+     "<jats:p>First paragraph.</jats:p> <jats:p>Second paragraph.</jats:p>"),
+    ("Costs 5\\$ and 10\\% --- not more.",
+     "<jats:p>Costs 5$ and 10% — not more.</jats:p>"),
+    ("Schr\\\"odinger and Poincar\\'e.",
+     "<jats:p>Schrödinger and Poincaré.</jats:p>"),
+    ("Ranges 1--2 and so on...",
+     "<jats:p>Ranges 1–2 and so on…</jats:p>"),
+    ("Tom \\& Jerry.",
+     "<jats:p>Tom &amp; Jerry.</jats:p>"),
+    ("\\textsc{Small} caps and \\texttt{code}.",
+     "<jats:p><jats:sc>Small</jats:sc> caps and <jats:monospace>code</jats:monospace>.</jats:p>"),
+]
+
+# Where we knowingly differ from pandoc, and the JATS of the native converter.
+KNOWN_DIVERGENCES = [
+    # pandoc reads the abstract as markdown, where a space after a control word is kept in the argument.
+    ("\\textbf \\'ea and \\emph word.",
+     "<jats:p><jats:bold>é</jats:bold>a and <jats:italic>w</jats:italic>ord.</jats:p>"),
+    # pandoc gives markdown's typographic quotes for ``...'', which we only approximate.
+    ("``Quoted'' text.",
+     "<jats:p>“Quoted” text.</jats:p>"),
+    # pandoc keeps a trailing \\ as a line break.
+    ("One line\\\\ and the next.",
+     "<jats:p>One line and the next.</jats:p>"),
+]
+
+@pytest.mark.parametrize("latex, jats", PARITY + KNOWN_DIVERGENCES)
+def test_native(latex, jats):
+    assert latex_to_jats(latex) == jats
+
+@pytest.mark.skipif(not pandoc_available(), reason = "pandoc is not installed")
+@pytest.mark.parametrize("latex, jats", PARITY + [pytest.param(*case, marks = pytest.mark.xfail(reason = "known divergence")) for case in KNOWN_DIVERGENCES])
+def test_pandoc_parity(latex, jats):
+    assert pandoc_to_jats(latex) == latex_to_jats(latex)
+
+def test_bare_argument_skips_spaces():
+    assert latex_to_jats("\\emph {x}y") == "<jats:p><jats:italic>x</jats:italic>y</jats:p>"
+    assert latex_to_jats("\\c c") == "<jats:p>ç</jats:p>"
+
+def test_line_break_is_one_space():
+    assert latex_to_jats("One line \\\\ and the next.") == "<jats:p>One line and the next.</jats:p>"
+    assert latex_to_jats("One line\\\\and the next.") == "<jats:p>One line and the next.</jats:p>"
+
+def test_pandoc_tags():
+    assert format_pandoc_jats("<p><sc>A</sc> <monospace>b</monospace></p>\n") == "<jats:p><jats:sc>A</jats:sc> <jats:monospace>b</jats:monospace></jats:p>"
+
+def test_unsupported():
+    with pytest.raises(UnsupportedSyntax):
+        latex_to_jats("\\unknowncommand{x}")
+
+    assert latex_to_jats("\\unknowncommand{x}", strict = False) == "<jats:p>x</jats:p>"
+
+def test_cache_key_resolves_auto(tmp_path):
+    cache = JatsCache(tmp_path)
+
+    assert resolve_backend("auto") in ("auto+pandoc", "auto+native")
+    assert cache.key("An abstract.") == cache.key("An  abstract.\n")
+    assert cache.key("An abstract.", "auto") not in (cache.key("An abstract.", "native"), cache.key("An abstract.", "pandoc"))
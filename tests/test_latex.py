@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from MetaForge.latex import LOG_WIDTH, parse_log, unwrap_log
+
+LOGS = Path(__file__).parent / "logs"
+
+def test_wrapped_log():
+    report = parse_log((LOGS / "wrapped.log").read_text())
+
+    assert report["errors"] == [
+        {"file": "./SciPost_Phys_paper.tex", "line": 175, "message": "Undefined control sequence."},
+        {"file": "./SciPost_Phys_paper.tex", "line": 190, "message": "Package amsmath Error: \\begin{align} allowed only in paragraph mode, see the amsmath documentation."},
+    ]
+    assert report["warnings"] == [
+        {"source": "hyperref", "line": 112, "message": "Token not allowed in a PDF string (Unicode): removing `math shift' on input line 112."},
+        # Wrapped after 79 bytes, in the middle of the Ñ.
+        {"source": "LaTeX", "line": 140, "message": "Citation `Sánchez2021:a-very-long-citation-key-for-the-Ñ-dependence' on page 2 undefined on input line 140."},
+        {"source": "LaTeX Font", "line": 151, "message": "Font shape `OT1/cmr/bx/sc' undefined using `OT1/cmr/bx/n' instead on input line 151."},
+        # Exactly as wide as the log, and not joined to the box after it.
+        {"source": "LaTeX", "line": 158, "message": "Reference `fig:phases-2' on page 12 undefined on input line 158."},
+    ]
+    assert report["badboxes"] == 2
+    assert not report["rerun"]
+
+def test_log_of_a_larger_max_print_line():
+    report = parse_log((LOGS / "wide.log").read_text())
+
+    assert report["errors"] == []
+    assert [(warning["source"], warning["line"]) for warning in report["warnings"]] == [
+        ("LaTeX", 158), ("natbib", 203), ("LaTeX Font", None), ("LaTeX", None),
+    ]
+    assert report["warnings"][1]["message"].endswith("on page 4 undefined on input line 203.")
+
+def test_unwrap_log():
+    full = "x" * LOG_WIDTH
+
+    assert unwrap_log(f"{full}\nyz\nnext") == f"{full}yz\nnext"
+    assert unwrap_log(f"{full}\n{full}\nyz") == f"{full}{full}yz"
+    assert unwrap_log(f"{full}\n\nnext") == f"{full}\nnext"
+    assert unwrap_log(f"{full}\n! Undefined control sequence.") == f"{full}\n! Undefined control sequence."
+    assert unwrap_log(f"{full}x\n{full}\nyz") == f"{full}x\n{full}\nyz"
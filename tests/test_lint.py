@@ -0,0 +1,54 @@
+import random
+
+from MetaForge import rewrite
+from MetaForge.lint import Automaton, LintRule, Linter, lint_paper
+from MetaForge.misc import Date
+from MetaForge.synthetic import generate_paper
+
+def naive_find(keywords: list, text: str) -> list:
+    return sorted((start, keyword) for keyword in keywords for start in range(len(text)) if text.startswith(keyword, start))
+
+def test_automaton_finds_every_occurrence():
+    keywords = ["he", "she", "his", "hers", "s", "??", "???"]
+    automaton = Automaton((keyword, keyword) for keyword in keywords)
+
+    assert sorted(automaton.find("ushers")) == [(1, "s"), (1, "she"), (2, "he"), (2, "hers"), (5, "s")]
+    assert sorted(automaton.find("a ???? b")) == [(2, "??"), (2, "???"), (3, "??"), (3, "???"), (4, "??")]
+
+    generator = random.Random(0)
+    for _ in range(200):
+        text = "".join(generator.choice("ehirs? ") for _ in range(generator.randrange(40)))
+        assert sorted(automaton.find(text)) == naive_find(keywords, text)
+
+def test_automaton_misses():
+    automaton = Automaton((keyword, keyword) for keyword in ["\\linenumbers", "TODO: DOI"])
+
+    assert list(automaton.find("\\linenumber \\LineNumbers TODO:DOI todo: doi")) == []
+    assert list(automaton.find("")) == []
+    assert list(Automaton([]).find("anything")) == []
+
+def test_linter_reports_lines_and_columns():
+    linter = Linter([
+        LintRule("draft", ("DRAFT", "DRAFT!"), "Still a draft."),
+        LintRule("linenumbers", ("\\linenumbers",), "Line numbers are still on.", "warning"),
+    ])
+    text = "A DRAFT! version\n% \\linenumbers\nSee 100\\% of it \\linenumbers % DRAFT\n"
+
+    assert [(hit.rule, hit.level, hit.line, hit.column, hit.text) for hit in linter.lint(text)] == [
+        # Both patterns of the rule start at the same place, which is reported once.
+        ("draft", "error", 1, 3, "DRAFT"),
+        ("linenumbers", "warning", 3, 17, "\\linenumbers"),
+    ]
+
+def test_template_leftovers():
+    tex, doi = generate_paper(bibitems = 5, seed = 1)
+
+    hits = lint_paper(tex)
+    assert [hit.rule for hit in hits] == [
+        "footmisc", "urlstyle", "doi-placeholder", "journal-reference", "publication-date", "doi-placeholder", "linenumbers",
+    ]
+    assert [hit.rule for hit in lint_paper(tex, config = {"*": {"disable": ["urlstyle", "footmisc"]}})][:2] == ["doi-placeholder", "journal-reference"]
+
+    formatted, _ = rewrite.format_publication(tex, doi, Date.from_DMY("01-01-2025"))
+    assert lint_paper(formatted) == []
+    assert [hit.rule for hit in lint_paper(formatted + "YYYY-MM-DD\n")] == ["crossmark-date"]
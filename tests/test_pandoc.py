@@ -0,0 +1,85 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from MetaForge.pandoc import PandocError, PandocPool
+
+# A pandoc that turns every paragraph into <p>...</p> and logs what it was given. An unclosed ```
+# swallows every paragraph after it, like an unclosed block does in pandoc, and FAIL makes it fail.
+FAKE_PANDOC = """#!{python}
+import os, sys
+
+text = sys.stdin.read()
+with open(os.environ["FAKE_PANDOC_LOG"], "a") as f:
+    f.write(repr(text) + "\\n")
+
+if "FAIL" in text:
+    sys.stderr.write("Could not convert FAIL.")
+    sys.exit(64)
+
+paragraphs, fence = [], None
+for block in filter(None, (block.strip() for block in text.split("\\n\\n"))):
+    if fence is not None:
+        fence.append(block)
+    elif block.startswith("```"):
+        fence = [block]
+    else:
+        paragraphs.append(block)
+
+print("".join(f"<p>{{paragraph}}</p>\\n" for paragraph in paragraphs), end = "")
+if fence:
+    print("<code>" + " ".join(fence) + "</code>")
+"""
+
+@pytest.fixture
+def pandoc(tmp_path, monkeypatch):
+    """ Puts the fake pandoc first on the PATH, and returns the inputs it was run on. """
+
+    (tmp_path / "bin").mkdir()
+    script = tmp_path / "bin" / "pandoc"
+    script.write_text(FAKE_PANDOC.format(python = sys.executable))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_PANDOC_LOG", str(tmp_path / "runs.log"))
+
+    def runs():
+        log = tmp_path / "runs.log"
+        return log.read_text().splitlines() if log.exists() else []
+
+    return runs
+
+def test_batches_are_split_back_in_order(pandoc):
+    texts = [f"Abstract number {index}." for index in range(10)]
+
+    assert PandocPool(workers = 2, batch_size = 4).convert(texts) == [f"<jats:p>Abstract number {index}.</jats:p>" for index in range(10)]
+    assert len(pandoc()) == 3
+
+def test_a_leaking_abstract_spoils_only_its_batch(pandoc, capsys):
+    texts = ["First.", "```\nunclosed", "Third.", "Fourth.", "Fifth."]
+
+    converted = PandocPool(workers = 1, batch_size = 3).convert(texts)
+
+    assert converted == [f"<jats:p>{text}</jats:p>" for text in ["First."]] + ["<code>``` unclosed</code>"] + [
+        f"<jats:p>{text}</jats:p>" for text in ["Third.", "Fourth.", "Fifth."]
+    ]
+    # The first batch was run whole, then each of its abstracts alone. The second batch went through in one run.
+    assert len(pandoc()) == 1 + 3 + 1
+    assert "Converting the 3 abstracts one by one." in capsys.readouterr().out
+
+def test_a_failing_batch(pandoc, capsys):
+    pool = PandocPool(workers = 2, batch_size = 2)
+
+    with pytest.raises(PandocError, match = "Could not convert FAIL."):
+        pool.convert(["Good.", "Also good.", "Good again.", "FAIL here."])
+
+    assert "pandoc failed" in capsys.readouterr().out
+    assert pool.convert([]) == []
+
+def test_missing_pandoc(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    with pytest.raises(PandocError, match = "Could not run pandoc"):
+        PandocPool().convert(["An abstract."])
@@ -0,0 +1,41 @@
+import pytest
+
+from MetaForge.parsed_paper import ParsedPaper
+from MetaForge.synthetic import generate_paper
+
+@pytest.fixture
+def parsed():
+    tex, _ = generate_paper(bibitems = 5, seed = 4)
+    return ParsedPaper(tex)
+
+def test_spans(parsed):
+    start, end = parsed.title_span
+    assert parsed.text[:start].endswith("%%%%%%%%%% TODO: TITLE Paste title here\n")
+    assert parsed.text[end:].startswith("\n% multiline titles: end")
+
+    start, end = parsed.abstract_span
+    assert parsed.text[end:].startswith("\n%%%%%%%%%% END TODO: ABSTRACT")
+
+    start, end = parsed.bibliography_span
+    assert parsed.text[:start].endswith("\\begin{thebibliography}{")
+    assert parsed.text[end:].startswith("\\end{thebibliography}")
+
+def test_fields(parsed):
+    assert parsed.title.startswith("A synthetic paper on")
+    assert [str(date) for date in parsed.dates] == ["2023-05-15", "2024-08-12"]
+    assert list(parsed.affiliations) == [1, 2, 3]
+    assert len(parsed.authors) == 3
+    assert len(parsed.bibliography_index.keys) == 5
+    assert parsed.rheads[0].startswith("/SciPostPhys.?.?.???}")
+
+def test_memoized(parsed):
+    assert "abstract" not in vars(parsed) # Nothing is extracted until it is asked for.
+
+    abstract = parsed.abstract
+    assert parsed.abstract is abstract
+    assert parsed.bibliography_index is parsed.bibliography_index
+    assert ParsedPaper.of(parsed) is parsed
+
+def test_missing_section():
+    with pytest.raises(IndexError, match = "TODO: TITLE"):
+        ParsedPaper("Nothing here.").title
@@ -0,0 +1,83 @@
+import pytest
+
+from MetaForge.build import Build
+from MetaForge.make_publication_format import make_publication_format
+from MetaForge.project import Project
+from MetaForge.synthetic import generate_paper
+
+DATE = "01-01-2025"
+
+@pytest.fixture
+def paper():
+    return generate_paper(bibitems = 10, seed = 4)
+
+def publish(folder, tex: str, doi: str, newline: str = "\n", encoding: str = "utf-8"):
+    folder.mkdir(exist_ok = True)
+    with open(folder / "main.tex", "w", newline = newline, encoding = encoding) as f:
+        f.write(tex)
+
+    make_publication_format(folder / "main.tex", doi, DATE, check_dois = False)
+
+    return (folder / f"{doi.replace('.', '_')}.tex").read_bytes()
+
+def test_crlf(tmp_path, paper, capsys):
+    tex, doi = paper
+
+    lf = publish(tmp_path / "lf", tex, doi)
+    capsys.readouterr()
+    crlf = publish(tmp_path / "crlf", tex, doi, newline = "\r\n")
+
+    assert "Could not find" not in capsys.readouterr().out
+    assert crlf.count(b"\r\n") == crlf.count(b"\n") # Every line keeps its line ending.
+    assert crlf.replace(b"\r\n", b"\n") == lf
+    assert doi.encode() in crlf
+
+def test_latin1(tmp_path, paper, capsys):
+    tex, doi = paper
+    tex = tex.replace("A synthetic paper on", "A synthétic paper on")
+
+    output = publish(tmp_path, tex, doi, encoding = "latin-1")
+
+    assert "Could not find" not in capsys.readouterr().out
+    assert "A synthétic paper on".encode("latin-1") in output
+    assert doi.encode() in output
+
+def split(folder, tex: str) -> None:
+    """ Moves the front matter and the bibliography of a paper to files of their own. """
+
+    begin, end = tex.index("\\begin{center}{\\Large"), tex.index("\\section*{\\color{scipostdeepblue}{Abstract}}")
+    bibliography = tex.index("\\begin{thebibliography}")
+
+    (folder / "sections").mkdir(parents = True)
+    (folder / "sections" / "front.tex").write_text(tex[begin:end])
+    (folder / "sections" / "references.tex").write_text(tex[bibliography:tex.index("\\end{thebibliography}") + 21])
+    (folder / "sections" / "chapter.tex").write_text("Nothing to extract here.\n")
+
+    main = tex[:begin] + "\\input{sections/front}\n" + tex[end:bibliography] + "\\input{sections/chapter}\n\\input{sections/references}" + tex[tex.index("\\end{thebibliography}") + 21:]
+    (folder / "main.tex").write_text(main)
+
+def test_bibliography_lines(tmp_path, paper):
+    tex, _ = paper
+    split(tmp_path, tex)
+
+    with Project(tmp_path / "main.tex") as project:
+        items = project.parsed.bibliography_index.items()
+        lines = (tmp_path / "sections" / "references.tex").read_text().split("\n")
+
+        assert {item.file for item in items} == {str(tmp_path / "sections" / "references.tex")}
+        assert all(lines[item.line - 1].startswith(f"\\bibitem{{{item.key}}}") for item in items)
+
+def test_watch_sees_included_files(tmp_path, paper):
+    tex, doi = paper
+    split(tmp_path, tex)
+
+    build = Build(tmp_path / "main.tex", doi, DATE, check_dois = False)
+    names = {path.name for path, _, _ in build.versions()}
+
+    # The chapter is not needed for the view, but an edit can make it so.
+    assert names == {"main.tex", "front.tex", "references.tex", "chapter.tex"}
+
+    before = build.versions()
+    (tmp_path / "sections" / "chapter.tex").write_text("Something else.\n")
+
+    assert build.versions() != before
@@ -0,0 +1,115 @@
+import re
+
+import pytest
+
+from MetaForge import rewrite
+from MetaForge.misc import Date
+from MetaForge.rewrite import Edit, Rule, RuleSet
+from MetaForge.synthetic import JOURNALS, generate_paper
+
+DATE = Date.from_DMY("01-02-2025")
+
+def legacy_format(paper: str, doi: str, date: Date) -> str:
+    """ The str.replace pipeline the rule sets replaced, as it was, less its messages. """
+
+    paper = paper.replace("\n\\linenumbers\n", "\n%\\linenumbers\n")
+    paper = paper.replace("\n\\urlstyle{sf}\n", "\n\\urlstyle{same}\n")
+    paper = paper.replace("\n\\usepackage[bottom]{footmisc}\n", "\n%\\usepackage[bottom]{footmisc}\n")
+
+    original = re.findall(r"scipost.org/(.*?)\}\{SciPost", paper)[0]
+    paper = paper.replace(f"\\rhead{{\\small \\href{{https://scipost.org/{original}}}", f"\\rhead{{\\small \\href{{https://scipost.org/{doi}}}")
+
+    journal, parts = doi.split(".")[0], doi.split(".")
+    doi_section = f"""}}
+        \\end{{minipage}}
+        \\begin{{minipage}}{{0.25\\textwidth}}
+        \\begin{{center}}
+        \\href{{https://crossmark.crossref.org/dialog/?doi=10.21468/{doi}&amp;domain=pdf&amp;date_stamp=YYYY-MM-DD}}{{\\includegraphics[width=7mm]{{CROSSMARK_BW_square_no_text.png}}}}\\\\
+        \\tiny{{Check for}}\\\\
+        \\tiny{{updates}}
+        \\end{{center}}
+        \\end{{minipage}}
+        \\\\\\\\
+        \\small{{\\doi{{10.21468/{doi}}}"""
+
+    if journal != "SciPostPhysProc":
+        dimension = re.findall(r"\\begin{minipage}{(.*?)\\textwidth}\n%%%%%%%%%% TODO: DATES", paper)[0]
+        paper = paper.replace(f"\\begin{{minipage}}{{{dimension}\\textwidth}}\n%%%%%%%%%% TODO: DATES",
+                              f"\\begin{{minipage}}{{{dimension}\\textwidth}}\n\\noindent\\begin{{minipage}}{{0.68\\textwidth}}\n%%%%%%%%%% TODO: DATES")
+
+        if journal in ("SciPostPhys", "SciPostPhysCore", "SciPostChem"):
+            paper = paper.replace(" ?, ??? (20??)", f" {parts[1]}, {parts[3]} (20??)")
+        elif journal == "SciPostPhysLectNotes":
+            paper = paper.replace(" ??? (20??)", f" {parts[1]} (20??)")
+        elif journal == "SciPostPhysCodeb":
+            paper = paper.replace(" ?, ??? (20??)", f" {parts[1]} (20??)")
+    else:
+        paper = paper.replace(" ?, ?? (202?)", f" {parts[1]}, {parts[2]} (20??)")
+        paper = paper.replace(r"??.\thepage", rf"{parts[2]}.\thepage")
+        if paper.find(r"\noindent\begin{minipage}{0.68\textwidth}") == -1:
+            paper = paper.replace("%%%%%%%%%% TODO: DATES", "\\noindent\\begin{minipage}{0.68\\textwidth}\n%%%%%%%%%% TODO: DATES")
+        paper = paper.replace("\\doi{10.21468/SciPostPhysProc.?", f"\\doi{{10.21468/SciPostPhysProc.{parts[1]}")
+
+    paper = paper.replace(re.findall(r"%%%%%%%%%% TODO: DOI\n(.*?)\n%%%%%%%%%% END TODO: DOI", paper, re.DOTALL)[0], doi_section)
+
+    # And the date, as set_date did it.
+    published = re.findall("Published (.*?)\n%%%%%%%%%% END TODO: DATES", paper)[0]
+    paper = paper.replace(f"Published {published}", f"Published {date.DMY()}")
+    url = re.findall("&amp;date_stamp=(.*?)}", paper)[0]
+    paper = paper.replace(f"&amp;date_stamp={url}", f"&amp;date_stamp={date.YMD()}")
+    top = re.findall(r"\\rhead{\\small \\href{https://scipost.org(.*?)\}\}", paper)[0]
+
+    return paper.replace(top, f"{top[:-5]}{date.year})")
+
+@pytest.mark.parametrize("journal", list(JOURNALS))
+def test_same_as_legacy(journal):
+    tex, doi = generate_paper(journal, bibitems = 5, seed = 1)
+    formatted, report = rewrite.format_publication(tex, doi, DATE)
+
+    assert formatted == legacy_format(tex, doi, DATE)
+    assert report.ok and not report.conflicts
+
+def test_set_date():
+    tex, doi = generate_paper(bibitems = 5, seed = 1)
+    formatted, _ = rewrite.format_publication(tex, doi, Date.from_DMY("01-02-2024"))
+    redated, report = rewrite.set_date(formatted, DATE)
+
+    assert redated == rewrite.format_publication(tex, doi, DATE)[0]
+    assert report.applied == ["crossmark-date", "published-date", "rhead-year"]
+
+def test_superseded_and_conflicts():
+    rules = RuleSet("test", [
+        Rule("outer", "abcdef", "X", literal = True),
+        Rule("inner", "cd", "Y", literal = True),
+        Rule("partial", "efgh", "Z", literal = True),
+    ])
+    text, report = rules.apply("abcdefgh", {})
+
+    assert text == "Xgh"
+    assert report.superseded == [Edit(2, 4, "Y", "inner")]
+    assert report.conflicts == [(Edit(4, 8, "Z", "partial"), Edit(0, 6, "X", "outer"))]
+    assert not report.ok
+    assert ("error", "Rule partial overlaps rule outer at offset 4, skipped.") in report.messages()
+
+def test_many_edits_stay_in_order():
+    rules = RuleSet("test", [Rule("even", r"a(?=b)", "A"), Rule("all", "b", "B", literal = True), Rule("any", "ab", "C", literal = True)])
+    text, report = rules.apply("ab" * 1000, {})
+
+    assert text == "AB" * 1000
+    assert len(report.conflicts) == 1000
+
+def test_missing_anchors():
+    text, report = rewrite.format_publication("Not a SciPost paper.", "SciPostPhys.1.2.003", DATE)
+
+    assert text == "Not a SciPost paper."
+    assert not report.ok
+    messages = [message for level, message in report.messages() if level == "error"]
+    for message in ["Could not find linenumbers.", "Could not find urlstyle.", "Could not find the doi section.",
+                    "Could not find the minipage next to the dates.", "Could not find the DOI section.", "Could not find the publication date."]:
+        assert message in messages
+
+def test_unknown_journal():
+    tex, _ = generate_paper(bibitems = 5, seed = 1)
+    _, report = rewrite.format_publication(tex, "SciPostAstro.1.2.003", DATE)
+
+    assert ("message", "No known journal found. Please incorporate in the code.") in report.messages()
@@ -0,0 +1,88 @@
+import os
+from datetime import date
+
+import pytest
+
+from MetaForge import rewrite, scheduler
+from MetaForge.misc import Date
+from MetaForge.synthetic import generate_paper
+
+def formatted_papers(folder, dates: list) -> list:
+    """ Writes formatted synthetic papers, published on the given dates. """
+
+    paths = []
+    for seed, published in enumerate(dates):
+        tex, doi = generate_paper(bibitems = 5, seed = seed)
+        path = folder / f"paper{seed}.tex"
+        path.write_text(rewrite.format_publication(tex, doi, Date.from_DMY(published))[0])
+        paths.append(str(path))
+
+    return paths
+
+def test_schedule_keeps_the_queue_order():
+    papers = [f"paper{index}.tex" for index in range(5)]
+
+    # Friday the 3rd of January 2025, two papers a day.
+    assert scheduler.schedule(papers, date(2025, 1, 3), 2) == [
+        ("paper0.tex", "03-01-2025"), ("paper1.tex", "03-01-2025"),
+        ("paper2.tex", "04-01-2025"), ("paper3.tex", "04-01-2025"),
+        ("paper4.tex", "05-01-2025"),
+    ]
+    assert [day for _, day in scheduler.schedule(papers, date(2025, 1, 3), 2, weekdays_only = True)] == [
+        "03-01-2025", "03-01-2025", "06-01-2025", "06-01-2025", "07-01-2025",
+    ]
+
+    with pytest.raises(ValueError):
+        scheduler.schedule(papers, date(2025, 1, 3), 0)
+
+def test_read_queue(tmp_path):
+    (tmp_path / "queue.csv").write_text("tex,note\n# Held back\nb/second.tex,\n a/first.tex ,urgent\n\n")
+
+    assert scheduler.read_queue(tmp_path / "queue.csv") == [str(tmp_path / "b" / "second.tex"), str(tmp_path / "a" / "first.tex")]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_redates_in_place(tmp_path, workers):
+    papers = formatted_papers(tmp_path, ["01-02-2024", "02-01-2025", "01-02-2024"])
+    before = {path: os.stat(path) for path in papers}
+
+    results = scheduler.run_schedule(scheduler.schedule(papers, date(2025, 1, 2), 1), workers)
+
+    assert [(result["date"], result["ok"], result["changed"]) for result in results] == [
+        ("02-01-2025", True, True), ("03-01-2025", True, True), ("04-01-2025", True, True),
+    ]
+    for seed, (path, result) in enumerate(zip(papers, results)):
+        tex, doi = generate_paper(bibitems = 5, seed = seed)
+        assert open(path).read() == rewrite.format_publication(tex, doi, Date.from_DMY(result["date"]))[0]
+
+        # A new file took the place of the old one.
+        assert os.stat(path).st_ino != before[path].st_ino
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["paper0.tex", "paper1.tex", "paper2.tex"]
+
+def test_unchanged_and_dry_run(tmp_path):
+    papers = formatted_papers(tmp_path, ["02-01-2025", "01-02-2024"])
+    texts = [open(path).read() for path in papers]
+    inodes = [os.stat(path).st_ino for path in papers]
+
+    unchanged, dry = scheduler.run_schedule(scheduler.schedule(papers, date(2025, 1, 2), 2), 1, dry_run = True)
+
+    assert not unchanged["changed"] and "diff" not in unchanged
+    assert dry["changed"] and "+" in dry["diff"] and "02-01-2025" in dry["diff"]
+    assert [open(path).read() for path in papers] == texts
+
+    scheduler.run_schedule([(papers[0], "02-01-2025")], 1)
+    assert os.stat(papers[0]).st_ino == inodes[0]
+
+def test_failed_write_leaves_the_paper(tmp_path, monkeypatch):
+    path, = formatted_papers(tmp_path, ["01-02-2024"])
+    text = open(path).read()
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    result, = scheduler.run_schedule([(path, "02-01-2025")], 1)
+
+    assert "disk full" in result["error"]
+    assert open(path).read() == text
+    assert [path.name for path in tmp_path.iterdir()] == ["paper0.tex"]
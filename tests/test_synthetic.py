@@ -0,0 +1,90 @@
+import re
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from MetaForge.benchmark import cases
+from MetaForge.cache import jats_cache
+from MetaForge.doi_check import DoiChecker
+from MetaForge.jats import latex_to_jats
+from MetaForge.parsed_paper import ParsedPaper
+from MetaForge.stub_server import StubDoiServer
+from MetaForge.synthetic import FORMULAS, JOURNALS, generate_paper
+
+@pytest.mark.parametrize("journal", list(JOURNALS))
+def test_deterministic(journal):
+    assert generate_paper(journal, bibitems = 20, seed = 1) == generate_paper(journal, bibitems = 20, seed = 1)
+    assert generate_paper(journal, bibitems = 20, seed = 1) != generate_paper(journal, bibitems = 20, seed = 2)
+
+@pytest.mark.parametrize("journal", list(JOURNALS))
+def test_format(journal):
+    tex, doi = generate_paper(journal, affiliations = 4, bibitems = 50, seed = 1)
+    paper = ParsedPaper(tex)
+
+    assert re.fullmatch(rf"{journal}(\.\d+)+", doi)
+    assert JOURNALS[journal][2] in tex # The DOI placeholder of the journal, for the rewrite to replace.
+    assert paper.title.startswith("A synthetic paper on")
+    assert len(paper.affiliations) == 4
+    assert len(paper.authors) == 4
+
+    # Some entries are commented out, and the index leaves them out.
+    assert 0 < len(paper.bibliography_index) <= 50
+
+def test_abstract_keeps_formulas():
+    tex, _ = generate_paper(math_density = 0.5, seed = 1)
+    abstract = ParsedPaper(tex).abstract.text
+
+    assert abstract[0].isupper()
+    assert set(re.findall(r"\$([^$]+)\$", abstract)) <= set(FORMULAS)
+
+def status(url: str) -> int:
+    request = urllib.request.Request(url, method = "HEAD")
+
+    # The stub redirects like doi.org, which we do not follow.
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args):
+            return None
+
+    try:
+        return urllib.request.build_opener(NoRedirect).open(request).status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+def test_stub_server():
+    dois = [f"10.1000/stub.{index}" for index in range(50)]
+
+    with StubDoiServer(not_found_rate = 0.5) as server:
+        statuses = [status(server.url + doi) for doi in dois]
+
+        # Whether a DOI is found only depends on the DOI.
+        assert statuses == [404 if server.is_not_found(doi) else 302 for doi in dois]
+        assert 302 in statuses and 404 in statuses
+        assert server.requests == len(dois)
+
+    with StubDoiServer(error_rate = 1.0) as server:
+        assert status(server.url + dois[0]) == 503
+
+def test_stub_server_takes_every_connection():
+    # A checker opens all its connections at once. Any the listen backlog drops are only retried a second later.
+    dois = [f"10.1000/stub.{index}" for index in range(40)]
+
+    for _ in range(3):
+        with StubDoiServer() as server:
+            start = time.perf_counter()
+            DoiChecker(server.url, connections = 20, rate = 1000, burst = 1000).check(dois)
+
+            assert time.perf_counter() - start < 0.9
+            assert server.requests == len(dois)
+
+def test_benchmark_jats_case_leaves_the_user_cache_alone(tmp_path):
+    tex, doi = generate_paper(bibitems = 5, seed = 1)
+    before = jats_cache.entries()
+
+    with StubDoiServer() as server:
+        case = cases(tex, doi, server, tmp_path)["Abstract.get_Jats"]
+        assert case() == case() == latex_to_jats(ParsedPaper(tex).abstract.text)
+
+    assert jats_cache.entries() == before
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from MetaForge.trace import TRACE_ENV, TRACE_OWNER_ENV
+
+# A traced run that converts abstracts on a pool of processes, like the batch formats papers.
+POOL = """
+import multiprocessing, sys
+from concurrent.futures import ProcessPoolExecutor
+
+from MetaForge import trace
+from MetaForge.jats import to_jats
+
+if __name__ == "__main__":
+    with trace.span("main"), ProcessPoolExecutor(2, mp_context = multiprocessing.get_context(sys.argv[1])) as pool:
+        list(pool.map(to_jats, [f"Abstract {index}." for index in range(8)]))
+"""
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_pool_workers_write_their_spans(tmp_path, method):
+    script = tmp_path / "pool.py"
+    script.write_text(POOL)
+
+    environment = {key: value for key, value in os.environ.items() if key != TRACE_OWNER_ENV}
+    environment[TRACE_ENV] = str(tmp_path / "trace.jsonl")
+    environment["PYTHONPATH"] = os.pathsep.join([os.getcwd(), *sys.path])
+    subprocess.run([sys.executable, str(script), method], env = environment, check = True, cwd = tmp_path)
+
+    main = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert [record["name"] for record in main if record["type"] == "span"] == ["main"]
+
+    workers = [path for path in tmp_path.glob("trace.*.jsonl")]
+    assert workers
+
+    spans = [json.loads(line) for path in workers for line in path.read_text().splitlines()]
+    spans = [record for record in spans if record["type"] == "span"]
+
+    # Every abstract was converted in a worker, and each worker only wrote its own spans.
+    assert sum(record["name"] == "jats.native" for record in spans) == 8
+    assert {record["pid"] for record in spans} <= {int(path.name.split(".")[1]) for path in workers}
+    assert main[0]["pid"] not in {record["pid"] for record in spans}